@@ -0,0 +1,244 @@
+import os
+import time
+import threading
+from deadline import child_pids
+
+
+def descendant_pids(pid):
+    """PID mọi process con/cháu (cây renderer, GPU, utility của Chromium)"""
+    found = []
+    pending = [pid]
+    while pending:
+        children = child_pids(pending.pop())
+        found.extend(children)
+        pending.extend(children)
+    return found
+
+
+def process_rss(pid):
+    """RSS (bytes) của 1 process, 0 nếu process đã thoát"""
+    try:
+        import psutil
+    except ImportError:
+        psutil = None
+    if psutil:
+        try:
+            return psutil.Process(pid).memory_info().rss
+        except psutil.Error:
+            return 0
+    try:
+        with open(f'/proc/{pid}/status', 'r') as f:
+            for line in f:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1]) * 1024
+    except (OSError, ValueError):
+        pass
+    return 0
+
+
+class HostMetrics:
+    """CPU (%) và bộ nhớ còn dùng được của máy: psutil nếu có, không thì đọc /proc trên Linux"""
+
+    def __init__(self):
+        try:
+            import psutil
+        except ImportError:
+            psutil = None
+        self.psutil = psutil
+        self.last_cpu = None
+        self.cpu_percent()
+
+    def cpu_percent(self):
+        """% CPU trung bình mọi core từ lần gọi trước"""
+        if self.psutil:
+            return self.psutil.cpu_percent(interval=None)
+        try:
+            with open('/proc/stat', 'r') as f:
+                values = [int(value) for value in f.readline().split()[1:]]
+        except (OSError, ValueError):
+            return 0.0
+        idle = values[3] + (values[4] if len(values) > 4 else 0)
+        total = sum(values[:8])
+        last, self.last_cpu = self.last_cpu, (idle, total)
+        if last is None or total == last[1]:
+            return 0.0
+        return 100.0 * (1 - (idle - last[0]) / (total - last[1]))
+
+    def memory_mb(self):
+        """(available, total) MB"""
+        if self.psutil:
+            memory = self.psutil.virtual_memory()
+            return memory.available / 1024 / 1024, memory.total / 1024 / 1024
+        info = {}
+        try:
+            with open('/proc/meminfo', 'r') as f:
+                for line in f:
+                    key, value = line.split(':', 1)
+                    info[key] = int(value.split()[0])
+        except (OSError, ValueError):
+            return float('inf'), 0.0
+        available = info.get('MemAvailable', info.get('MemFree', 0) + info.get('Cached', 0))
+        return available / 1024, info.get('MemTotal', 0) / 1024
+
+
+class Autoscaler:
+    """
+    Điều chỉnh số extract worker đang chạy (mỗi worker 1 Chromium) theo tải của máy,
+    thay cho extract_workers cố định. Pipeline khởi động max_workers thread, worker có
+    slot >= limit thì đóng browser và chờ (wait_turn).
+
+    Mỗi `interval` giây đo CPU, bộ nhớ còn trống và RSS cây process Chromium của các worker:
+    - giảm 1 worker khi CPU > cpu_high, bộ nhớ trống < min_free_mb hoặc tổng RSS browser
+      > max_browser_mb (thiếu bộ nhớ thì giảm ngay, không chờ cooldown)
+    - thêm 1 worker khi CPU < cpu_low và còn chỗ cho thêm 1 browser (ước lượng theo RSS
+      trung bình 1 browser đang chạy)
+    Mỗi lần đổi đều được log kèm số liệu; ngoài ra chờ cooldown giây giữa 2 lần đổi để browser
+    mới kịp hiện trong số đo. RSS cộng cả phần bộ nhớ chia sẻ giữa các process Chromium
+    nên hơi cao hơn thực tế (an toàn).
+    """
+
+    def __init__(self, min_workers=1, max_workers=4, start_workers=None, interval=5.0,
+                 cpu_high=85.0, cpu_low=60.0, min_free_mb=1024, max_browser_mb=None, cooldown=15.0):
+        if min_workers < 1 or max_workers < min_workers:
+            raise ValueError(f"Invalid autoscale range: {min_workers}..{max_workers}")
+        self.min_workers = min_workers
+        self.max_workers = max_workers
+        self.limit = min(max(start_workers or min_workers, min_workers), max_workers)
+        self.interval = interval
+        self.cpu_high = cpu_high
+        self.cpu_low = cpu_low
+        self.min_free_mb = min_free_mb
+        self.max_browser_mb = max_browser_mb
+        self.cooldown = cooldown
+
+        self.metrics = None
+        self.workers = {}
+        self.cond = threading.Condition()
+        self.stop_event = threading.Event()
+        self.thread = None
+        self.last_change = 0.0
+        self.decisions = []
+        self.peak_browser_mb = 0.0
+
+    def attach(self, slot, pages):
+        """WorkerPage của slot (để đo RSS browser của worker đó)"""
+        with self.cond:
+            self.workers[slot] = pages
+
+    def detach(self, slot):
+        with self.cond:
+            self.workers.pop(slot, None)
+
+    def wait_turn(self, slot, pages, stop_event, finished):
+        """
+        Gọi trước mỗi task. True = slot được chạy; False = worker nên thoát
+        (pipeline dừng, hoặc finished(): không còn link mới nên slot đang chờ không cần nữa).
+        """
+        with self.cond:
+            if slot < self.limit:
+                return True
+        pages.close()
+        print(f"  💤 Autoscale: {pages.name} parked (limit {self.limit})")
+        with self.cond:
+            while slot >= self.limit:
+                if stop_event.is_set() or finished():
+                    return False
+                self.cond.wait(0.5)
+        print(f"  ▶️ Autoscale: {pages.name} resumed (limit {self.limit})")
+        return True
+
+    def browser_rss_mb(self):
+        """(tổng RSS MB, số browser đang chạy) của các worker"""
+        with self.cond:
+            workers = list(self.workers.values())
+        total = 0
+        browsers = 0
+        for pages in workers:
+            pid = pages.driver_pid() if pages.browser else None
+            if not pid:
+                continue
+            pids = descendant_pids(pid)
+            if pids:
+                browsers += 1
+                total += sum(process_rss(child) for child in pids)
+        return total / 1024 / 1024, browsers
+
+    def sample(self):
+        free_mb, total_mb = self.metrics.memory_mb()
+        browser_mb, browsers = self.browser_rss_mb()
+        self.peak_browser_mb = max(self.peak_browser_mb, browser_mb)
+        return {
+            'cpu': self.metrics.cpu_percent(),
+            'free_mb': free_mb,
+            'total_mb': total_mb,
+            'browser_mb': browser_mb,
+            'browsers': browsers,
+        }
+
+    def decide(self, sample, now):
+        """(limit mới, lý do) hoặc (limit hiện tại, None) nếu giữ nguyên"""
+        limit = self.limit
+        per_browser = sample['browser_mb'] / sample['browsers'] if sample['browsers'] else 0
+        low_memory = sample['free_mb'] < self.min_free_mb
+        over_budget = self.max_browser_mb is not None and sample['browser_mb'] > self.max_browser_mb
+        cooling = now - self.last_change < self.cooldown
+
+        if limit > self.min_workers:
+            if low_memory:
+                return limit - 1, f"free memory {sample['free_mb']:.0f} MB < {self.min_free_mb} MB"
+            if over_budget:
+                return limit - 1, f"browsers {sample['browser_mb']:.0f} MB > {self.max_browser_mb} MB"
+            if sample['cpu'] > self.cpu_high and not cooling:
+                return limit - 1, f"CPU {sample['cpu']:.0f}% > {self.cpu_high:.0f}%"
+
+        if limit < self.max_workers and not cooling and not low_memory and not over_budget:
+            room = sample['free_mb'] - self.min_free_mb >= per_browser
+            budget = self.max_browser_mb is None or sample['browser_mb'] + per_browser <= self.max_browser_mb
+            if sample['cpu'] < self.cpu_low and room and budget:
+                fits = f", room for ~{per_browser:.0f} MB browser" if per_browser else ''
+                return limit + 1, f"CPU {sample['cpu']:.0f}% < {self.cpu_low:.0f}%{fits}"
+        return limit, None
+
+    def tick(self):
+        now = time.monotonic()
+        sample = self.sample()
+        limit, reason = self.decide(sample, now)
+        if reason is None:
+            return
+        with self.cond:
+            previous, self.limit = self.limit, limit
+            self.cond.notify_all()
+        self.last_change = now
+        self.decisions.append((time.time(), previous, limit, reason))
+        arrow = '📈' if limit > previous else '📉'
+        print(f"  {arrow} Autoscale: {previous} → {limit} workers ({reason}; "
+              f"CPU {sample['cpu']:.0f}%, free {sample['free_mb']:.0f}/{sample['total_mb']:.0f} MB, "
+              f"{sample['browsers']} browsers {sample['browser_mb']:.0f} MB)")
+
+    def loop(self):
+        while not self.stop_event.wait(self.interval):
+            try:
+                self.tick()
+            except Exception as e:
+                print(f"  ⚠️ Autoscale sample failed: {str(e)[:80]}")
+
+    def start(self):
+        self.metrics = HostMetrics()
+        self.last_change = time.monotonic()
+        self.stop_event.clear()
+        self.thread = threading.Thread(target=self.loop, name='autoscale', daemon=True)
+        self.thread.start()
+        print(f"Autoscale: {self.limit} workers (range {self.min_workers}..{self.max_workers}, "
+              f"{os.cpu_count()} CPUs)")
+
+    def stop(self):
+        self.stop_event.set()
+        if self.thread:
+            self.thread.join(timeout=self.interval * 2)
+            self.thread = None
+
+    def summary(self):
+        ups = sum(1 for _, previous, limit, _ in self.decisions if limit > previous)
+        downs = len(self.decisions) - ups
+        return (f"Autoscale: {len(self.decisions)} changes ({ups} up, {downs} down), final {self.limit} workers, "
+                f"peak browser RSS {self.peak_browser_mb:.0f} MB")
@@ -0,0 +1,277 @@
+"""
+Pool browser từ xa: worker Python chỉ chạy Playwright driver, Chromium nằm trên máy riêng.
+
+    python browser_pool.py serve --count 2 --port 9222     (Chromium local để thử, CDP)
+
+Job file:
+    "browser_pool": {"endpoints": ["http://10.0.0.5:9222", "http://10.0.0.6:9222"], "max_sessions": 4}
+    "browser_pool": {"endpoints": [{"url": "ws://10.0.0.7:3000/", "type": "playwright"}]}
+"""
+import time
+import socket
+import threading
+import urllib.request
+from urllib.parse import urlparse
+
+
+class Endpoint:
+    """
+    1 browser server. type 'cdp' (Chromium --remote-debugging-port, connect_over_cdp) hoặc
+    'playwright' (launchServer/run-server, browser_type.connect). Mặc định: http(s):// là CDP,
+    ws:// có '/devtools/' là CDP, còn lại là Playwright server.
+    """
+
+    def __init__(self, url, type=None, max_sessions=None):
+        self.url = url.rstrip('/') if url.startswith('http') else url
+        parsed = urlparse(url)
+        if type is None:
+            type = 'cdp' if parsed.scheme in ('http', 'https') or '/devtools/' in parsed.path else 'playwright'
+        if type not in ('cdp', 'playwright'):
+            raise ValueError(f"Unknown browser endpoint type: {type} (cdp | playwright)")
+        self.type = type
+        self.host = parsed.hostname
+        self.port = parsed.port or (443 if parsed.scheme in ('https', 'wss') else 80)
+        self.max_sessions = max_sessions
+
+        self.healthy = True
+        self.sessions = 0
+        self.connects = 0
+        self.failures = 0
+        self.last_error = None
+
+    def __str__(self):
+        return self.url
+
+    def probe(self, timeout=5.0):
+        """Health check: CDP qua /json/version, Playwright server thì chỉ mở được TCP là đủ"""
+        if self.type == 'cdp' and self.url.startswith('http'):
+            with urllib.request.urlopen(f"{self.url}/json/version", timeout=timeout) as response:
+                response.read()
+        else:
+            with socket.create_connection((self.host, self.port), timeout=timeout):
+                pass
+
+    def close_target(self, target_id, timeout=5.0):
+        """Đóng 1 tab qua CDP HTTP (không qua Playwright, gọi được từ thread khác)"""
+        if self.type != 'cdp' or not self.url.startswith('http'):
+            raise RuntimeError(f"cannot close pages on {self.type} endpoint {self.url}")
+        with urllib.request.urlopen(f"{self.url}/json/close/{target_id}", timeout=timeout) as response:
+            response.read()
+
+
+class BrowserPool:
+    """
+    Kết nối tới nhiều browser server chạy lâu dài thay vì launch Chromium local
+    (engine.launch_browser dùng pool.connect khi engine có browser_pool).
+
+    - Load balancing: endpoint khỏe có ít session nhất (so với max_sessions) được chọn.
+    - Health check: thread nền probe mọi endpoint mỗi health_interval giây, endpoint lỗi
+      (probe hoặc connect thất bại) chỉ được thử sau cùng tới khi probe lại thành công.
+    - Reconnect: connect lỗi thì thử endpoint kế tiếp; browser bị ngắt giữa chừng
+      (server restart, mạng) thì WorkerPage bỏ browser cũ, lần get() sau connect lại
+      và sản phẩm đang làm dở được thử lại.
+
+    Watchdog không kill được Chromium ở máy khác: với endpoint CDP qua http, page treo
+    được đóng qua /json/close/<target>; Playwright server thì chỉ còn timeout của từng bước.
+    """
+
+    def __init__(self, endpoints, max_sessions=None, health_interval=15.0, connect_timeout=30.0,
+                 probe_timeout=5.0):
+        if not endpoints:
+            raise ValueError("Browser pool needs at least 1 endpoint")
+        self.endpoints = []
+        for endpoint in endpoints:
+            endpoint = {'url': endpoint} if isinstance(endpoint, str) else dict(endpoint)
+            endpoint.setdefault('max_sessions', max_sessions)
+            self.endpoints.append(Endpoint(**endpoint))
+        self.health_interval = health_interval
+        self.connect_timeout = connect_timeout
+        self.probe_timeout = probe_timeout
+
+        self.lock = threading.Lock()
+        self.turn = 0
+        self.browsers = {}
+        self.targets = {}
+        self.stop_event = threading.Event()
+        self.thread = None
+
+    def start(self):
+        if self.thread:
+            return
+        self.check_health()
+        self.stop_event.clear()
+        self.thread = threading.Thread(target=self.loop, name='browser-pool', daemon=True)
+        self.thread.start()
+        healthy = sum(endpoint.healthy for endpoint in self.endpoints)
+        print(f"Browser pool: {healthy}/{len(self.endpoints)} endpoints healthy")
+
+    def stop(self):
+        self.stop_event.set()
+        if self.thread:
+            self.thread.join(timeout=self.probe_timeout * 2)
+            self.thread = None
+
+    def loop(self):
+        while not self.stop_event.wait(self.health_interval):
+            self.check_health()
+
+    def check_health(self):
+        for endpoint in self.endpoints:
+            try:
+                endpoint.probe(self.probe_timeout)
+                ok, error = True, None
+            except Exception as e:
+                ok, error = False, str(e)[:80]
+            self.mark(endpoint, ok, error)
+
+    def mark(self, endpoint, ok, error=None):
+        with self.lock:
+            changed = endpoint.healthy != ok
+            endpoint.healthy = ok
+            if not ok:
+                endpoint.failures += 1
+                endpoint.last_error = error
+        if changed:
+            state = "back up" if ok else f"down ({error})"
+            print(f"  🌐 Browser endpoint {endpoint} {state}")
+
+    def candidates(self):
+        """Endpoint theo thứ tự ưu tiên: khỏe trước, ít session (theo tỉ lệ max_sessions) trước"""
+        with self.lock:
+            self.turn += 1
+            count = len(self.endpoints)
+            # Xoay vòng điểm bắt đầu để các endpoint bằng tải được chia đều
+            rotated = [self.endpoints[(self.turn + idx) % count] for idx in range(count)]
+
+            def load(endpoint):
+                return endpoint.sessions / endpoint.max_sessions if endpoint.max_sessions else endpoint.sessions
+            return sorted(rotated, key=lambda endpoint: (not endpoint.healthy, load(endpoint)))
+
+    def connect(self, p):
+        """Browser trên endpoint tốt nhất; lỗi thì thử lần lượt các endpoint còn lại"""
+        errors = []
+        for endpoint in self.candidates():
+            with self.lock:
+                endpoint.sessions += 1
+            try:
+                browser = self.open(p, endpoint)
+            except Exception as e:
+                with self.lock:
+                    endpoint.sessions -= 1
+                errors.append(f"{endpoint}: {str(e)[:60]}")
+                self.mark(endpoint, False, str(e)[:80])
+                continue
+            with self.lock:
+                endpoint.connects += 1
+                self.browsers[id(browser)] = endpoint
+            browser.on('disconnected', lambda _browser, key=id(browser): self.release(key))
+            return browser
+        raise RuntimeError(f"No browser endpoint available ({'; '.join(errors)})")
+
+    def open(self, p, endpoint):
+        timeout = self.connect_timeout * 1000
+        if endpoint.type == 'cdp':
+            return p.chromium.connect_over_cdp(endpoint.url, timeout=timeout)
+        return p.chromium.connect(endpoint.url, timeout=timeout)
+
+    def release(self, key):
+        with self.lock:
+            endpoint = self.browsers.pop(key, None)
+            if endpoint:
+                endpoint.sessions = max(endpoint.sessions - 1, 0)
+
+    def register_page(self, browser, page):
+        """Ghi target id của page (CDP) để close_page() đóng được từ thread watchdog"""
+        with self.lock:
+            endpoint = self.browsers.get(id(browser))
+        if endpoint is None or endpoint.type != 'cdp':
+            return
+        try:
+            session = page.context.new_cdp_session(page)
+            target_id = session.send('Target.getTargetInfo')['targetInfo']['targetId']
+            session.detach()
+        except Exception:
+            return
+        with self.lock:
+            self.targets[id(page)] = (endpoint, target_id)
+
+    def forget_page(self, page):
+        with self.lock:
+            self.targets.pop(id(page), None)
+
+    def close_page(self, page):
+        with self.lock:
+            target = self.targets.pop(id(page), None)
+        if target is None:
+            raise RuntimeError("remote page not registered")
+        endpoint, target_id = target
+        endpoint.close_target(target_id, self.probe_timeout)
+
+    def summary(self):
+        parts = []
+        for endpoint in self.endpoints:
+            state = 'up' if endpoint.healthy else 'down'
+            parts.append(f"{endpoint} {state}, {endpoint.connects} connects, {endpoint.failures} failures")
+        return "Browser pool: " + "; ".join(parts)
+
+
+def serve(count=1, port=9222, headless=True):
+    """Chạy `count` Chromium local với --remote-debugging-port (port, port+1, ...) tới khi Ctrl+C"""
+    import shutil
+    import tempfile
+    import subprocess
+    from playwright.sync_api import sync_playwright
+
+    with sync_playwright() as p:
+        executable = p.chromium.executable_path
+
+    processes = []
+    profiles = []
+    try:
+        for idx in range(count):
+            profile = tempfile.mkdtemp(prefix='browser_pool_')
+            profiles.append(profile)
+            args = [executable, f'--remote-debugging-port={port + idx}', '--remote-debugging-address=127.0.0.1',
+                    f'--user-data-dir={profile}', '--no-first-run', '--no-default-browser-check']
+            if headless:
+                args.append('--headless=new')
+            processes.append(subprocess.Popen(args, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL))
+            print(f"✓ Browser {idx + 1}: http://127.0.0.1:{port + idx}")
+        print("Ctrl+C để dừng")
+        while all(process.poll() is None for process in processes):
+            time.sleep(1)
+        print("⚠️ A browser exited")
+    except KeyboardInterrupt:
+        pass
+    finally:
+        for process in processes:
+            process.terminate()
+        for process in processes:
+            try:
+                process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                process.kill()
+        for profile in profiles:
+            shutil.rmtree(profile, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(prog='browser_pool.py', description='Browser server cho BrowserPool')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    serve_parser = subparsers.add_parser('serve', help="Chạy Chromium local với CDP")
+    serve_parser.add_argument('--count', type=int, default=1)
+    serve_parser.add_argument('--port', type=int, default=9222)
+    serve_parser.add_argument('--headed', action='store_true')
+    check = subparsers.add_parser('check', help="Health check các endpoint")
+    check.add_argument('endpoints', nargs='+')
+    args = parser.parse_args()
+
+    if args.command == 'serve':
+        serve(args.count, args.port, headless=not args.headed)
+    else:
+        pool = BrowserPool(args.endpoints)
+        pool.check_health()
+        for endpoint in pool.endpoints:
+            print(f"{endpoint} ({endpoint.type}): {'up' if endpoint.healthy else f'down ({endpoint.last_error})'}")
@@ -0,0 +1,442 @@
+"""
+CLI chung cho các crawler:
+
+    python cli.py crawl jobs/example_job.json
+    python cli.py crawl --site tno --collection https://theneworiginals.co/collections/ao-thun-relaxed-fit
+    python cli.py resume jobs/example_job.json
+    python cli.py status jobs/example_job.json      (hoặc --site coolmate)
+    python cli.py export ~/Downloads/seed_data.xlsx --format sqlite --out seed.db
+    python cli.py bench ~/Downloads/seed_data.xlsx
+    python cli.py microbench --sizes 1k,100k --baseline bench_results.json
+    python cli.py merge shard1/seed_data.xlsx shard2/seed_data.xlsx --out ~/Downloads/seed_data.xlsx
+
+Job file (JSON), 1 job hoặc {"jobs": [...], "parallel": {...}}:
+    {
+        "site": "tno",                            coolmate | tno | seed
+        "collections": ["https://..."],
+        "discovery": "sitemap",                   browser | sitemap
+        "extract_workers": 2, "upload_workers": 4, "headless": true,
+        "storage": "local:/data/images",          cloudinary | local:<dir> | s3://bucket/prefix
+        "preprocess": {"max_dimension": 1600, "format": "webp", "quality": 80, "workers": 4},
+        "max_products": 100,
+        "product_deadline": 180, "product_retries": 1,   giây/sản phẩm (null = tắt), số lần thử lại
+        "sink": {"keep_records": false, "checkpoint_every": 100, "resume": false},
+        "http_cache": {"dir": "...", "mode": "record"},
+        "snapshots": "...", "fetch_only": false,
+        "tracer": {"dir": "...", "threshold": 30, "budget_mb": 500,
+                   "snapshots": true, "screenshots": false, "profile": false},
+        "recrawl": {"budget_seconds": 3600, "budget_requests": 500, "min_probability": 0.05,
+                    "max_age": 2592000},          giây, quá hạn này thì luôn check lại
+        "delta": true,                            ghi <file_stem>_delta_<timestamp>.jsonl.gz
+        "autoscale": {"min_workers": 1, "max_workers": 6, "min_free_mb": 1024, "max_browser_mb": 4096},
+                                                  số extract worker theo CPU/RAM (thay extract_workers)
+        "browser_pool": {"endpoints": ["http://10.0.0.5:9222"], "max_sessions": 4},
+                                                  browser từ xa (CDP/Playwright server) thay vì Chromium local
+        "weight": 2, "max_concurrency": 3         (chỉ khi chạy parallel)
+    }
+
+"parallel": {"extract_workers": 4, "upload_workers": 8} (hoặc crawl --parallel) chạy mọi job
+trong 1 process (MultiSitePipeline): chung browser pool, chung upload, chia worker theo weight.
+Worker/browser dùng chung cho mọi site, nên "autoscale" và "browser_pool" chỉ đặt được trong
+"parallel" (áp dụng cho mọi job); đặt trong từng job khi chạy parallel thì báo lỗi.
+
+Module nặng (playwright, openpyxl, cloudinary, lxml) chỉ được import bên trong lệnh cần
+chúng, nên status/export khởi động gần như tức thì.
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import importlib
+
+# site -> (module, class crawler, file_stem của sink, storage_folder của adapter)
+SITES = {
+    'coolmate': ('crawler', 'CoolmateCrawler', 'lecas_data', 'coolmate'),
+    'tno': ('crawler_tno', 'TheNewOriginalsCrawler', 'tno_data', 'theneworiginals'),
+    'seed': ('seed_crawler', 'SeedDataCrawler', 'seed_data', 'theneworiginals'),
+}
+
+# Option hợp lệ trong "sink" của từng site (tham số sink của constructor crawler)
+SINK_OPTIONS = {
+    'coolmate': ('keep_records', 'checkpoint_every', 'resume'),
+    'tno': ('keep_records', 'checkpoint_every', 'resume'),
+    'seed': ('checkpoint_every', 'resume'),
+}
+
+ENGINE_OPTIONS = ('headless', 'extract_workers', 'upload_workers', 'discovery', 'storage', 'fetch_only', 'static_html',
+                  'product_deadline', 'product_retries', 'watchdog_grace')
+
+
+def downloads_path(filename):
+    return os.path.join(os.path.expanduser('~'), 'Downloads', filename)
+
+
+def load_jobs(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        config = json.load(f)
+    jobs = config['jobs'] if isinstance(config, dict) and 'jobs' in config else config
+    jobs = jobs if isinstance(jobs, list) else [jobs]
+    for job in jobs:
+        if job.get('site') not in SITES:
+            raise SystemExit(f"⚠️ Unknown site {job.get('site')!r} in {path} (chọn: {', '.join(SITES)})")
+        unknown = sorted(set(job.get('sink', {})) - set(SINK_OPTIONS[job['site']]))
+        if unknown:
+            raise SystemExit(f"⚠️ Unknown sink option {', '.join(unknown)} for site {job['site']} in {path} "
+                             f"(chọn: {', '.join(SINK_OPTIONS[job['site']])})")
+    return jobs
+
+
+def load_parallel(path):
+    """Cấu hình "parallel" của job file ({} nếu không có)"""
+    with open(path, 'r', encoding='utf-8') as f:
+        config = json.load(f)
+    parallel = config.get('parallel') if isinstance(config, dict) else None
+    return parallel if isinstance(parallel, dict) else ({} if parallel else None)
+
+
+def jobs_from_args(args):
+    if args.job:
+        jobs = load_jobs(args.job)
+    elif args.site:
+        jobs = [{'site': args.site}]
+    else:
+        raise SystemExit("⚠️ Cần job file hoặc --site")
+
+    for job in jobs:
+        if getattr(args, 'collection', None):
+            job['collections'] = args.collection
+        if getattr(args, 'workers', None):
+            job['extract_workers'] = args.workers
+        if getattr(args, 'storage', None):
+            job['storage'] = args.storage
+    return jobs
+
+
+def build_crawler(job, resume=False, storages=None):
+    module_name, class_name, file_stem, _ = SITES[job['site']]
+    crawler_class = getattr(importlib.import_module(module_name), class_name)
+
+    options = {key: job[key] for key in ENGINE_OPTIONS if key in job}
+    if storages is not None:
+        # Job dùng cùng cấu hình storage + preprocess thì dùng chung 1 backend (chung thread pool
+        # upload và process pool preprocess); backend được tạo kèm preprocessor, không sửa sau
+        from storage import make_storage
+        key = (job.get('storage') or '', json.dumps(job.get('preprocess') or None, sort_keys=True))
+        if key not in storages:
+            preprocessor = None
+            if job.get('preprocess'):
+                from image_prep import ImagePreprocessor
+                preprocessor = ImagePreprocessor(**job['preprocess'])
+            storages[key] = make_storage(job.get('storage'), preprocessor)
+        options['storage'] = storages[key]
+    if job.get('http_cache'):
+        from http_cache import HttpCache
+        cache = job['http_cache']
+        options['http_cache'] = HttpCache(cache['dir'], mode=cache.get('mode', 'record'),
+                                          ttl=cache.get('ttl', 7 * 24 * 3600))
+    if job.get('snapshots'):
+        from snapshots import SnapshotStore
+        options['snapshot_store'] = SnapshotStore(job['snapshots'])
+    if job.get('tracer'):
+        from page_tracer import SlowPageTracer
+        tracer = job['tracer']
+        options['tracer'] = SlowPageTracer(tracer['dir'], threshold=tracer.get('threshold', 30.0),
+                                           budget_mb=tracer.get('budget_mb', 500),
+                                           snapshots=tracer.get('snapshots', True),
+                                           screenshots=tracer.get('screenshots', False),
+                                           profile=tracer.get('profile', False))
+    if job.get('preprocess') and storages is None:
+        from image_prep import ImagePreprocessor
+        options['image_preprocessor'] = ImagePreprocessor(**job['preprocess'])
+    if job.get('recrawl'):
+        from recrawl import RecrawlScheduler
+        recrawl = dict(job['recrawl'])
+        db_path = recrawl.pop('db', None) or downloads_path(f'{file_stem}_history.db')
+        options['scheduler'] = RecrawlScheduler(db_path, **recrawl)
+    if job.get('browser_pool'):
+        from browser_pool import BrowserPool
+        options['browser_pool'] = BrowserPool(**job['browser_pool'])
+    if job.get('autoscale'):
+        from autoscale import Autoscaler
+        options['autoscaler'] = Autoscaler(**job['autoscale'])
+    if job.get('delta'):
+        from delta_export import DeltaExporter
+        options['delta'] = DeltaExporter(downloads_path(f'{file_stem}_snapshot.db'),
+                                         os.path.dirname(downloads_path(file_stem)), file_stem)
+
+    sink_options = dict(job.get('sink', {}))
+    if resume:
+        sink_options['resume'] = True
+
+    crawler = crawler_class(job.get('collections', []), **sink_options, **options)
+    if job.get('max_products'):
+        crawler.adapter.max_products = job['max_products']
+    return crawler
+
+
+def cmd_crawl(args, resume=False):
+    parallel = load_parallel(args.job) if args.job else None
+    if getattr(args, 'parallel', False):
+        parallel = parallel or {}
+    if parallel is not None:
+        return cmd_crawl_parallel(args, parallel, resume)
+
+    for idx, job in enumerate(jobs_from_args(args), 1):
+        if not job.get('collections'):
+            raise SystemExit(f"⚠️ Job {idx} ({job['site']}) không có collections")
+        print(f"=== JOB {idx}: {job['site']} ({len(job['collections'])} collections{', resume' if resume else ''}) ===")
+        start = time.time()
+        build_crawler(job, resume=resume).run()
+        print(f"=== JOB {idx} finished in {time.time() - start:.1f}s ===\n")
+
+
+def cmd_crawl_parallel(args, parallel, resume=False):
+    from multisite import MultiSitePipeline
+
+    jobs = jobs_from_args(args)
+    for idx, job in enumerate(jobs, 1):
+        shared = [option for option in ('autoscale', 'browser_pool') if job.get(option)]
+        if shared:
+            raise SystemExit(f"⚠️ Job {idx} ({job['site']}): {', '.join(shared)} dùng chung cho mọi job khi chạy "
+                             f"parallel, đặt trong \"parallel\" thay vì trong job")
+    autoscaler = None
+    if parallel.get('autoscale'):
+        from autoscale import Autoscaler
+        autoscaler = Autoscaler(**parallel['autoscale'])
+    browser_pool = None
+    if parallel.get('browser_pool'):
+        from browser_pool import BrowserPool
+        browser_pool = BrowserPool(**parallel['browser_pool'])
+    pipeline = MultiSitePipeline(extract_workers=parallel.get('extract_workers', 4),
+                                 upload_workers=parallel.get('upload_workers', 8),
+                                 autoscaler=autoscaler, browser_pool=browser_pool)
+    storages = {}
+    for idx, job in enumerate(jobs, 1):
+        if not job.get('collections'):
+            raise SystemExit(f"⚠️ Job {idx} ({job['site']}) không có collections")
+        site = job['site'] if job['site'] not in pipeline.engines else f"{job['site']}-{idx}"
+        pipeline.add_site(site, build_crawler(job, resume=resume, storages=storages),
+                          weight=job.get('weight', 1.0), max_concurrency=job.get('max_concurrency'))
+
+    print(f"=== PARALLEL: {', '.join(pipeline.engines)}{' (resume)' if resume else ''} ===")
+    start = time.time()
+    pipeline.run()
+    print(f"=== PARALLEL finished in {time.time() - start:.1f}s ===\n")
+
+
+def cmd_resume(args):
+    cmd_crawl(args, resume=True)
+
+
+def describe_file(path):
+    if not os.path.exists(path):
+        return 'missing'
+    stat = os.stat(path)
+    return f"{stat.st_size / 1024:.1f} KB, modified {time.strftime('%Y-%m-%d %H:%M', time.localtime(stat.st_mtime))}"
+
+
+def count_rows(db_path, table):
+    import sqlite3
+    conn = sqlite3.connect(db_path)
+    try:
+        return conn.execute(f'SELECT COUNT(*) FROM {table}').fetchone()[0]
+    except sqlite3.Error:
+        return 0
+    finally:
+        conn.close()
+
+
+def cmd_status(args):
+    for job in jobs_from_args(args):
+        _, _, file_stem, storage_folder = SITES[job['site']]
+        print(f"=== {job['site']} ===")
+
+        excel_path = downloads_path(f'{file_stem}.xlsx')
+        print(f"  Excel:         {excel_path} ({describe_file(excel_path)})")
+
+        journal_path = downloads_path(f'{file_stem}.journal.jsonl')
+        if os.path.exists(journal_path):
+            from seed_export import iter_latest
+            counts = {}
+            for kind, _ in iter_latest(journal_path):
+                counts[kind] = counts.get(kind, 0) + 1
+            if 'row' in counts:
+                print(f"  Journal:       {journal_path} ({counts['row']} rows)")
+            else:
+                print(f"  Journal:       {journal_path} "
+                      f"({counts.get('category', 0)} categories, {counts.get('color', 0)} colors, {counts.get('product', 0)} products)")
+
+        products_db = downloads_path(f'{file_stem}_products.db')
+        if os.path.exists(products_db):
+            from dedup import ProductIndex
+            index = ProductIndex(products_db)
+            print(f"  Product index: {index.summary()}")
+            index.close()
+
+        seen_db = downloads_path(f'{file_stem}_seen.db')
+        if os.path.exists(seen_db):
+            print(f"  Seen index:    {count_rows(seen_db, 'products')} product names")
+
+        history_db = downloads_path(f'{file_stem}_history.db')
+        if os.path.exists(history_db):
+            print(f"  Recrawl:       {count_rows(history_db, 'products')} products, "
+                  f"{count_rows(history_db, 'collections')} collections with change history")
+
+        sitemap_db = downloads_path(f'{storage_folder}_sitemap.db')
+        if os.path.exists(sitemap_db):
+            print(f"  Sitemap state: {count_rows(sitemap_db, 'lastmod')} lastmod entries")
+        print()
+
+
+def cmd_export(args):
+    from db_export import resolve_journal, export_csv, export_sql, load_sqlite, TABLE_ORDER
+
+    journal_path = resolve_journal(args.source)
+    if not os.path.exists(journal_path):
+        raise SystemExit(f"⚠️ Journal not found: {journal_path}")
+
+    start = time.time()
+    if args.format == 'xlsx':
+        from seed_export import SeedExcelExporter
+        excel_path = journal_path[:-len('.journal.jsonl')] + '.xlsx'
+        exporter = SeedExcelExporter.recover(excel_path)
+        exporter.write_workbook(args.out or excel_path)
+        print(f"✓ Rebuilt {args.out or excel_path} ({time.time() - start:.2f}s)")
+        return
+
+    if not args.out:
+        raise SystemExit("⚠️ --out is required")
+    if args.format in ('csv', 'tsv'):
+        counts = export_csv(journal_path, args.out, delimiter='\t' if args.format == 'tsv' else ',')
+    elif args.format == 'sql':
+        counts = export_sql(journal_path, args.out, args.batch_size)
+    else:
+        counts = load_sqlite(journal_path, args.out, args.batch_size)
+
+    print(f"✓ Exported {args.format} → {args.out} ({time.time() - start:.2f}s)")
+    for table in TABLE_ORDER:
+        print(f"  - {table}: {counts[table]}")
+
+
+def cmd_merge(args):
+    """Gộp journal seed của nhiều shard (id ổn định theo key) rồi dựng workbook"""
+    from db_export import resolve_journal
+    from seed_export import SeedExcelExporter, merge_journals, journal_path_for
+
+    sources = [resolve_journal(source) for source in args.sources]
+    missing = [path for path in sources if not os.path.exists(path)]
+    if missing:
+        raise SystemExit(f"⚠️ Journal not found: {', '.join(missing)}")
+
+    start = time.time()
+    counts = merge_journals(sources, journal_path_for(args.out))
+    exporter = SeedExcelExporter.recover(args.out)
+    exporter.write_workbook(args.out)
+    print(f"✓ Merged {len(sources)} journals → {args.out} ({time.time() - start:.2f}s)")
+    print(f"  - Categories: {counts['category']}, Colors: {counts['color']}, Products: {counts['product']}")
+    print(f"  - Duplicates dropped: {counts['duplicates']}, id conflicts: {counts['conflicts']}")
+
+
+def cmd_bench(args):
+    """Đo thời gian export journal ra từng định dạng (thư mục tạm)"""
+    import shutil
+    import tempfile
+    from db_export import resolve_journal, export_csv, export_sql, load_sqlite
+
+    journal_path = resolve_journal(args.source)
+    if not os.path.exists(journal_path):
+        raise SystemExit(f"⚠️ Journal not found: {journal_path}")
+
+    work_dir = tempfile.mkdtemp(prefix='crawl_bench_')
+    try:
+        runs = [
+            ('csv', lambda: export_csv(journal_path, os.path.join(work_dir, 'csv'))),
+            ('tsv', lambda: export_csv(journal_path, os.path.join(work_dir, 'tsv'), delimiter='\t')),
+            ('sql', lambda: export_sql(journal_path, os.path.join(work_dir, 'seed.sql'))),
+            ('sqlite', lambda: load_sqlite(journal_path, os.path.join(work_dir, 'seed.db'))),
+        ]
+        print(f"Benchmark export: {journal_path} ({describe_file(journal_path)}), {args.repeat} run(s) each")
+        for name, run in runs:
+            timings = []
+            for _ in range(args.repeat):
+                start = time.perf_counter()
+                counts = run()
+                timings.append(time.perf_counter() - start)
+            best = min(timings)
+            products = counts['products']
+            print(f"  {name:<7} best {best:7.3f}s  ({products / best if best else 0:,.0f} products/s)")
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+def cmd_microbench(args):
+    """Microbenchmark chuẩn hóa/ghi Excel trên catalog tổng hợp (xem microbench.py)"""
+    import microbench
+
+    code = microbench.main(args.args)
+    if code:
+        raise SystemExit(code)
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog='cli.py', description='Crawler CLI')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    def add_job_arguments(sub, crawl=True):
+        sub.add_argument('job', nargs='?', help="Job file (JSON)")
+        sub.add_argument('--site', choices=list(SITES))
+        if crawl:
+            sub.add_argument('--collection', action='append', help="Collection URL (lặp lại được), ghi đè job file")
+            sub.add_argument('--workers', type=int, help="Số extract worker")
+            sub.add_argument('--storage', help="cloudinary | local:<dir> | s3://bucket/prefix")
+            sub.add_argument('--parallel', action='store_true', help="Chạy mọi job cùng lúc, chung browser/upload pool")
+
+    crawl = subparsers.add_parser('crawl', help="Chạy job crawl")
+    add_job_arguments(crawl)
+    crawl.set_defaults(func=cmd_crawl)
+
+    resume = subparsers.add_parser('resume', help="Chạy tiếp job (giữ output và index của lần trước)")
+    add_job_arguments(resume)
+    resume.set_defaults(func=cmd_resume)
+
+    status = subparsers.add_parser('status', help="Trạng thái output/index của job")
+    add_job_arguments(status, crawl=False)
+    status.set_defaults(func=cmd_status)
+
+    export = subparsers.add_parser('export', help="Export seed journal (csv/tsv/sql/sqlite/xlsx)")
+    export.add_argument('source', help="seed_data.xlsx hoặc seed_data.journal.jsonl")
+    export.add_argument('--format', choices=['csv', 'tsv', 'sql', 'sqlite', 'xlsx'], default='csv')
+    export.add_argument('--out', help="Thư mục (csv/tsv) hoặc file (sql/sqlite/xlsx)")
+    export.add_argument('--batch-size', type=int, default=1000)
+    export.set_defaults(func=cmd_export)
+
+    merge = subparsers.add_parser('merge', help="Gộp seed journal của nhiều shard")
+    merge.add_argument('sources', nargs='+', help="seed_data.xlsx hoặc seed_data.journal.jsonl của từng shard")
+    merge.add_argument('--out', required=True, help="seed_data.xlsx gộp (journal ghi cạnh đó)")
+    merge.set_defaults(func=cmd_merge)
+
+    bench = subparsers.add_parser('bench', help="Đo tốc độ export journal")
+    bench.add_argument('source', help="seed_data.xlsx hoặc seed_data.journal.jsonl")
+    bench.add_argument('--repeat', type=int, default=3)
+    bench.set_defaults(func=cmd_bench)
+
+    micro = subparsers.add_parser('microbench', add_help=False,
+                                  help="Microbenchmark chuẩn hóa/ghi Excel (tham số: python microbench.py --help)")
+    micro.set_defaults(func=cmd_microbench)
+
+    return parser
+
+
+def main(argv=None):
+    parser = build_parser()
+    args, extra = parser.parse_known_args(argv)
+    if args.command == 'microbench':
+        args.args = extra
+    elif extra:
+        parser.error(f"unrecognized arguments: {' '.join(extra)}")
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -1,45 +1,133 @@
-import os
 import re
 import time
-from playwright.sync_api import sync_playwright
-import cloudinary
-import cloudinary.uploader
-from openpyxl import Workbook
-from openpyxl.styles import Font, Alignment
-import requests
-from io import BytesIO
-from dotenv import load_dotenv
-import signal
-from functools import wraps
+from urllib.parse import urlparse, parse_qs, urljoin, urlencode
+from engine import CrawlEngine
+from records import ExtractedItem
+from deadline import step_timeout_ms, settle
+from sinks import ProductExcelSink
+from html_extract import parse_document, select, select_first, first_text, text_of, img_src, is_inside, unique
 
-load_dotenv()
+GALLERY_IMAGES_SCRIPT = """
+    () => {
+        const imgs = [];
 
-cloudinary_url = os.getenv('CLOUDINARY_URL')
-if cloudinary_url:
-    match = re.match(r'cloudinary://([^:]+):([^@]+)@(.+)', cloudinary_url)
-    if match:
-        api_key, api_secret, cloud_name = match.groups()
-        cloudinary.config(
-            cloud_name=cloud_name,
-            api_key=api_key,
-            api_secret=api_secret
-        )
+        const galleryContainer = document.querySelector('.no-scrollbar.absolute.left-5, [class*="no-scrollbar"]');
+        if (galleryContainer) {
+            const buttons = galleryContainer.querySelectorAll('button img');
+            buttons.forEach(img => {
+                const alt = img.getAttribute('alt');
+                if (!alt || !alt.startsWith('color ')) {
+                    const src = img.src || img.getAttribute('data-src');
+                    if (src && src.includes('n7media.coolmate.me')) {
+                        const cleanSrc = src.split('?')[0];
+                        imgs.push(cleanSrc);
+                    }
+                }
+            });
+        }
 
-class CoolmateCrawler:
-    def __init__(self, collection_urls):
-        self.collection_urls = collection_urls if isinstance(collection_urls, list) else [collection_urls]
-        self.products_data = []
-        self.excel_path = os.path.join(os.path.expanduser('~'), 'Downloads', 'lecas_data.xlsx')
-        self.wb = None
-        self.ws = None
-        self.row_index = 2
-        
+        if (imgs.length === 0) {
+            const allButtons = document.querySelectorAll('button img[alt*="Áo"], button img[alt*="Quần"]');
+            allButtons.forEach(img => {
+                const alt = img.getAttribute('alt');
+                if (!alt || !alt.startsWith('color ')) {
+                    const src = img.src || img.getAttribute('data-src');
+                    if (src && src.includes('n7media.coolmate.me') && src.includes('uploads')) {
+                        const parent = img.closest('.header, .footer, .menu, nav');
+                        if (!parent) {
+                            const cleanSrc = src.split('?')[0];
+                            imgs.push(cleanSrc);
+                        }
+                    }
+                }
+            });
+        }
+
+        return [...new Set(imgs)];
+    }
+"""
+
+DESCRIPTION_SCRIPT = """
+    () => {
+        const sections = [];
+
+        const features = document.querySelectorAll('[class*="feature"], [class*="benefit"], [class*="detail"]');
+        features.forEach(f => {
+            const text = f.textContent.trim();
+            if (text && text.length < 200) sections.push(text);
+        });
+
+        const details = document.querySelector('[class*="description"], [class*="Detail"], [class*="info"]');
+        if (details) {
+            const lines = details.textContent.split('\\n').map(l => l.trim()).filter(l => l);
+            sections.push(...lines);
+        }
+
+        return [...new Set(sections)].join('\\n\\n');
+    }
+"""
+
+PRODUCT_LINKS_SCRIPT = """
+    () => {
+        const links = Array.from(document.querySelectorAll('a[href*="/product/"]'));
+        return [...new Set(links.map(a => a.href))];
+    }
+"""
+
+LISTING_PAGE_PARAMS = ('page', 'p', 'pageIndex', 'page_index')
+
+
+def iter_listing_products(data):
+    """
+    Duyệt JSON của API listing, yield các object trông giống sản phẩm
+    (có name/title, link/slug và ít nhất 1 field giá). Giữ thứ tự xuất hiện.
+    """
+    stack = [data]
+    while stack:
+        node = stack.pop()
+        if isinstance(node, list):
+            stack.extend(reversed(node))
+            continue
+        if not isinstance(node, dict):
+            continue
+        name = node.get('name') or node.get('title')
+        link = node.get('url') or node.get('link') or node.get('href') or node.get('slug') or node.get('handle')
+        if isinstance(name, str) and isinstance(link, str) and any('price' in str(k).lower() for k in node):
+            yield node
+            continue
+        stack.extend(reversed([v for v in node.values() if isinstance(v, (dict, list))]))
+
+
+class CoolmateAdapter:
+    storage_folder = 'coolmate'
+    collection_marker = '/collection/'
+    max_images = 10
+    settle_delay = 2
+    static_html = False  # trang Coolmate render phía client, HTML tĩnh không đủ dữ liệu
+    sitemap_url = 'https://www.coolmate.me/sitemap.xml'
+    product_marker = '/product/'
+    base_url = 'https://www.coolmate.me'
+    harvest_listing = True
+    item_per_color = True
+    listing_scroll_pause = 1.0
+    listing_stall_rounds = 2
+    max_listing_pages = 50
+    
+    def __init__(self):
+        # product_url -> metadata (name, price, image) từ API listing, dùng khi trang sản phẩm
+        # không mở được hoặc thiếu field
+        self.listing = {}
     
     def extract_category(self, url):
         match = re.search(r'/collection/([^/?]+)', url)
         return match.group(1) if match else 'unknown'
     
     def crawl_collection(self, page, collection_url):
+        if self.harvest_listing:
+            found = self.harvest_collection(page, collection_url)
+            self.listing.update((url, meta) for url, meta in found.items() if meta)
+            return list(found)
+        
         print(f"\nCrawling collection: {collection_url}")
         page.goto(collection_url, wait_until='domcontentloaded', timeout=60000)
         time.sleep(3)
@@ -47,30 +135,122 @@ class CoolmateCrawler:
         page.evaluate("window.scrollTo(0, document.body.scrollHeight)")
         time.sleep(2)
         
-        product_links = page.evaluate("""
-            () => {
-                const links = Array.from(document.querySelectorAll('a[href*="/product/"]'));
-                return [...new Set(links.map(a => a.href))];
-            }
-        """)
+        product_links = page.evaluate(PRODUCT_LINKS_SCRIPT)
         
         print(f"Found {len(product_links)} products in this collection")
         return product_links
     
-    def upload_to_cloudinary(self, image_url, folder_name, timeout=30):
-        try:
-            result = cloudinary.uploader.upload(
-                image_url,
-                folder=f"coolmate/{folder_name}",
-                use_filename=True,
-                unique_filename=True,
-                timeout=timeout
-            )
-            return result['secure_url']
-        except Exception as e:
-            print(f"⚠️ Upload failed: {str(e)[:100]}")
+    # Harvest collection: nghe response JSON của API listing (page.on('response')) thay vì
+    # scroll 1 lần rồi sleep cố định. Nếu URL API có tham số trang thì gọi thẳng các trang
+    # tiếp theo; nếu không thì scroll tới khi không còn sản phẩm mới.
+    
+    def product_url_from_listing(self, node):
+        link = node.get('url') or node.get('link') or node.get('href') or node.get('slug') or node.get('handle')
+        if '/' not in link:
+            link = f"/product/{link}"
+        if '/product/' not in link:
             return None
+        return urljoin(self.base_url, link).split('?')[0]
+    
+    def listing_metadata(self, node):
+        price = next((node[k] for k in node if 'price' in str(k).lower() and node[k] not in (None, '')), None)
+        image = node.get('image') or node.get('thumbnail') or node.get('featured_image')
+        if isinstance(image, dict):
+            image = image.get('src') or image.get('url')
+        return {'name': node.get('name') or node.get('title'), 'price': price, 'image': image}
     
+    def collect_listing(self, data, found):
+        """Thêm sản phẩm trong 1 response JSON vào found (url -> metadata), trả về số sản phẩm mới"""
+        new = 0
+        for node in iter_listing_products(data):
+            product_url = self.product_url_from_listing(node)
+            if product_url and product_url not in found:
+                found[product_url] = self.listing_metadata(node)
+                new += 1
+        return new
+    
+    def page_listing_api(self, page, api_url, found):
+        """Gọi thẳng các trang tiếp theo của API listing (page.request), dừng khi hết sản phẩm mới"""
+        parsed = urlparse(api_url)
+        params = {k: v[0] for k, v in parse_qs(parsed.query).items()}
+        page_param = next((k for k in LISTING_PAGE_PARAMS if params.get(k, '').isdigit()), None)
+        if not page_param:
+            return False
+        
+        page_num = int(params[page_param])
+        for _ in range(self.max_listing_pages):
+            page_num += 1
+            params[page_param] = str(page_num)
+            try:
+                response = page.request.get(parsed._replace(query=urlencode(params)).geturl(), timeout=30000)
+                if not response.ok or self.collect_listing(response.json(), found) == 0:
+                    break
+            except Exception as e:
+                print(f"  ⚠️ Listing API page {page_num} failed: {str(e)[:50]}")
+                break
+        return True
+    
+    def harvest_collection(self, page, collection_url):
+        """Trả về dict product_url -> metadata (name, price, image) theo thứ tự trong collection"""
+        print(f"\nHarvesting collection: {collection_url}")
+        started = time.time()
+        found = {}
+        api_urls = []
+        
+        def on_response(response):
+            try:
+                if response.request.resource_type not in ('xhr', 'fetch'):
+                    return
+                if 'json' not in response.headers.get('content-type', ''):
+                    return
+                if self.collect_listing(response.json(), found):
+                    api_urls.append(response.url)
+            except Exception:
+                pass
+        
+        def collect_links():
+            for link in page.evaluate(PRODUCT_LINKS_SCRIPT):
+                found.setdefault(link.split('?')[0], {})
+        
+        page.on('response', on_response)
+        try:
+            page.goto(collection_url, wait_until='domcontentloaded', timeout=60000)
+            # wait_for_timeout (không phải time.sleep) để Playwright xử lý event response trong lúc chờ
+            page.wait_for_timeout(self.listing_scroll_pause * 1000)
+            
+            paged = bool(api_urls) and self.page_listing_api(page, api_urls[-1], found)
+            if not paged:
+                stalled = 0
+                last_count = -1
+                for _ in range(self.max_listing_pages):
+                    collect_links()
+                    if len(found) == last_count:
+                        stalled += 1
+                        if stalled >= self.listing_stall_rounds:
+                            break
+                    else:
+                        stalled = 0
+                        last_count = len(found)
+                    page.evaluate("window.scrollTo(0, document.body.scrollHeight)")
+                    page.wait_for_timeout(self.listing_scroll_pause * 1000)
+            collect_links()
+        finally:
+            page.remove_listener('response', on_response)
+        
+        with_metadata = sum(1 for meta in found.values() if meta)
+        print(f"Found {len(found)} products in this collection "
+              f"({with_metadata} from listing API, {'paged' if paged else 'scrolled'}, {time.time() - started:.1f}s)")
+        return found
+    
+    def iter_collection_links(self, page, collection_url):
+        yield self.crawl_collection(page, collection_url)
+    
+    def normalize_image_url(self, img_url):
+        if img_url.startswith('//'):
+            return 'https:' + img_url
+        if not img_url.startswith('http'):
+            return None
+        return img_url
     
     def get_product_colors(self, page):
         try:
@@ -107,14 +287,28 @@ class CoolmateCrawler:
         except:
             return [{'name': 'default', 'isCurrent': True}]
     
-    def crawl_product_detail(self, page, product_url, category):
+    def load_product_page(self, page, product_url):
         print(f"\nCrawling product: {product_url}")
         try:
-            page.goto(product_url, wait_until='domcontentloaded', timeout=45000)
-            time.sleep(2)
+            page.goto(product_url, wait_until='domcontentloaded', timeout=step_timeout_ms(45000))
+            settle(self.settle_delay)
+            return True
         except Exception as e:
             print(f"⚠️ Failed to load product page: {str(e)[:50]}")
-            return
+            return False
+    
+    def listing_item(self, product_url, category, listed):
+        """Item dựng từ metadata API listing (1 ảnh, không mô tả) khi trang sản phẩm không mở được"""
+        if not listed or not listed['name'] or not listed['image']:
+            return []
+        print(f"  ↪ Using listing data: {listed['name']}")
+        return [self.build_item(product_url, category, listed['name'], listed['price'], 'default',
+                                [listed['image']], '')]
+    
+    def extract_product(self, page, product_url, category):
+        listed = self.listing.get(product_url.split('?')[0])
+        if not self.load_product_page(page, product_url):
+            return self.listing_item(product_url, category, listed)
         
         product_name = page.evaluate("""
             () => {
@@ -131,268 +325,149 @@ class CoolmateCrawler:
             }
         """)
         
+        if listed:
+            if product_name == 'Unknown Product' and listed['name']:
+                product_name = listed['name']
+            if price == 'N/A' and listed['price'] is not None:
+                price = listed['price']
+        
         colors = self.get_product_colors(page)
         print(f"Product: {product_name}, Price: {price}, Colors found: {len(colors)}")
         
+        items = []
         for idx, color_info in enumerate(colors, 1):
             color_name = color_info.get('name', 'default')
             print(f"  [{idx}/{len(colors)}] Color: {color_name}")
             
             try:
                 if idx > 1:
-                    try:
-                        print(f"    Clicking color button...", end=' ')
-                        clicked = page.evaluate(f"""
-                            () => {{
-                                const colorImg = document.querySelector('img[alt="color {color_name}"]');
-                                if (colorImg) {{
-                                    const button = colorImg.closest('button');
-                                    if (button) {{
-                                        button.click();
-                                        return true;
-                                    }}
-                                }}
-                                return false;
-                            }}
-                        """)
-                        
-                        if clicked:
-                            time.sleep(2)
-                            print("✓")
-                        else:
-                            print("✗ Button not found")
-                    except Exception as e:
-                        print(f"✗ Failed to click: {str(e)[:50]}")
-                
-                images = page.evaluate("""
-                    () => {
-                        const imgs = [];
-                        
-                        const galleryContainer = document.querySelector('.no-scrollbar.absolute.left-5, [class*="no-scrollbar"]');
-                        if (galleryContainer) {
-                            const buttons = galleryContainer.querySelectorAll('button img');
-                            buttons.forEach(img => {
-                                const alt = img.getAttribute('alt');
-                                if (!alt || !alt.startsWith('color ')) {
-                                    const src = img.src || img.getAttribute('data-src');
-                                    if (src && src.includes('n7media.coolmate.me')) {
-                                        const cleanSrc = src.split('?')[0];
-                                        imgs.push(cleanSrc);
-                                    }
-                                }
-                            });
-                        }
-                        
-                        if (imgs.length === 0) {
-                            const allButtons = document.querySelectorAll('button img[alt*="Áo"], button img[alt*="Quần"]');
-                            allButtons.forEach(img => {
-                                const alt = img.getAttribute('alt');
-                                if (!alt || !alt.startsWith('color ')) {
-                                    const src = img.src || img.getAttribute('data-src');
-                                    if (src && src.includes('n7media.coolmate.me') && src.includes('uploads')) {
-                                        const parent = img.closest('.header, .footer, .menu, nav');
-                                        if (!parent) {
-                                            const cleanSrc = src.split('?')[0];
-                                            imgs.push(cleanSrc);
-                                        }
-                                    }
-                                }
-                            });
-                        }
-                        
-                        return [...new Set(imgs)];
-                    }
-                """)
-                
-                description = page.evaluate("""
-                () => {
-                    const sections = [];
-                    
-                    const features = document.querySelectorAll('[class*="feature"], [class*="benefit"], [class*="detail"]');
-                    features.forEach(f => {
-                        const text = f.textContent.trim();
-                        if (text && text.length < 200) sections.push(text);
-                    });
-                    
-                    const details = document.querySelector('[class*="description"], [class*="Detail"], [class*="info"]');
-                    if (details) {
-                        const lines = details.textContent.split('\\n').map(l => l.trim()).filter(l => l);
-                        sections.push(...lines);
-                    }
-                    
-                    return [...new Set(sections)].join('\\n\\n');
-                }
-                """)
+                    self.select_color(page, color_name)
                 
-                print(f"    Found {len(images)} images")
+                images = page.evaluate(GALLERY_IMAGES_SCRIPT)
+                if not images and listed and listed['image']:
+                    images = [listed['image']]
+                description = page.evaluate(DESCRIPTION_SCRIPT)
                 
-                uploaded_images = []
-                max_images = min(len(images), 10)
-                for img_idx, img_url in enumerate(images[:max_images]):
-                    if img_url.startswith('//'):
-                        img_url = 'https:' + img_url
-                    elif not img_url.startswith('http'):
-                        img_url = 'https:' + img_url if img_url.startswith('//') else None
-                    
-                    if not img_url:
-                        continue
-                        
-                    print(f"    [{img_idx+1}/{max_images}] Uploading...", end=' ')
-                    uploaded_url = self.upload_to_cloudinary(img_url, f"{category}/{product_name.replace(' ', '_')}/{color_name}", timeout=30)
-                    if uploaded_url:
-                        uploaded_images.append(uploaded_url)
-                        print("✓")
-                    else:
-                        print("✗ Skip")
-                
-                if len(uploaded_images) > 0:
-                    product_data = {
-                        'category': category,
-                        'product_name': product_name,
-                        'price': price,
-                        'color': color_name,
-                        'images': ', '.join(uploaded_images),
-                        'description': description
-                    }
-                    self.products_data.append(product_data)
-                    
-                    if self.append_to_excel(product_data):
-                        print(f"    ✓ Saved {len(uploaded_images)} images for {color_name} → Excel updated")
-                    else:
-                        print(f"    ✓ Saved {len(uploaded_images)} images for {color_name} (Excel update failed)")
-                else:
-                    print(f"    ⚠️ No images saved for {color_name}")
-                    
+                items.append(self.build_item(product_url, category, product_name, price, color_name, images, description))
             except Exception as e:
                 print(f"    ✗ Error processing color {color_name}: {str(e)[:100]}")
                 continue
-    
-    def init_excel(self):
-        from datetime import datetime
         
-        try:
-            self.wb = Workbook()
-            self.ws = self.wb.active
-            self.ws.title = "Products"
-            
-            headers = ['STT', 'Category', 'Tên sản phẩm', 'Giá', 'Màu sắc', 'Danh sách link ảnh', 'Mô tả sản phẩm']
-            self.ws.append(headers)
-            
-            for col in self.ws[1]:
-                col.font = Font(bold=True)
-                col.alignment = Alignment(horizontal='center', vertical='center')
-            
-            for col in ['A', 'B', 'C', 'D', 'E']:
-                self.ws.column_dimensions[col].width = 20
-            self.ws.column_dimensions['F'].width = 80
-            self.ws.column_dimensions['G'].width = 50
-            
-            self.wb.save(self.excel_path)
-            print(f"✓ Excel file created: {self.excel_path}\n")
-        except PermissionError:
-            timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-            self.excel_path = os.path.join(os.path.expanduser('~'), 'Downloads', f'lecas_data_{timestamp}.xlsx')
-            print(f"⚠️ File locked, using new file: {self.excel_path}")
-            
-            self.wb = Workbook()
-            self.ws = self.wb.active
-            self.ws.title = "Products"
-            
-            headers = ['STT', 'Category', 'Tên sản phẩm', 'Giá', 'Màu sắc', 'Danh sách link ảnh', 'Mô tả sản phẩm']
-            self.ws.append(headers)
-            
-            for col in self.ws[1]:
-                col.font = Font(bold=True)
-                col.alignment = Alignment(horizontal='center', vertical='center')
-            
-            for col in ['A', 'B', 'C', 'D', 'E']:
-                self.ws.column_dimensions[col].width = 20
-            self.ws.column_dimensions['F'].width = 80
-            self.ws.column_dimensions['G'].width = 50
-            
-            self.wb.save(self.excel_path)
-            print(f"✓ Excel file created: {self.excel_path}\n")
+        return items
     
-    def append_to_excel(self, product_data):
-        try:
-            self.ws.append([
-                self.row_index - 1,
-                product_data['category'],
-                product_data['product_name'],
-                product_data['price'],
-                product_data['color'],
-                product_data['images'],
-                product_data['description']
-            ])
-            self.row_index += 1
-            self.wb.save(self.excel_path)
-            return True
-        except Exception as e:
-            print(f"    ⚠️ Failed to save to Excel: {e}")
-            return False
+    def build_item(self, product_url, category, product_name, price, color_name, images, description):
+        return ExtractedItem(
+            url=product_url,
+            category=category,
+            name=product_name,
+            price=price,
+            colors=[color_name],
+            images=images[:self.max_images],
+            description=description,
+            folder=f"{category}/{product_name.replace(' ', '_')}/{color_name}"
+        )
+    
+    # Bản static (lxml + CSS selector) của các script JS ở trên, dùng cho HTML snapshot.
+    # HTML tĩnh chỉ chứa gallery của màu đang chọn, nên chỉ trả về 1 item cho màu đó.
     
-    def finalize_excel(self):
-        if self.wb:
-            self.wb.save(self.excel_path)
-            print(f"\n{'='*60}")
-            print(f"✓ Final data saved to: {self.excel_path}")
-            print(f"Total rows saved: {self.row_index - 2}")
-            print(f"{'='*60}")
+    def parse_colors(self, doc, product_url):
+        colors = []
+        for img in select(doc, 'img[alt^="color "]'):
+            color_name = img.get('alt').replace('color ', '', 1).strip()
+            if color_name and color_name.lower() not in [c.lower() for c in colors]:
+                colors.append(color_name)
+        
+        current = parse_qs(urlparse(product_url).query).get('color')
+        if current:
+            return current[0], colors or [current[0]]
+        return (colors[0] if colors else 'default'), colors
     
-    def run(self):
-        print(f"Total collections to crawl: {len(self.collection_urls)}\n")
+    def parse_images(self, doc):
+        imgs = []
         
-        self.init_excel()
+        gallery = select_first(doc, '.no-scrollbar.absolute.left-5, [class*="no-scrollbar"]')
+        if gallery is not None:
+            for img in gallery.cssselect('button img'):
+                alt = img.get('alt')
+                if not alt or not alt.startswith('color '):
+                    src = img_src(img)
+                    if src and 'n7media.coolmate.me' in src:
+                        imgs.append(src.split('?')[0])
         
+        if not imgs:
+            containers = set(select(doc, '.header, .footer, .menu, nav'))
+            for img in select(doc, 'button img[alt*="Áo"], button img[alt*="Quần"]'):
+                alt = img.get('alt')
+                if not alt or not alt.startswith('color '):
+                    src = img_src(img)
+                    if src and 'n7media.coolmate.me' in src and 'uploads' in src and not is_inside(img, containers):
+                        imgs.append(src.split('?')[0])
+        
+        return unique(imgs)
+    
+    def parse_description(self, doc):
+        sections = []
+        
+        for f in select(doc, '[class*="feature"], [class*="benefit"], [class*="detail"]'):
+            text = text_of(f)
+            if text and len(text) < 200:
+                sections.append(text)
+        
+        details = select_first(doc, '[class*="description"], [class*="Detail"], [class*="info"]')
+        if details is not None:
+            lines = [l.strip() for l in details.text_content().split('\n')]
+            sections.extend(l for l in lines if l)
+        
+        return '\n\n'.join(unique(sections))
+    
+    def parse_html(self, html, product_url, category):
+        doc = parse_document(html, product_url)
+        product_name = (first_text(doc, 'h1')
+                        or first_text(doc, '[class*="product-title"], [class*="ProductTitle"]')
+                        or 'Unknown Product')
+        price = first_text(doc, '[class*="price"], [class*="Price"], .product-price', 'N/A')
+        color_name, colors = self.parse_colors(doc, product_url)
+        print(f"Product: {product_name}, Price: {price}, Colors found: {len(colors)} (static: {color_name})")
+        return [self.build_item(
+            product_url, category, product_name, price, color_name,
+            self.parse_images(doc), self.parse_description(doc)
+        )]
+    
+    def select_color(self, page, color_name):
         try:
-            with sync_playwright() as p:
-                browser = p.chromium.launch(headless=False)
-                page = browser.new_page()
-                
-                all_products = []
-                for idx, collection_url in enumerate(self.collection_urls, 1):
-                    print(f"\n{'='*60}")
-                    print(f"[Collection {idx}/{len(self.collection_urls)}]")
-                    category = self.extract_category(collection_url)
-                    print(f"Category: {category}")
-                    
-                    try:
-                        product_links = self.crawl_collection(page, collection_url)
-                        for product in product_links:
-                            all_products.append((product, category))
-                    except Exception as e:
-                        print(f"Error crawling collection {collection_url}: {e}")
-                        continue
-                
-                print(f"\n{'='*60}")
-                print(f"Total products found: {len(all_products)}")
-                print(f"{'='*60}\n")
-                
-                for idx, (product_url, category) in enumerate(all_products, 1):
-                    print(f"\n{'='*60}")
-                    print(f"[Product {idx}/{len(all_products)}]")
-                    print(f"Progress: {len(self.products_data)} variants saved so far")
-                    print(f"URL: {product_url}")
-                    
-                    try:
-                        self.crawl_product_detail(page, product_url, category)
-                    except KeyboardInterrupt:
-                        raise
-                    except Exception as e:
-                        print(f"⚠️ Error crawling product: {str(e)[:100]}")
-                        print("→ Skipping to next product...")
-                        continue
-                
-                browser.close()
-        except KeyboardInterrupt:
-            print("\n\n" + "="*60)
-            print("⚠️ SCRIPT INTERRUPTED BY USER (Ctrl+C)")
-            print(f"Data saved: {len(self.products_data)} variants")
-            print("="*60)
+            print(f"    Clicking color button...", end=' ')
+            clicked = page.evaluate(f"""
+                () => {{
+                    const colorImg = document.querySelector('img[alt="color {color_name}"]');
+                    if (colorImg) {{
+                        const button = colorImg.closest('button');
+                        if (button) {{
+                            button.click();
+                            return true;
+                        }}
+                    }}
+                    return false;
+                }}
+            """)
+            
+            if clicked:
+                settle(2)
+                print("✓")
+            else:
+                print("✗ Button not found")
         except Exception as e:
-            print(f"\n\n⚠️ Script error: {e}")
-        finally:
-            self.finalize_excel()
+            print(f"✗ Failed to click: {str(e)[:50]}")
+
+
+class CoolmateCrawler(CrawlEngine):
+    def __init__(self, collection_urls, keep_records=False, resume=False, checkpoint_every=100, **options):
+        super().__init__(
+            CoolmateAdapter(),
+            ProductExcelSink('lecas_data', keep_records=keep_records, resume=resume, checkpoint_every=checkpoint_every,
+                             product_marker=CoolmateAdapter.product_marker, item_per_color=True),
+            collection_urls,
+            **options
+        )
 
 if __name__ == "__main__":
     print("=== COOLMATE CRAWLER ===\n")
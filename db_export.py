@@ -0,0 +1,255 @@
+import os
+import csv
+import sqlite3
+from seed_export import iter_latest, journal_path_for
+
+TABLES = {
+    'categories': ['id', 'name'],
+    'colors': ['id', 'name'],
+    'products': ['id', 'category_id', 'name', 'description', 'selling_price'],
+    'product_colors': ['product_id', 'color_id', 'position'],
+    'product_images': ['product_id', 'position', 'url'],
+}
+
+# Thứ tự bảng theo foreign key: bảng cha luôn được ghi trước bảng con
+TABLE_ORDER = ['categories', 'colors', 'products', 'product_colors', 'product_images']
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS categories (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS colors (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS products (
+    id BIGINT PRIMARY KEY,
+    category_id INTEGER NOT NULL REFERENCES categories(id),
+    name TEXT NOT NULL,
+    description TEXT,
+    selling_price INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS product_colors (
+    product_id BIGINT NOT NULL REFERENCES products(id),
+    color_id INTEGER NOT NULL REFERENCES colors(id),
+    position INTEGER NOT NULL,
+    PRIMARY KEY (product_id, color_id)
+);
+CREATE TABLE IF NOT EXISTS product_images (
+    product_id BIGINT NOT NULL REFERENCES products(id),
+    position INTEGER NOT NULL,
+    url TEXT NOT NULL,
+    PRIMARY KEY (product_id, position)
+);
+"""
+
+
+def resolve_journal(path):
+    """Nhận seed_data.xlsx hoặc seed_data.journal.jsonl"""
+    if path.endswith('.jsonl'):
+        return path
+    return journal_path_for(path)
+
+
+def iter_table_rows(journal_path):
+    """
+    Stream journal thành các dòng đã chuẩn hóa (table, row).
+    color_ids/images được tách thành bảng nối product_colors/product_images.
+    Product ghi lại nhiều lần (cập nhật) chỉ lấy bản cuối, không đụng primary key.
+    """
+    for kind, entry in iter_latest(journal_path):
+        if kind == 'category':
+            yield 'categories', (entry['id'], entry['name'])
+        elif kind == 'color':
+            yield 'colors', (entry['id'], entry['name'])
+        elif kind == 'product':
+            product_id = entry['id']
+            yield 'products', (
+                product_id,
+                entry['category_id'],
+                entry['name'],
+                entry['description'],
+                entry['selling_price']
+            )
+            seen_colors = set()
+            for position, color_id in enumerate(entry['color_ids'], 1):
+                if color_id in seen_colors:
+                    continue
+                seen_colors.add(color_id)
+                yield 'product_colors', (product_id, color_id, position)
+            for position, url in enumerate(entry['images'], 1):
+                yield 'product_images', (product_id, position, url)
+
+
+def copy_text_escape(value):
+    """Escape theo COPY ... FORMAT text của PostgreSQL"""
+    if value is None:
+        return '\\N'
+    return (str(value)
+            .replace('\\', '\\\\')
+            .replace('\t', '\\t')
+            .replace('\n', '\\n')
+            .replace('\r', '\\r'))
+
+
+def export_csv(journal_path, out_dir, delimiter=','):
+    """
+    Ghi mỗi bảng ra 1 file.
+    delimiter=',' -> CSV có header (COPY ... WITH (FORMAT csv, HEADER true))
+    delimiter='\\t' -> TSV không header (COPY ... FROM ... mặc định FORMAT text)
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    ext = 'tsv' if delimiter == '\t' else 'csv'
+
+    files = {}
+    writers = {}
+    counts = dict.fromkeys(TABLES, 0)
+    try:
+        for table, columns in TABLES.items():
+            f = open(os.path.join(out_dir, f'{table}.{ext}'), 'w', encoding='utf-8', newline='')
+            files[table] = f
+            if ext == 'csv':
+                writers[table] = csv.writer(f, delimiter=delimiter, lineterminator='\n')
+                writers[table].writerow(columns)
+
+        for table, row in iter_table_rows(journal_path):
+            if ext == 'csv':
+                writers[table].writerow(row)
+            else:
+                files[table].write('\t'.join(copy_text_escape(v) for v in row) + '\n')
+            counts[table] += 1
+    finally:
+        for f in files.values():
+            f.close()
+
+    return counts
+
+
+def sql_literal(value):
+    if value is None:
+        return 'NULL'
+    if isinstance(value, (int, float)):
+        return str(value)
+    return "'" + str(value).replace("'", "''") + "'"
+
+
+class BatchedInsertWriter:
+    """
+    Gom dòng theo bảng, ghi ra INSERT nhiều dòng (multi-row VALUES).
+    Khi 1 bảng đầy batch, các bảng đứng trước nó trong TABLE_ORDER được flush trước
+    để foreign key luôn hợp lệ khi load tuần tự.
+    """
+
+    def __init__(self, out, batch_size=1000):
+        self.out = out
+        self.batch_size = batch_size
+        self.pending = {table: [] for table in TABLE_ORDER}
+
+    def add(self, table, row):
+        rows = self.pending[table]
+        rows.append(row)
+        if len(rows) >= self.batch_size:
+            self.flush(upto=table)
+
+    def flush(self, upto=None):
+        for table in TABLE_ORDER:
+            self._flush_table(table)
+            if table == upto:
+                break
+
+    def _flush_table(self, table):
+        rows = self.pending[table]
+        if not rows:
+            return
+        columns = ', '.join(TABLES[table])
+        values = ',\n'.join('(' + ', '.join(sql_literal(v) for v in row) + ')' for row in rows)
+        self.out.write(f"INSERT INTO {table} ({columns}) VALUES\n{values};\n")
+        rows.clear()
+
+
+def export_sql(journal_path, out_path, batch_size=1000):
+    counts = dict.fromkeys(TABLES, 0)
+    with open(out_path, 'w', encoding='utf-8') as out:
+        out.write(SCHEMA.strip() + '\n\nBEGIN;\n')
+        writer = BatchedInsertWriter(out, batch_size)
+        for table, row in iter_table_rows(journal_path):
+            writer.add(table, row)
+            counts[table] += 1
+        writer.flush()
+        out.write('COMMIT;\n')
+    return counts
+
+
+def load_sqlite(journal_path, db_path, batch_size=5000):
+    """
+    Bulk load thẳng vào SQLite: executemany theo batch, mỗi batch 1 transaction.
+    Dữ liệu cũ trong các bảng seed bị thay thế.
+    """
+    conn = sqlite3.connect(db_path)
+    counts = dict.fromkeys(TABLES, 0)
+    try:
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('PRAGMA synchronous=OFF')
+        conn.executescript(SCHEMA)
+        with conn:
+            for table in reversed(TABLE_ORDER):
+                conn.execute(f'DELETE FROM {table}')
+
+        statements = {
+            table: f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))})"
+            for table, columns in TABLES.items()
+        }
+        pending = {table: [] for table in TABLE_ORDER}
+        pending_count = 0
+
+        def flush():
+            with conn:
+                for table in TABLE_ORDER:
+                    if pending[table]:
+                        conn.executemany(statements[table], pending[table])
+                        pending[table].clear()
+
+        for table, row in iter_table_rows(journal_path):
+            pending[table].append(row)
+            counts[table] += 1
+            pending_count += 1
+            if pending_count >= batch_size:
+                flush()
+                pending_count = 0
+        flush()
+        conn.execute('PRAGMA synchronous=FULL')
+    finally:
+        conn.close()
+    return counts
+
+
+if __name__ == "__main__":
+    import argparse
+    import time
+
+    parser = argparse.ArgumentParser(description="Export seed data (journal) cho database")
+    parser.add_argument('source', help="seed_data.xlsx hoặc seed_data.journal.jsonl")
+    parser.add_argument('--format', choices=['csv', 'tsv', 'sql', 'sqlite'], default='csv')
+    parser.add_argument('--out', required=True, help="Thư mục (csv/tsv) hoặc file (sql/sqlite)")
+    parser.add_argument('--batch-size', type=int, default=1000)
+    args = parser.parse_args()
+
+    journal_path = resolve_journal(args.source)
+    if not os.path.exists(journal_path):
+        print(f"⚠️ Journal not found: {journal_path}")
+        exit(1)
+
+    start = time.time()
+    if args.format == 'csv':
+        counts = export_csv(journal_path, args.out)
+    elif args.format == 'tsv':
+        counts = export_csv(journal_path, args.out, delimiter='\t')
+    elif args.format == 'sql':
+        counts = export_sql(journal_path, args.out, args.batch_size)
+    else:
+        counts = load_sqlite(journal_path, args.out, args.batch_size)
+
+    print(f"✓ Exported {args.format} → {args.out} ({time.time() - start:.2f}s)")
+    for table in TABLE_ORDER:
+        print(f"  - {table}: {counts[table]}")
@@ -0,0 +1,163 @@
+import os
+import time
+import signal
+import threading
+from contextlib import contextmanager
+from concurrent.futures import TimeoutError as FutureTimeout
+
+_local = threading.local()
+
+
+class DeadlineExceeded(Exception):
+    pass
+
+
+class Deadline:
+    """
+    Budget thời gian cho 1 sản phẩm (goto, settle, evaluate, upload ảnh đều trừ vào đây).
+    Mỗi bước lấy timeout = min(timeout mặc định, thời gian còn lại), nên 1 sản phẩm xấu
+    không giữ worker quá `seconds` giây.
+    """
+
+    def __init__(self, seconds):
+        self.seconds = seconds
+        self.expires = time.monotonic() + seconds
+
+    def remaining(self):
+        return self.expires - time.monotonic()
+
+    @property
+    def expired(self):
+        return self.remaining() <= 0
+
+    def timeout(self, default):
+        """Timeout (giây) cho 1 bước, không vượt quá phần budget còn lại"""
+        return max(min(default, self.remaining()), 0.001)
+
+    def timeout_ms(self, default_ms):
+        return max(int(min(default_ms, self.remaining() * 1000)), 1)
+
+    def check(self, step='product'):
+        if self.expired:
+            raise DeadlineExceeded(f"{step} exceeded {self.seconds:.0f}s budget")
+
+    def wait(self, future):
+        """future.result() trong phần budget còn lại"""
+        try:
+            return future.result(timeout=max(self.remaining(), 0))
+        except FutureTimeout:
+            future.cancel()
+            raise DeadlineExceeded(f"upload exceeded {self.seconds:.0f}s budget") from None
+
+    @contextmanager
+    def active(self):
+        """Đặt làm deadline của thread hiện tại (adapter đọc qua step_timeout_ms/settle)"""
+        previous = getattr(_local, 'deadline', None)
+        _local.deadline = self
+        try:
+            yield self
+        finally:
+            _local.deadline = previous
+
+
+def current_deadline():
+    return getattr(_local, 'deadline', None)
+
+
+def step_timeout_ms(default_ms):
+    """Timeout Playwright (ms) cho bước hiện tại của adapter, giới hạn bởi deadline của sản phẩm"""
+    deadline = current_deadline()
+    return deadline.timeout_ms(default_ms) if deadline else default_ms
+
+
+def settle(seconds):
+    """time.sleep chờ trang ổn định, không ngủ quá deadline của sản phẩm"""
+    deadline = current_deadline()
+    if deadline:
+        seconds = min(seconds, max(deadline.remaining(), 0))
+    if seconds > 0:
+        time.sleep(seconds)
+
+
+def child_pids(pid):
+    """PID các process con (psutil nếu có, không thì đọc /proc trên Linux)"""
+    try:
+        import psutil
+    except ImportError:
+        psutil = None
+    if psutil:
+        try:
+            return [child.pid for child in psutil.Process(pid).children()]
+        except psutil.Error:
+            return []
+    try:
+        with open(f'/proc/{pid}/task/{pid}/children', 'r') as f:
+            return [int(child) for child in f.read().split()]
+    except (OSError, ValueError):
+        return []
+
+
+def kill_pid(pid):
+    try:
+        os.kill(pid, getattr(signal, 'SIGKILL', signal.SIGTERM))
+        return True
+    except OSError:
+        return False
+
+
+class Watchdog:
+    """
+    Thread theo dõi sản phẩm đang extract của từng worker. Sản phẩm quá deadline + grace
+    (thường là page.evaluate bị treo, không có timeout) thì gọi on_expire() của worker
+    1 lần (WorkerPage.kill: kill Chromium để lệnh đang treo raise, worker dựng lại browser).
+    """
+
+    def __init__(self, grace=10.0, interval=1.0):
+        self.grace = grace
+        self.interval = interval
+        self.lock = threading.Lock()
+        self.watched = {}
+        self.fired = 0
+        self.stop_event = threading.Event()
+        self.thread = None
+
+    def start(self):
+        self.stop_event.clear()
+        self.thread = threading.Thread(target=self.loop, name='watchdog', daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.stop_event.set()
+        if self.thread:
+            self.thread.join(timeout=self.interval * 2)
+            self.thread = None
+
+    @contextmanager
+    def watch(self, name, deadline, on_expire):
+        if deadline is None:
+            yield
+            return
+        with self.lock:
+            self.watched[name] = [deadline, on_expire, False]
+        try:
+            yield
+        finally:
+            with self.lock:
+                self.watched.pop(name, None)
+
+    def loop(self):
+        while not self.stop_event.wait(self.interval):
+            expired = []
+            with self.lock:
+                for name, entry in self.watched.items():
+                    deadline, on_expire, fired = entry
+                    if not fired and deadline.remaining() < -self.grace:
+                        entry[2] = True
+                        self.fired += 1
+                        expired.append((name, on_expire))
+            for name, on_expire in expired:
+                print(f"  ⏱️ Watchdog: {name} stuck past deadline, recycling its browser")
+                try:
+                    on_expire()
+                except Exception as e:
+                    print(f"  ⚠️ Watchdog could not recycle {name}: {str(e)[:80]}")
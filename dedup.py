@@ -0,0 +1,223 @@
+import os
+import math
+import time
+import sqlite3
+import hashlib
+import tempfile
+import threading
+from urllib.parse import urlsplit
+
+
+class BloomFilter:
+    """
+    Bloom filter cỡ cố định: ~1.2MB cho 1 triệu key với error_rate=1%.
+    Không có false negative: 'not in' là chắc chắn chưa thấy.
+    """
+
+    def __init__(self, expected=1_000_000, error_rate=0.01):
+        self.size = max(8, int(-expected * math.log(error_rate) / (math.log(2) ** 2)))
+        self.hash_count = max(1, round(self.size / expected * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+
+    def positions(self, key):
+        digest = hashlib.blake2b(key.encode('utf-8'), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], 'little')
+        h2 = int.from_bytes(digest[8:], 'little') | 1
+        return [(h1 + i * h2) % self.size for i in range(self.hash_count)]
+
+    def add(self, key):
+        for pos in self.positions(key):
+            self.bits[pos >> 3] |= 1 << (pos & 7)
+
+    def __contains__(self, key):
+        return all(self.bits[pos >> 3] & (1 << (pos & 7)) for pos in self.positions(key))
+
+
+class SeenIndex:
+    """
+    Tập key đã thấy (URL, tên sản phẩm) với RAM cố định:
+
+    - BloomFilter trả lời nhanh "chưa thấy" (đa số lookup khi crawl mới)
+    - SQLite (bảng key PRIMARY KEY) xác nhận chính xác khi Bloom báo "có thể đã thấy"
+
+    db_path=None: file tạm, xóa khi close() (dedup trong 1 lần chạy).
+    Có db_path: giữ giữa các lần chạy, Bloom được dựng lại từ SQLite khi mở.
+    commit_every: số add() giữa 2 lần commit (1 = commit ngay, an toàn khi crash).
+    """
+
+    def __init__(self, db_path=None, table='seen', expected=1_000_000, error_rate=0.01, commit_every=1):
+        self.temporary = db_path is None
+        if self.temporary:
+            fd, db_path = tempfile.mkstemp(prefix='crawl_seen_', suffix='.db')
+            os.close(fd)
+        self.db_path = db_path
+        self.table = table
+        self.commit_every = commit_every
+        self.uncommitted = 0
+        self.bloom_negatives = 0
+        self.false_positives = 0
+
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(db_path, check_same_thread=False)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute(f'CREATE TABLE IF NOT EXISTS {table} (key TEXT PRIMARY KEY) WITHOUT ROWID')
+        self.conn.commit()
+
+        self.bloom = BloomFilter(expected, error_rate)
+        self.count = 0
+        for key, in self.conn.execute(f'SELECT key FROM {table}'):
+            self.bloom.add(key)
+            self.count += 1
+
+    def __len__(self):
+        return self.count
+
+    def _exists(self, key):
+        if key not in self.bloom:
+            self.bloom_negatives += 1
+            return False
+        found = self.conn.execute(f'SELECT 1 FROM {self.table} WHERE key = ?', (key,)).fetchone() is not None
+        if not found:
+            self.false_positives += 1
+        return found
+
+    def __contains__(self, key):
+        with self.lock:
+            return self._exists(key)
+
+    def add(self, key):
+        """Thêm key, trả về True nếu key mới (chưa thấy trước đó)"""
+        with self.lock:
+            if self._exists(key):
+                return False
+            self.conn.execute(f'INSERT OR IGNORE INTO {self.table} (key) VALUES (?)', (key,))
+            self.bloom.add(key)
+            self.count += 1
+            self.uncommitted += 1
+            if self.uncommitted >= self.commit_every:
+                self.conn.commit()
+                self.uncommitted = 0
+            return True
+
+    def add_many(self, keys):
+        """Thêm nhiều key trong 1 transaction (nạp dữ liệu cũ), trả về số key mới"""
+        added = 0
+        with self.lock:
+            for key in keys:
+                if not self._exists(key):
+                    self.conn.execute(f'INSERT OR IGNORE INTO {self.table} (key) VALUES (?)', (key,))
+                    self.bloom.add(key)
+                    self.count += 1
+                    added += 1
+            self.conn.commit()
+            self.uncommitted = 0
+        return added
+
+    def summary(self):
+        return f"{self.count} keys, {self.bloom_negatives} bloom negatives, {self.false_positives} false positives"
+
+    def close(self):
+        with self.lock:
+            self.conn.commit()
+            self.conn.close()
+        if self.temporary:
+            for suffix in ('', '-wal', '-shm'):
+                try:
+                    os.remove(self.db_path + suffix)
+                except OSError:
+                    pass
+
+
+def canonical_product_key(product_url, product_marker):
+    """
+    Key chuẩn của 1 sản phẩm: handle/slug sau product_marker, bỏ query (?color=, ?variant=) và fragment.
+    .../collections/ao-thun/products/abc?variant=1 và .../products/abc -> 'abc'
+    """
+    parts = urlsplit(product_url)
+    path = parts.path.rstrip('/')
+    if product_marker in path:
+        return path.split(product_marker, 1)[1].split('/')[0].lower()
+    return f"{parts.netloc}{path}".lower()
+
+
+class ProductIndex:
+    """
+    Index sản phẩm theo canonical key (SQLite):
+
+        products(key, url, crawled_at)        crawled_at NULL = chưa ghi ra sink
+        memberships(key, category, url)       mọi collection chứa sản phẩm
+
+    Được kiểm tra trước khi mở trang sản phẩm: sản phẩm đã crawl chỉ được ghi thêm
+    collection, không goto/upload lại. reset=True xóa dữ liệu cũ (output không resume).
+    """
+
+    def __init__(self, db_path, reset=False, commit_every=100):
+        self.db_path = db_path
+        self.commit_every = commit_every
+        self.uncommitted = 0
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(db_path, check_same_thread=False)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        if reset:
+            self.conn.execute('DROP TABLE IF EXISTS products')
+            self.conn.execute('DROP TABLE IF EXISTS memberships')
+        self.conn.execute('CREATE TABLE IF NOT EXISTS products (key TEXT PRIMARY KEY, url TEXT, crawled_at REAL)')
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS memberships (
+                key TEXT,
+                category TEXT,
+                url TEXT,
+                PRIMARY KEY (key, category)
+            ) WITHOUT ROWID
+        """)
+        self.conn.commit()
+
+    def _maybe_commit(self):
+        self.uncommitted += 1
+        if self.uncommitted >= self.commit_every:
+            self.conn.commit()
+            self.uncommitted = 0
+
+    def add_membership(self, key, product_url, category):
+        with self.lock:
+            self.conn.execute('INSERT OR IGNORE INTO products (key, url) VALUES (?, ?)', (key, product_url))
+            self.conn.execute(
+                'INSERT OR IGNORE INTO memberships (key, category, url) VALUES (?, ?, ?)',
+                (key, category, product_url)
+            )
+            self._maybe_commit()
+
+    def is_crawled(self, key):
+        with self.lock:
+            row = self.conn.execute('SELECT crawled_at FROM products WHERE key = ?', (key,)).fetchone()
+        return bool(row and row[0])
+
+    def mark_crawled(self, key, product_url):
+        with self.lock:
+            self.conn.execute(
+                'INSERT INTO products (key, url, crawled_at) VALUES (?, ?, ?) '
+                'ON CONFLICT(key) DO UPDATE SET crawled_at = excluded.crawled_at',
+                (key, product_url, time.time())
+            )
+            self.conn.commit()
+            self.uncommitted = 0
+
+    def collections(self, key):
+        with self.lock:
+            return [row[0] for row in self.conn.execute(
+                'SELECT category FROM memberships WHERE key = ? ORDER BY category', (key,)
+            )]
+
+    def summary(self):
+        with self.lock:
+            products, = self.conn.execute('SELECT COUNT(*) FROM products').fetchone()
+            crawled, = self.conn.execute('SELECT COUNT(*) FROM products WHERE crawled_at IS NOT NULL').fetchone()
+            shared, = self.conn.execute(
+                'SELECT COUNT(*) FROM (SELECT key FROM memberships GROUP BY key HAVING COUNT(*) > 1)'
+            ).fetchone()
+        return f"{products} products ({crawled} crawled), {shared} in more than 1 collection"
+
+    def close(self):
+        with self.lock:
+            self.conn.commit()
+            self.conn.close()
@@ -0,0 +1,200 @@
+import os
+import json
+import gzip
+import time
+import sqlite3
+import threading
+
+FIELDS = ('category', 'name', 'price', 'colors', 'images', 'description')
+LIST_FIELDS = ('colors', 'images')
+
+
+def read_delta(path):
+    """Đọc file delta (.jsonl.gz), yield từng thay đổi; dòng cuối bị cắt dở được bỏ qua"""
+    with gzip.open(path, 'rt', encoding='utf-8') as f:
+        try:
+            for line in f:
+                try:
+                    yield json.loads(line)
+                except ValueError:
+                    continue
+        except EOFError:
+            return
+
+
+def diff_fields(old, new):
+    """Diff theo field: scalar -> [cũ, mới], list (ảnh, màu) -> {added, removed}"""
+    changes = {}
+    for field in FIELDS:
+        if old[field] == new[field]:
+            continue
+        if field in LIST_FIELDS:
+            changes[field] = {
+                'added': [value for value in new[field] if value not in old[field]],
+                'removed': [value for value in old[field] if value not in new[field]],
+            }
+            if not changes[field]['added'] and not changes[field]['removed']:
+                changes[field]['order'] = new[field]
+        else:
+            changes[field] = [old[field], new[field]]
+    return changes
+
+
+class DeltaExporter:
+    """
+    Export phần thay đổi giữa 2 lần crawl, thay vì cả workbook.
+
+    Snapshot (SQLite, <file_stem>_snapshot.db) giữ dòng của lần trước theo key
+    canonical URL + màu (sản phẩm 1 dòng cho mọi màu thì màu = ''). Mỗi dòng ghi ra sink
+    được so với snapshot qua primary key:
+        added     key chưa có
+        changed   diff theo field (giá, ảnh, mô tả, ...)
+    Khi run kết thúc bình thường, dòng thuộc category đã crawl mà sản phẩm không còn trong
+    collection nào (hoặc màu không còn) thành removed. Sản phẩm bị bỏ qua vì đã crawl
+    vẫn được tính là còn (touch()). Category liệt kê không đầy đủ (truncate(): lỗi, max_products,
+    collection scheduler bỏ qua) không sinh removed cho sản phẩm vắng mặt. Dòng upload lỗi
+    được record() với images=None: vẫn tính là còn, ảnh giữ như snapshot.
+
+    Delta ghi ra <file_stem>_delta_<timestamp>.jsonl.gz, mỗi dòng:
+        {"op": "changed", "key": "ao-thun#đen", "url": ..., "color": ..., "fields": {"price": [cũ, mới]}}
+    File chỉ được tạo khi có thay đổi đầu tiên.
+    """
+
+    def __init__(self, snapshot_path, out_dir, file_stem, commit_every=100):
+        self.snapshot_path = snapshot_path
+        self.out_dir = out_dir
+        self.file_stem = file_stem
+        self.commit_every = commit_every
+        self.run_id = int(time.time())
+        self.out_path = None
+        self.out = None
+        self.pending = 0
+        self.counts = {'added': 0, 'changed': 0, 'removed': 0, 'unchanged': 0}
+        self.lock = threading.Lock()
+
+        self.conn = sqlite3.connect(snapshot_path, check_same_thread=False)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('PRAGMA synchronous=NORMAL')
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS rows (
+                key TEXT PRIMARY KEY,
+                product TEXT NOT NULL,
+                color TEXT NOT NULL,
+                url TEXT,
+                data TEXT NOT NULL,
+                seen_run INTEGER NOT NULL
+            )
+        """)
+        self.conn.execute('CREATE INDEX IF NOT EXISTS rows_product ON rows (product)')
+        # Sản phẩm/category thấy trong run hiện tại (kể cả sản phẩm không extract lại)
+        self.conn.execute('CREATE TEMP TABLE touched (product TEXT PRIMARY KEY)')
+        self.conn.execute('CREATE TEMP TABLE extracted (product TEXT PRIMARY KEY)')
+        self.categories = set()
+        self.truncated = set()
+
+    def open(self):
+        os.makedirs(self.out_dir, exist_ok=True)
+        timestamp = time.strftime('%Y%m%d_%H%M%S', time.localtime(self.run_id))
+        self.out_path = os.path.join(self.out_dir, f'{self.file_stem}_delta_{timestamp}.jsonl.gz')
+        self.out = gzip.open(self.out_path, 'wt', encoding='utf-8')
+
+    def emit(self, op, key, product, color, url, **extra):
+        self.counts[op] += 1
+        if self.out is None:
+            self.open()
+        self.out.write(json.dumps({'op': op, 'key': key, 'product': product, 'color': color, 'url': url, **extra},
+                                  ensure_ascii=False) + '\n')
+
+    def touch(self, product, category):
+        """Sản phẩm còn trong collection (được discovery tìm thấy) ở run này"""
+        with self.lock:
+            self.categories.add(category)
+            self.conn.execute('INSERT OR IGNORE INTO touched VALUES (?)', (product,))
+
+    def truncate(self, category):
+        """Collection của category không được liệt kê đầy đủ ở run này"""
+        with self.lock:
+            self.truncated.add(category)
+
+    def record(self, product, color, url, data):
+        """
+        So 1 dòng vừa ghi ra sink với snapshot, ghi delta nếu mới hoặc khác.
+        data['images'] = None (upload lỗi): dùng ảnh của snapshot, dòng chưa có thì bỏ qua
+        """
+        key = f"{product}#{color}"
+        data = {field: data[field] for field in FIELDS}
+        with self.lock:
+            self.categories.add(data['category'])
+            self.conn.execute('INSERT OR IGNORE INTO extracted VALUES (?)', (product,))
+            row = self.conn.execute('SELECT data FROM rows WHERE key = ?', (key,)).fetchone()
+            if data['images'] is None:
+                if row is None:
+                    return
+                data['images'] = json.loads(row[0])['images']
+            encoded = json.dumps(data, ensure_ascii=False, sort_keys=True)
+            if row is None:
+                self.emit('added', key, product, color, url, data=data)
+            elif row[0] != encoded:
+                self.emit('changed', key, product, color, url, fields=diff_fields(json.loads(row[0]), data))
+            else:
+                self.counts['unchanged'] += 1
+            self.conn.execute(
+                'INSERT OR REPLACE INTO rows (key, product, color, url, data, seen_run) VALUES (?, ?, ?, ?, ?, ?)',
+                (key, product, color, url, encoded, self.run_id)
+            )
+            self.pending += 1
+            if self.pending >= self.commit_every:
+                self.conn.commit()
+                self.pending = 0
+
+    def find_removed(self):
+        """
+        Dòng bị gỡ: thuộc category đã crawl ở run này và
+        - sản phẩm không còn trong collection nào (category được liệt kê đầy đủ), hoặc
+        - sản phẩm đã extract lại nhưng không còn màu đó
+        """
+        if not self.categories:
+            return
+        rows = self.conn.execute("""
+            SELECT key, product, color, url, data, product IN (SELECT product FROM extracted) FROM rows
+            WHERE product NOT IN (SELECT product FROM touched)
+               OR (product IN (SELECT product FROM extracted) AND seen_run != ?)
+        """, (self.run_id,)).fetchall()
+        removed = []
+        for key, product, color, url, data, extracted in rows:
+            data = json.loads(data)
+            if not extracted and data['category'] in self.truncated:
+                continue
+            if data['category'] in self.categories:
+                self.emit('removed', key, product, color, url, data=data)
+                removed.append((key,))
+        self.conn.executemany('DELETE FROM rows WHERE key = ?', removed)
+
+    def close(self, completed=True):
+        """completed=False (run bị dừng giữa chừng) thì không tính removed"""
+        with self.lock:
+            if completed:
+                self.find_removed()
+            self.conn.commit()
+            self.conn.close()
+            if self.out:
+                self.out.close()
+                self.out = None
+
+    def summary(self):
+        counts = self.counts
+        where = f" → {self.out_path}" if self.out_path else ''
+        return (f"Delta: {counts['added']} added, {counts['changed']} changed, {counts['removed']} removed, "
+                f"{counts['unchanged']} unchanged{where}")
+
+
+if __name__ == "__main__":
+    import sys
+
+    if len(sys.argv) < 2:
+        print("Usage: python delta_export.py <file_delta_YYYYmmdd_HHMMSS.jsonl.gz>")
+        exit()
+
+    for change in read_delta(sys.argv[1]):
+        detail = ', '.join(change['fields']) if change['op'] == 'changed' else change['data']['name']
+        print(f"{change['op']:<8} {change['key']}  {detail}")
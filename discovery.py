@@ -0,0 +1,259 @@
+import os
+import gzip
+import sqlite3
+import threading
+import xml.etree.ElementTree as ET
+from concurrent.futures import ThreadPoolExecutor
+import requests
+from requests.adapters import HTTPAdapter
+
+SITEMAP_NS = '{http://www.sitemaps.org/schemas/sitemap/0.9}'
+
+
+class BrowserDiscovery:
+    """
+    Tìm link sản phẩm bằng cách render trang collection (adapter.iter_collection_links).
+    truncated(category): gọi cho collection không được liệt kê đầy đủ lần này (lỗi, bị
+    scheduler bỏ qua, chạm max_products), để delta không coi sản phẩm thiếu là bị gỡ.
+    """
+
+    uses_browser = True
+
+    def __init__(self, adapter, collection_urls, scheduler=None):
+        self.adapter = adapter
+        self.collection_urls = collection_urls
+        self.scheduler = scheduler
+        self.truncated = None
+
+    def mark_truncated(self, category):
+        if self.truncated:
+            self.truncated(category)
+
+    def iter_links(self, page):
+        """Yield từng batch [(product_url, category)] ngay khi đọc xong 1 trang collection"""
+        for idx, collection_url in enumerate(self.collection_urls, 1):
+            category = self.adapter.extract_category(collection_url)
+            print(f"\n[Collection {idx}/{len(self.collection_urls)}] Category: {category}")
+            if self.scheduler and not self.scheduler.collection_due(collection_url):
+                print("  ⏭️  Collection rarely changes, skipped this run")
+                self.mark_truncated(category)
+                continue
+
+            found = []
+            try:
+                for links in self.adapter.iter_collection_links(page, collection_url):
+                    found.extend(links)
+                    yield [(product_url, category) for product_url in links]
+            except Exception as e:
+                print(f"Error crawling collection {collection_url}: {e}")
+                self.mark_truncated(category)
+                continue
+            max_products = getattr(self.adapter, 'max_products', None)
+            if max_products and len(found) >= max_products:
+                self.mark_truncated(category)
+            if self.scheduler and self.scheduler.observe_collection(collection_url, found):
+                print(f"  Δ Collection changed ({len(found)} products)")
+
+    def commit(self, product_url):
+        pass
+
+    def close(self):
+        pass
+
+
+def make_session(pool_size=16):
+    """requests.Session dùng chung connection pool (keep-alive) cho nhiều thread"""
+    session = requests.Session()
+    session.headers['User-Agent'] = 'Mozilla/5.0 (compatible; crawl_data)'
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=2)
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    return session
+
+
+def iter_sitemap(session, sitemap_url, timeout=30):
+    """
+    Stream 1 file sitemap bằng iterparse (không load cả file vào RAM).
+    Yield ('sitemap', loc, lastmod) cho sitemap index và ('url', loc, lastmod) cho urlset.
+    """
+    response = session.get(sitemap_url, stream=True, timeout=timeout)
+    response.raise_for_status()
+    response.raw.decode_content = True
+    stream = response.raw
+    if sitemap_url.split('?')[0].endswith('.gz'):
+        stream = gzip.GzipFile(fileobj=stream)
+
+    try:
+        for _, elem in ET.iterparse(stream, events=('end',)):
+            tag = elem.tag.replace(SITEMAP_NS, '')
+            if tag not in ('url', 'sitemap'):
+                continue
+            loc = elem.findtext(f'{SITEMAP_NS}loc') or elem.findtext('loc')
+            lastmod = elem.findtext(f'{SITEMAP_NS}lastmod') or elem.findtext('lastmod')
+            if loc:
+                yield ('sitemap' if tag == 'sitemap' else 'url'), loc.strip(), (lastmod or '').strip()
+            elem.clear()
+    finally:
+        response.close()
+
+
+class SitemapState:
+    """Lưu lastmod của từng URL giữa các lần chạy (SQLite)"""
+
+    def __init__(self, db_path):
+        self.conn = sqlite3.connect(db_path, check_same_thread=False)
+        self.lock = threading.Lock()
+        self.conn.execute('CREATE TABLE IF NOT EXISTS lastmod (url TEXT PRIMARY KEY, lastmod TEXT)')
+        self.conn.commit()
+
+    def get(self, url):
+        with self.lock:
+            row = self.conn.execute('SELECT lastmod FROM lastmod WHERE url = ?', (url,)).fetchone()
+        return row[0] if row else None
+
+    def set(self, url, lastmod):
+        with self.lock:
+            self.conn.execute('INSERT OR REPLACE INTO lastmod (url, lastmod) VALUES (?, ?)', (url, lastmod))
+            self.conn.commit()
+
+    def close(self):
+        self.conn.close()
+
+
+class SitemapDiscovery:
+    """
+    Tìm sản phẩm từ sitemap XML thay vì render collection.
+
+    - Stream sitemap index + các sitemap con song song qua 1 connection pool
+    - Map product URL -> collection bằng adapter.collection_members(session, collection_url)
+      (nếu adapter không hỗ trợ, sản phẩm được gán category 'unknown')
+    - Chỉ đưa vào hàng đợi sản phẩm mới hoặc có lastmod thay đổi so với lần chạy trước.
+      lastmod chỉ được lưu (commit) sau khi sản phẩm đã được ghi ra sink,
+      nên sản phẩm crawl lỗi sẽ được thử lại ở lần sau.
+    - listed(product_url, category): gọi cho mọi sản phẩm còn trong sitemap/collection,
+      kể cả sản phẩm bị bỏ qua vì lastmod không đổi (engine dùng để báo delta là sản phẩm vẫn còn)
+    - truncated(category): collection không liệt kê đầy đủ (lỗi hoặc cắt theo max_products)
+    """
+
+    uses_browser = False
+
+    def __init__(self, adapter, collection_urls, state_path=None, only_changed=True, workers=8):
+        self.adapter = adapter
+        self.collection_urls = collection_urls
+        self.only_changed = only_changed
+        self.workers = workers
+        self.session = make_session(pool_size=workers)
+        if state_path is None:
+            state_path = os.path.join(os.path.expanduser('~'), 'Downloads', f'{adapter.storage_folder}_sitemap.db')
+        self.state = SitemapState(state_path)
+        self.pending = {}
+        self.pending_lock = threading.Lock()
+        self.listed = None
+        self.truncated = None
+
+    def iter_product_entries(self):
+        """Yield (product_url, lastmod) của mọi sản phẩm trong sitemap"""
+        product_marker = self.adapter.product_marker
+        sitemap_filter = getattr(self.adapter, 'sitemap_filter', None)
+
+        child_sitemaps = []
+        for kind, loc, lastmod in iter_sitemap(self.session, self.adapter.sitemap_url):
+            if kind == 'sitemap':
+                if not sitemap_filter or sitemap_filter in loc:
+                    child_sitemaps.append(loc)
+            elif product_marker in loc:
+                yield loc, lastmod
+
+        if not child_sitemaps:
+            return
+
+        def fetch(sitemap_url):
+            try:
+                return [(loc, lastmod) for kind, loc, lastmod in iter_sitemap(self.session, sitemap_url)
+                        if kind == 'url' and product_marker in loc]
+            except Exception as e:
+                print(f"⚠️ Failed to read sitemap {sitemap_url}: {str(e)[:80]}")
+                return []
+
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            for entries in executor.map(fetch, child_sitemaps):
+                yield from entries
+
+    def build_membership(self):
+        """product_url -> [category], theo thứ tự collection_urls"""
+        membership = {}
+        if not hasattr(self.adapter, 'collection_members'):
+            print("⚠️ Adapter không hỗ trợ map sản phẩm -> collection, dùng category 'unknown'")
+            return None
+
+        def fetch(collection_url):
+            try:
+                return list(self.adapter.collection_members(self.session, collection_url))
+            except Exception as e:
+                print(f"⚠️ Failed to list collection {collection_url}: {str(e)[:80]}")
+                return None
+
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            results = list(executor.map(fetch, self.collection_urls))
+
+        max_products = getattr(self.adapter, 'max_products', None)
+        for collection_url, product_urls in zip(self.collection_urls, results):
+            category = self.adapter.extract_category(collection_url)
+            if product_urls is None or (max_products and len(product_urls) > max_products):
+                if self.truncated:
+                    self.truncated(category)
+                product_urls = (product_urls or [])[:max_products or None]
+            print(f"  Collection {category}: {len(product_urls)} products")
+            for product_url in product_urls:
+                categories = membership.setdefault(product_url.split('?')[0], [])
+                if category not in categories:
+                    categories.append(category)
+        return membership
+
+    def iter_links(self, page=None):
+        print(f"\nReading sitemap: {self.adapter.sitemap_url}")
+        membership = self.build_membership()
+
+        total = 0
+        queued = 0
+        batch = []
+        for product_url, lastmod in self.iter_product_entries():
+            total += 1
+            product_url = product_url.split('?')[0]
+
+            if membership is not None:
+                categories = membership.get(product_url)
+                if not categories:
+                    continue
+            else:
+                categories = ['unknown']
+
+            if self.listed:
+                for category in categories:
+                    self.listed(product_url, category)
+
+            if self.only_changed and lastmod and self.state.get(product_url) == lastmod:
+                continue
+
+            with self.pending_lock:
+                self.pending[product_url] = lastmod
+            # Mỗi collection 1 task: engine ghi lại mọi collection nhưng chỉ crawl 1 lần
+            batch.extend((product_url, category) for category in categories)
+            queued += 1
+            if len(batch) >= 50:
+                yield batch
+                batch = []
+
+        if batch:
+            yield batch
+        print(f"\n✓ Sitemap: {total} products, {queued} new/changed queued")
+
+    def commit(self, product_url):
+        with self.pending_lock:
+            lastmod = self.pending.pop(product_url, None)
+        if lastmod:
+            self.state.set(product_url, lastmod)
+
+    def close(self):
+        self.state.close()
+        self.session.close()
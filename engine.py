@@ -0,0 +1,466 @@
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from storage import make_storage
+from pipeline import Pipeline
+from discovery import BrowserDiscovery, SitemapDiscovery, make_session
+from snapshots import parse_snapshots
+from dedup import SeenIndex, ProductIndex, canonical_product_key
+from deadline import Deadline, Watchdog
+from sinks import downloads_path
+
+
+class CrawlEngine:
+    """
+    Engine dùng chung cho mọi site: điều phối collection/product, quản lý browser/page,
+    upload ảnh và ghi output (sink). Các bước chạy song song qua Pipeline.
+
+    Phần riêng của từng site (selector, script extract, URL pattern, chuẩn hóa dữ liệu)
+    nằm trong adapter:
+        storage_folder            folder gốc trên storage ("coolmate", "theneworiginals")
+        collection_marker         "/collection/" hoặc "/collections/"
+        extract_category(url)
+        iter_collection_links(page, collection_url) -> yield [product_url] theo từng trang
+        product_marker            "/product/" hoặc "/products/" (canonical key = phần path ngay sau)
+        sitemap_url, collection_members(session, url)   (discovery='sitemap')
+        extract_product(page, product_url, category) -> [ExtractedItem]
+        load_product_page(page, product_url), parse_html(html, product_url, category)   (snapshot)
+        static_html, missing_fields(item)   (extract từ HTML tĩnh, không cần browser)
+        normalize_image_url(url) -> url tuyệt đối hoặc None để bỏ qua
+
+    Mỗi sản phẩm có deadline product_deadline giây cho mọi bước (goto, settle, evaluate,
+    upload); adapter lấy timeout/sleep qua deadline.step_timeout_ms()/settle().
+    Quá hạn thì sản phẩm được thử lại tối đa product_retries lần ở cuối lượt,
+    page treo quá deadline + watchdog_grace bị watchdog kill và dựng lại.
+    product_deadline=None để tắt.
+
+    image_preprocessor (ImagePreprocessor): tải ảnh về, thu nhỏ/encode lại rồi mới upload.
+
+    delta (DeltaExporter): ghi thêm phần thay đổi so với lần chạy trước (key canonical URL + màu,
+    adapter.item_per_color=True nếu mỗi item là 1 màu).
+
+    autoscaler (autoscale.Autoscaler): số extract worker co giãn theo CPU/RAM/RSS Chromium
+    (min_workers..max_workers) thay cho extract_workers cố định.
+
+    browser_pool (browser_pool.BrowserPool): connect tới browser server từ xa (CDP/Playwright
+    server) thay vì launch Chromium local; browser bị ngắt thì connect lại và thử lại sản phẩm.
+    """
+
+    def __init__(self, adapter, sink, collection_urls, storage=None, headless=False,
+                 extract_workers=1, upload_workers=4, discovery='browser', http_cache=None,
+                 snapshot_store=None, fetch_only=False, static_html=True, tracer=None, scheduler=None,
+                 product_deadline=180, product_retries=1, watchdog_grace=10, delta=None,
+                 image_preprocessor=None, autoscaler=None, browser_pool=None):
+        self.adapter = adapter
+        self.sink = sink
+        self.collection_urls = collection_urls if isinstance(collection_urls, list) else [collection_urls]
+        self.storage = make_storage(storage, image_preprocessor)
+        self.headless = headless
+        self.extract_workers = extract_workers
+        self.upload_workers = upload_workers
+        self.http_cache = http_cache
+        self.snapshot_store = snapshot_store
+        self.fetch_only = fetch_only
+        self.tracer = tracer
+        self.scheduler = scheduler
+        self.delta = delta
+        self.autoscaler = autoscaler
+        self.browser_pool = browser_pool
+        self.product_deadline = product_deadline
+        self.product_retries = product_retries
+        self.watchdog = Watchdog(grace=watchdog_grace) if product_deadline else None
+        self.retries = deque()
+        self.upload_retries = deque()
+        self.retried = 0
+        self.gave_up = 0
+        self.deadline_misses = 0
+        self.recycled_pages = 0
+        if http_cache and http_cache.mode == 'replay':
+            # Replay từ cache không cần chờ mạng sau khi goto
+            adapter.settle_delay = 0
+
+        # HTML tĩnh đi thẳng qua HTTP nên không dùng được với http_cache (cache gắn vào browser)
+        self.static_html = static_html and getattr(adapter, 'static_html', False) and not http_cache and not fetch_only
+        max_workers = autoscaler.max_workers if autoscaler else extract_workers
+        self.session = make_session(pool_size=max(max_workers, 4)) if self.static_html else None
+        self.static_hits = 0
+        self.static_fallbacks = 0
+
+        if discovery == 'sitemap':
+            self.discovery = SitemapDiscovery(adapter, self.collection_urls)
+        elif discovery == 'browser':
+            self.discovery = BrowserDiscovery(adapter, self.collection_urls)
+        else:
+            self.discovery = discovery
+        if scheduler is not None and hasattr(self.discovery, 'scheduler'):
+            self.discovery.scheduler = scheduler
+        if scheduler is not None and hasattr(sink, 'keep_previous'):
+            # Scheduler bỏ qua sản phẩm chưa tới hạn: output phải giữ dòng của lần chạy trước
+            sink.keep_previous = True
+        if delta is not None and hasattr(self.discovery, 'listed'):
+            # Sitemap bỏ qua sản phẩm lastmod không đổi trước should_crawl, vẫn phải touch cho delta
+            self.discovery.listed = self.touch_listed
+        if delta is not None and hasattr(self.discovery, 'truncated'):
+            self.discovery.truncated = delta.truncate
+
+        # Tạo trong open_indexes(): seen_links/claimed là file tạm, product_index
+        # (<file_stem>_products.db) giữ lại theo output của sink
+        self.seen_links = None
+        self.claimed = None
+        self.product_index = None
+        self.claim_lock = threading.Lock()
+
+    def open_indexes(self):
+        self.seen_links = SeenIndex(table='links', commit_every=1000)
+        self.claimed = SeenIndex(table='claimed', commit_every=1000)
+        self.product_index = ProductIndex(
+            downloads_path(f'{self.sink.file_stem}_products.db'),
+            reset=not self.sink.resume
+        )
+
+    def close_indexes(self):
+        for index in (self.seen_links, self.claimed, self.product_index):
+            if index:
+                index.close()
+
+    def canonical_key(self, product_url):
+        return canonical_product_key(product_url, self.adapter.product_marker)
+
+    def should_crawl(self, product_url, category):
+        """
+        Kiểm tra trước khi mở trang sản phẩm (theo canonical key, bỏ ?color=/?variant=):
+        luôn ghi lại collection chứa sản phẩm, nhưng chỉ đưa vào hàng đợi 1 lần
+        và bỏ qua sản phẩm đã ghi ra sink ở lần chạy trước.
+        """
+        key = self.canonical_key(product_url)
+        self.product_index.add_membership(key, product_url, category)
+        if self.delta:
+            self.delta.touch(key, category)
+        if not self.seen_links.add(key):
+            return False
+        if self.scheduler:
+            # Có scheduler: sản phẩm trong plan được check lại dù đã crawl, sản phẩm khác theo budget
+            return self.scheduler.allow(key)
+        if self.product_index.is_crawled(key):
+            print(f"  ⏭️  Skipped (already crawled): {product_url}")
+            return False
+        return True
+
+    def touch_listed(self, product_url, category):
+        self.delta.touch(self.canonical_key(product_url), category)
+
+    def scheduled_links(self):
+        """Sản phẩm scheduler chọn check lại (đưa vào hàng đợi sau link từ discovery)"""
+        if self.scheduler:
+            yield from self.scheduler.scheduled_links()
+
+    def after_extract(self, product_url, category, items, seconds):
+        """Ghi lịch sử thay đổi; sản phẩm check lại mà không đổi gì thì không upload/ghi lại"""
+        if not self.scheduler or not items:
+            return items
+        key = self.canonical_key(product_url)
+        changed = self.scheduler.observe_product(key, product_url, category, items, seconds)
+        if self.scheduler.is_planned(key):
+            if not changed:
+                print(f"  = Unchanged: {items[0].name}")
+                return []
+            print(f"  Δ Changed ({', '.join(changed)}): {items[0].name}")
+        return items
+
+    def new_deadline(self):
+        return Deadline(self.product_deadline) if self.product_deadline else None
+
+    def retry_later(self, product_url, category, attempt, error, over_budget=True):
+        """
+        Sản phẩm quá deadline (hoặc browser bị ngắt/không connect được, over_budget=False):
+        xếp cuối lượt để thử lại, hết lượt thử thì bỏ qua (resume sẽ crawl lại)
+        """
+        if over_budget:
+            self.deadline_misses += 1
+        if attempt >= self.product_retries:
+            self.gave_up += 1
+            print(f"⏱️ Giving up on {product_url} after {attempt + 1} attempts: {str(error)[:80]}")
+            return False
+        self.retried += 1
+        self.retries.append((product_url, category, attempt + 1))
+        reason = 'over budget' if over_budget else 'browser unavailable'
+        print(f"⏱️ {product_url} {reason} ({str(error)[:60]}), retrying later")
+        return True
+
+    def next_retry(self):
+        try:
+            return self.retries.popleft()
+        except IndexError:
+            return None
+
+    def retry_upload_later(self, item, attempt, error):
+        """
+        Upload quá deadline: item (đã extract, đã claim) được upload lại ở cuối lượt với
+        deadline mới, chung số lần thử product_retries với extract
+        """
+        self.deadline_misses += 1
+        if attempt >= self.product_retries:
+            self.gave_up += 1
+            print(f"  ⏱️ {item.name}: {error}, not saved after {attempt + 1} attempts (crawled again on the next run)")
+            return False
+        self.retried += 1
+        self.upload_retries.append((item, attempt + 1))
+        print(f"  ⏱️ {item.name}: {error}, upload retrying later")
+        return True
+
+    def next_upload_retry(self):
+        try:
+            return self.upload_retries.popleft()
+        except IndexError:
+            return None
+
+    def deadline_summary(self):
+        return (f"Deadline: {self.product_deadline}s/product, {self.deadline_misses} over budget, "
+                f"{self.retried} retried, {self.gave_up} given up, {self.watchdog.fired} watchdog kills, "
+                f"{self.recycled_pages} browsers recycled")
+
+    def launch_browser(self, p):
+        if self.browser_pool:
+            return self.browser_pool.connect(p)
+        return p.chromium.launch(headless=self.headless)
+
+    def new_page(self, browser, traced=False):
+        page = browser.new_page()
+        if self.http_cache:
+            self.http_cache.attach(page)
+        if traced and self.tracer:
+            self.tracer.attach(page)
+        return page
+
+    def static_extract(self, product_url, category, deadline=None):
+        """
+        Lấy HTML tĩnh qua HTTP và parse bằng adapter.parse_html.
+        Trả về (items, html) nếu mọi field đều có, None nếu cần browser.
+        """
+        try:
+            response = self.session.get(product_url, timeout=deadline.timeout(30) if deadline else 30)
+            response.raise_for_status()
+            html = response.text
+            items = self.adapter.parse_html(html, product_url, category)
+        except Exception as e:
+            print(f"  ↪ Static fetch failed ({str(e)[:50]}), using browser")
+            return None
+
+        missing = sorted({field for item in items for field in self.adapter.missing_fields(item)})
+        if not items or missing:
+            print(f"  ↪ Static HTML missing {', '.join(missing) or 'product'}, using browser")
+            return None
+        return items, html
+
+    def extract(self, pages, product_url, category, deadline=None):
+        """
+        Extract 1 sản phẩm. Thử HTML tĩnh trước (static_html), chỉ mở browser khi thiếu field.
+        pages.get(engine) trả về page của worker cho engine này (browser chỉ được khởi động khi cần).
+        Có snapshot_store thì lưu thêm DOM; fetch_only=True thì chỉ lưu snapshot
+        (parse sau bằng run_snapshots). Raise DeadlineExceeded nếu hết budget.
+        """
+        if deadline is None:
+            return self.extract_steps(pages, product_url, category, None)
+        with deadline.active():
+            items = self.extract_steps(pages, product_url, category, deadline)
+        deadline.check('extract')
+        return items
+
+    def extract_steps(self, pages, product_url, category, deadline):
+        if self.static_html:
+            if self.tracer:
+                result = self.tracer.run(None, product_url, lambda: self.static_extract(product_url, category, deadline),
+                                         path='static')
+            else:
+                result = self.static_extract(product_url, category, deadline)
+            if result:
+                self.static_hits += 1
+                items, html = result
+                if self.snapshot_store:
+                    self.snapshot_store.save(product_url, category, html)
+                return items
+            self.static_fallbacks += 1
+
+        page = pages.get(self)
+        if deadline:
+            # Action/wait_for_* của Playwright (không gồm evaluate) cũng dừng khi hết budget
+            page.set_default_timeout(deadline.timeout_ms(30000))
+        if self.tracer:
+            return self.tracer.run(page, product_url, lambda: self.browser_extract(page, product_url, category))
+        return self.browser_extract(page, product_url, category)
+
+    def browser_extract(self, page, product_url, category):
+        if self.fetch_only:
+            if self.adapter.load_product_page(page, product_url):
+                self.snapshot_store.save(product_url, category, page.content())
+            return []
+
+        items = self.adapter.extract_product(page, product_url, category)
+        if self.snapshot_store:
+            self.snapshot_store.save(product_url, category, page.content())
+        return items
+
+    def claim(self, item):
+        """
+        Giữ chỗ item trước khi upload, để 2 worker không upload cùng 1 sản phẩm.
+        Trả về False nếu sản phẩm đã crawl (hoặc worker khác đang xử lý).
+        """
+        if item.key is None:
+            return True
+        refresh = self.scheduler is not None and self.scheduler.is_planned(self.canonical_key(item.url))
+        with self.claim_lock:
+            if (not refresh and self.sink.is_crawled(item)) or not self.claimed.add(item.key):
+                print(f"  ⏭️  Skipped (already crawled): {item.name}")
+                return False
+            return True
+
+    def upload_images(self, item, deadline=None):
+        uploaded_images = []
+        total = len(item.images)
+        indexed = []
+        for img_idx, img_url in enumerate(item.images):
+            img_url = self.adapter.normalize_image_url(img_url)
+            if img_url:
+                indexed.append((img_idx, img_url))
+
+        folder = f"{self.adapter.storage_folder}/{item.folder}"
+        results = self.storage.upload_many([img_url for _, img_url in indexed], folder, timeout=30, deadline=deadline)
+        for (img_idx, _), (uploaded_url, existed) in zip(indexed, results):
+            if uploaded_url:
+                uploaded_images.append(uploaded_url)
+                print(f"  [{img_idx+1}/{total}] {'Exists' if existed else 'Uploaded'} ✓ {item.name}")
+            else:
+                print(f"  [{img_idx+1}/{total}] ✗ Skip {item.name}")
+        return uploaded_images
+
+    def write(self, item, uploaded_images):
+        if len(uploaded_images) == 0:
+            print(f"  ⚠️ No images saved for {item.name}")
+            if self.delta:
+                # Upload lỗi không phải sản phẩm bị gỡ: vẫn ghi dòng (giữ ảnh của lần trước)
+                self.record_delta(self.canonical_key(item.url), item, None)
+            return None
+
+        record = self.sink.write(item, uploaded_images)
+        key = self.canonical_key(item.url)
+        self.product_index.mark_crawled(key, item.url)
+        if self.delta:
+            self.record_delta(key, item, uploaded_images)
+        self.discovery.commit(item.url)
+        print(f"Progress: {len(self.sink)} {self.sink.unit} saved so far")
+        return record
+
+    def record_delta(self, key, item, uploaded_images):
+        """uploaded_images=None (upload lỗi): delta giữ ảnh trong snapshot"""
+        color = item.colors[0] if getattr(self.adapter, 'item_per_color', False) and item.colors else ''
+        self.delta.record(key, color, item.url, {
+            'category': item.category,
+            'name': item.name,
+            'price': item.price,
+            'colors': list(item.colors),
+            'images': list(uploaded_images) if uploaded_images is not None else None,
+            'description': item.description,
+        })
+
+    def start_run(self):
+        """Mở sink/index/scheduler/watchdog trước khi chạy pipeline"""
+        print(f"Total collections to crawl: {len(self.collection_urls)}\n")
+
+        self.sink.open()
+        self.open_indexes()
+        if self.scheduler:
+            self.scheduler.plan()
+        if self.watchdog:
+            self.watchdog.start()
+        if self.browser_pool:
+            self.browser_pool.start()
+
+    def finish_run(self, completed, close_storage=True):
+        """Đóng mọi thứ start_run() mở và in thống kê (close_storage=False khi storage dùng chung)"""
+        if self.watchdog:
+            self.watchdog.stop()
+            print(self.deadline_summary())
+        self.sink.close()
+        self.discovery.close()
+        print(f"Dedup: links {self.seen_links.summary()}")
+        print(f"Product index: {self.product_index.summary()}")
+        if close_storage:
+            print(self.storage.summary())
+            if self.storage.preprocessor:
+                print(self.storage.preprocessor.summary())
+            self.storage.close()
+        self.close_indexes()
+        if self.static_html:
+            print(f"Static HTML: {self.static_hits} products, browser fallback: {self.static_fallbacks}")
+            self.session.close()
+        if self.http_cache:
+            print(self.http_cache.summary())
+            self.http_cache.close()
+        if self.tracer:
+            print(self.tracer.summary())
+        if self.scheduler:
+            print(self.scheduler.summary())
+            self.scheduler.close()
+        if self.delta:
+            self.delta.close(completed=completed)
+            print(self.delta.summary())
+        if self.browser_pool:
+            self.browser_pool.stop()
+            print(self.browser_pool.summary())
+
+    def run(self):
+        self.start_run()
+        pipeline = Pipeline(
+            self,
+            extract_workers=self.extract_workers,
+            upload_workers=self.upload_workers,
+            autoscaler=self.autoscaler
+        )
+        completed = False
+        try:
+            pipeline.run()
+            completed = True
+        except KeyboardInterrupt:
+            print("\n\n" + "="*60)
+            print("⚠️ SCRIPT INTERRUPTED BY USER (Ctrl+C)")
+            print(f"Data saved: {len(self.sink)} {self.sink.unit}")
+            print("="*60)
+        except Exception as e:
+            print(f"\n\n⚠️ Script error: {e}")
+        finally:
+            self.finish_run(completed)
+
+    def run_snapshots(self, store, parse_workers=None):
+        """
+        Stage parse offline: parse snapshot bằng process pool, upload bằng thread pool,
+        ghi sink trên main thread. Không cần browser.
+        """
+        print(f"Snapshot store: {store.root}\n")
+
+        self.sink.open()
+        self.open_indexes()
+        pending = deque()
+        max_pending = self.upload_workers * 4
+
+        def drain(limit):
+            while len(pending) > limit:
+                item, future = pending.popleft()
+                self.write(item, future.result())
+
+        try:
+            with ThreadPoolExecutor(max_workers=self.upload_workers) as uploader:
+                for items in parse_snapshots(store, self.adapter, parse_workers):
+                    for item in items:
+                        if self.claim(item):
+                            pending.append((item, uploader.submit(self.upload_images, item)))
+                    drain(max_pending)
+                drain(0)
+        except KeyboardInterrupt:
+            print("\n⚠️ SCRIPT INTERRUPTED BY USER (Ctrl+C)")
+        finally:
+            self.sink.close()
+            self.close_indexes()
+            print(self.storage.summary())
+            if self.storage.preprocessor:
+                print(self.storage.preprocessor.summary())
+            self.storage.close()
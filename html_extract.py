@@ -0,0 +1,52 @@
+import lxml.html
+
+
+def parse_document(html, base_url=None):
+    doc = lxml.html.document_fromstring(html)
+    if base_url:
+        doc.make_links_absolute(base_url, resolve_base_href=True)
+    return doc
+
+
+def select(doc, css):
+    return doc.cssselect(css)
+
+
+def select_first(doc, css):
+    """Tương đương document.querySelector: phần tử đầu tiên theo thứ tự trong document"""
+    found = doc.cssselect(css)
+    return found[0] if found else None
+
+
+def text_of(el):
+    """Tương đương el.textContent.trim()"""
+    return el.text_content().strip() if el is not None else ''
+
+
+def first_text(doc, css, default=''):
+    return text_of(select_first(doc, css)) or default
+
+
+def img_src(img, use_srcset=False):
+    """Tương đương img.src || data-src (|| srcset đầu tiên)"""
+    src = img.get('src') or img.get('data-src')
+    if not src and use_srcset:
+        srcset = img.get('srcset')
+        if srcset:
+            src = srcset.split(' ')[0]
+    return src
+
+
+def is_inside(el, containers):
+    """Tương đương el.closest(css) != null, với containers = set(select(doc, css))"""
+    node = el
+    while node is not None:
+        if node in containers:
+            return True
+        node = node.getparent()
+    return False
+
+
+def unique(values):
+    """Tương đương [...new Set(values)]: bỏ trùng, giữ thứ tự"""
+    return list(dict.fromkeys(values))
@@ -0,0 +1,173 @@
+import os
+import json
+import time
+import zlib
+import hashlib
+import sqlite3
+import threading
+
+CACHED_RESOURCE_TYPES = ('document', 'xhr', 'fetch', 'script', 'stylesheet')
+SKIPPED_HEADERS = ('content-encoding', 'content-length', 'transfer-encoding')
+
+
+class HttpCache:
+    """
+    Cache HTTP trên đĩa cho Playwright (page.route / context.route).
+
+    - blobs/<2 ký tự đầu>/<sha256 body>: body nén zlib, content-addressed
+      (nhiều URL cùng nội dung, ví dụ cùng 1 file JS, chỉ lưu 1 lần)
+    - index.db: sha256(method + url) -> status, headers, blob, thời điểm lưu
+
+    mode='record': đọc cache nếu còn hạn (ttl giây), không có thì fetch mạng rồi lưu lại
+    mode='replay': chỉ phục vụ từ cache (bỏ qua ttl), không đụng mạng -> kết quả extract
+                   lặp lại được, dùng để chạy lại script extract / regression test.
+                   Request không có trong cache bị abort.
+    Ảnh/font/media không được cache (record: đi thẳng ra mạng, replay: abort).
+    """
+
+    def __init__(self, cache_dir, mode='record', ttl=7 * 24 * 3600, resource_types=CACHED_RESOURCE_TYPES):
+        self.cache_dir = cache_dir
+        self.mode = mode
+        self.ttl = ttl
+        self.resource_types = resource_types
+        self.hits = 0
+        self.misses = 0
+        self.stored = 0
+
+        os.makedirs(os.path.join(cache_dir, 'blobs'), exist_ok=True)
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(os.path.join(cache_dir, 'index.db'), check_same_thread=False)
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS responses (
+                key TEXT PRIMARY KEY,
+                url TEXT,
+                status INTEGER,
+                headers TEXT,
+                blob TEXT,
+                stored_at REAL
+            )
+        """)
+        self.conn.commit()
+
+    @staticmethod
+    def request_key(method, url, post_data=None):
+        h = hashlib.sha256(f"{method} {url}".encode('utf-8'))
+        if post_data:
+            h.update(post_data if isinstance(post_data, bytes) else post_data.encode('utf-8'))
+        return h.hexdigest()
+
+    def blob_path(self, digest):
+        return os.path.join(self.cache_dir, 'blobs', digest[:2], digest)
+
+    def put(self, method, url, status, headers, body, post_data=None):
+        digest = hashlib.sha256(body).hexdigest()
+        path = self.blob_path(digest)
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp_path = f"{path}.{threading.get_ident()}.tmp"
+            with open(tmp_path, 'wb') as f:
+                f.write(zlib.compress(body, 6))
+            os.replace(tmp_path, path)
+
+        headers = {k: v for k, v in headers.items() if k.lower() not in SKIPPED_HEADERS}
+        with self.lock:
+            self.conn.execute(
+                'INSERT OR REPLACE INTO responses (key, url, status, headers, blob, stored_at) VALUES (?, ?, ?, ?, ?, ?)',
+                (self.request_key(method, url, post_data), url, status, json.dumps(headers), digest, time.time())
+            )
+            self.conn.commit()
+        self.stored += 1
+
+    def get(self, method, url, post_data=None, ignore_ttl=False):
+        """Trả về (status, headers, body) hoặc None"""
+        with self.lock:
+            row = self.conn.execute(
+                'SELECT status, headers, blob, stored_at FROM responses WHERE key = ?',
+                (self.request_key(method, url, post_data),)
+            ).fetchone()
+        if not row:
+            return None
+        status, headers, digest, stored_at = row
+        if not ignore_ttl and self.ttl and time.time() - stored_at > self.ttl:
+            return None
+        try:
+            with open(self.blob_path(digest), 'rb') as f:
+                body = zlib.decompress(f.read())
+        except (OSError, zlib.error):
+            return None
+        return status, json.loads(headers), body
+
+    def attach(self, target):
+        """Gắn cache vào page hoặc browser context"""
+        if self.mode in ('record', 'replay'):
+            target.route('**/*', self.handle_route)
+
+    def handle_route(self, route, request):
+        if request.resource_type not in self.resource_types:
+            if self.mode == 'replay':
+                route.abort()
+            else:
+                route.continue_()
+            return
+
+        method = request.method
+        post_data = request.post_data_buffer if method != 'GET' else None
+        cached = self.get(method, request.url, post_data, ignore_ttl=self.mode == 'replay')
+        if cached:
+            self.hits += 1
+            status, headers, body = cached
+            route.fulfill(status=status, headers=headers, body=body)
+            return
+
+        self.misses += 1
+        if self.mode == 'replay':
+            route.abort('internetdisconnected')
+            return
+
+        try:
+            response = route.fetch()
+            body = response.body()
+        except Exception:
+            route.abort()
+            return
+        if response.status < 400:
+            self.put(method, request.url, response.status, response.headers, body, post_data)
+        route.fulfill(response=response, body=body)
+
+    def purge_expired(self):
+        """Xóa entry hết hạn và blob không còn entry nào trỏ tới"""
+        cutoff = time.time() - self.ttl
+        with self.lock:
+            self.conn.execute('DELETE FROM responses WHERE stored_at < ?', (cutoff,))
+            self.conn.commit()
+            used = {row[0] for row in self.conn.execute('SELECT DISTINCT blob FROM responses')}
+
+        removed = 0
+        blobs_dir = os.path.join(self.cache_dir, 'blobs')
+        for prefix in os.listdir(blobs_dir):
+            for digest in os.listdir(os.path.join(blobs_dir, prefix)):
+                if digest not in used:
+                    os.remove(os.path.join(blobs_dir, prefix, digest))
+                    removed += 1
+        return removed
+
+    def summary(self):
+        return f"HTTP cache ({self.mode}): {self.hits} hits, {self.misses} misses, {self.stored} stored"
+
+    def close(self):
+        self.conn.close()
+
+
+if __name__ == "__main__":
+    import sys
+
+    if len(sys.argv) < 2:
+        print("Usage: python http_cache.py <cache_dir> [--purge]")
+        exit()
+
+    cache = HttpCache(sys.argv[1])
+    count, = cache.conn.execute('SELECT COUNT(*) FROM responses').fetchone()
+    print(f"Entries: {count}")
+    if '--purge' in sys.argv:
+        print(f"✓ Removed {cache.purge_expired()} unused blobs")
+    cache.close()
@@ -0,0 +1,61 @@
+import re
+import hashlib
+import unicodedata
+
+# Số bit của id theo loại: category/color vừa INTEGER 32-bit, product 48-bit
+# (<= 15 chữ số nên Excel giữ đúng, cần BIGINT trên PostgreSQL)
+ID_BITS = {
+    'category': 31,
+    'color': 31,
+    'product': 48,
+}
+
+
+def normalize_key(text):
+    """Key so sánh: Unicode NFC, chữ thường, gộp khoảng trắng"""
+    text = unicodedata.normalize('NFC', str(text))
+    return re.sub(r'\s+', ' ', text).strip().casefold()
+
+
+def stable_id(kind, key, salt=0):
+    """Id suy ra từ (loại, key đã chuẩn hóa): cùng entity luôn cùng id, không cần bộ đếm chung"""
+    material = f"{kind}\0{normalize_key(key)}" + (f"\0{salt}" if salt else '')
+    digest = hashlib.blake2b(material.encode('utf-8'), digest_size=8).digest()
+    value = int.from_bytes(digest, 'big') & ((1 << ID_BITS[kind]) - 1)
+    return value or 1
+
+
+class IdAllocator:
+    """
+    Cấp id ổn định theo key (hash), không phụ thuộc thứ tự crawl hay worker/shard nào crawl:
+    chạy lại, chạy song song hay chia shard đều ra cùng id cho cùng category/màu/sản phẩm,
+    nên gộp shard chỉ cần bỏ id trùng (seed_export.merge_journals).
+
+    Hai key khác nhau trùng hash (rất hiếm) thì key đến sau lấy id với salt kế tiếp;
+    remember() nạp lại id đã cấp (journal cũ) để giữ nguyên lựa chọn đó khi resume.
+    """
+
+    def __init__(self):
+        self.by_id = {kind: {} for kind in ID_BITS}
+        self.by_key = {kind: {} for kind in ID_BITS}
+        self.collisions = 0
+
+    def remember(self, kind, key, entity_id):
+        key = normalize_key(key)
+        self.by_id[kind][entity_id] = key
+        self.by_key[kind][key] = entity_id
+
+    def id_for(self, kind, key):
+        normalized = normalize_key(key)
+        entity_id = self.by_key[kind].get(normalized)
+        if entity_id is not None:
+            return entity_id
+
+        salt = 0
+        entity_id = stable_id(kind, normalized)
+        while self.by_id[kind].get(entity_id, normalized) != normalized:
+            self.collisions += 1
+            salt += 1
+            entity_id = stable_id(kind, normalized, salt)
+        self.remember(kind, normalized, entity_id)
+        return entity_id
@@ -0,0 +1,123 @@
+import io
+import time
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+# format -> (format Pillow, content type)
+FORMATS = {
+    'webp': ('WEBP', 'image/webp'),
+    'jpeg': ('JPEG', 'image/jpeg'),
+}
+
+
+def process_image(data, max_dimension, fmt, quality):
+    """
+    Chạy trong process con: xoay theo EXIF, resize cạnh dài về max_dimension,
+    encode lại (không kèm EXIF/ICC/XMP). Trả về (bytes, content_type, đã resize hay chưa).
+    """
+    from PIL import Image, ImageOps
+
+    pil_format, content_type = FORMATS[fmt]
+    with Image.open(io.BytesIO(data)) as source:
+        image = ImageOps.exif_transpose(source)
+        resized = max(image.size) > max_dimension
+        if resized:
+            image.thumbnail((max_dimension, max_dimension), Image.LANCZOS)
+
+        has_alpha = image.mode in ('RGBA', 'LA') or (image.mode == 'P' and 'transparency' in image.info)
+        if pil_format == 'JPEG':
+            if has_alpha:
+                rgba = image.convert('RGBA')
+                background = Image.new('RGB', rgba.size, (255, 255, 255))
+                background.paste(rgba, mask=rgba.getchannel('A'))
+                image = background
+            elif image.mode != 'RGB':
+                image = image.convert('RGB')
+            options = {'quality': quality, 'optimize': True, 'progressive': True}
+        else:
+            if image.mode not in ('RGB', 'RGBA'):
+                image = image.convert('RGBA' if has_alpha else 'RGB')
+            options = {'quality': quality, 'method': 4}
+
+        out = io.BytesIO()
+        image.save(out, pil_format, **options)
+    return out.getvalue(), content_type, resized
+
+
+class ImagePreprocessor:
+    """
+    Thu nhỏ ảnh trước khi upload (storage.preprocessor): resize về max_dimension,
+    bỏ metadata, encode lại WebP/JPEG ở quality. Pillow chạy trên ProcessPoolExecutor
+    (CPU-bound, không bị GIL chặn), thread upload chỉ chờ kết quả.
+
+    Ảnh không decode được (SVG, file hỏng) hoặc bản encode lại không nhỏ hơn mà không cần
+    resize thì giữ nguyên bản gốc.
+    """
+
+    def __init__(self, max_dimension=1600, format='webp', quality=80, workers=None):
+        if format not in FORMATS:
+            raise ValueError(f"Unknown image format: {format} (chọn: {', '.join(FORMATS)})")
+        self.max_dimension = max_dimension
+        self.format = format
+        self.quality = quality
+        self.workers = workers
+        self.executor = None
+        self.executor_lock = threading.Lock()
+
+        self.stats_lock = threading.Lock()
+        self.count = 0
+        self.kept = 0
+        self.failed = 0
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self.busy = 0.0
+        self.first = None
+        self.last = None
+
+    def get_executor(self):
+        with self.executor_lock:
+            if self.executor is None:
+                self.executor = ProcessPoolExecutor(max_workers=self.workers)
+            return self.executor
+
+    def process(self, data, content_type, timeout=None):
+        """Trả về (bytes, content_type) sẽ upload"""
+        started = time.time()
+        kept = failed = False
+        if not content_type.startswith('image/') or content_type == 'image/svg+xml':
+            out, out_type, kept = data, content_type, True
+        else:
+            try:
+                future = self.get_executor().submit(process_image, data, self.max_dimension, self.format, self.quality)
+                out, out_type, resized = future.result(timeout=timeout)
+                if len(out) >= len(data) and not resized:
+                    out, out_type, kept = data, content_type, True
+            except Exception as e:
+                print(f"  ⚠️ Preprocess failed ({str(e)[:60]}), uploading original")
+                out, out_type, failed = data, content_type, True
+
+        with self.stats_lock:
+            self.count += 1
+            self.kept += kept
+            self.failed += failed
+            self.bytes_in += len(data)
+            self.bytes_out += len(out)
+            self.busy += time.time() - started
+            self.first = started if self.first is None else min(self.first, started)
+            self.last = time.time()
+        return out, out_type
+
+    def summary(self):
+        megabytes_in = self.bytes_in / 1024 / 1024
+        megabytes_out = self.bytes_out / 1024 / 1024
+        ratio = f", {self.bytes_in / self.bytes_out:.1f}x smaller" if self.bytes_out else ''
+        elapsed = (self.last - self.first) if self.first else 0
+        rate = f", {self.count / elapsed:.1f} img/s" if elapsed > 0 else ''
+        return (f"Preprocess ({self.format} q{self.quality}, max {self.max_dimension}px): {self.count} images, "
+                f"{megabytes_in:.1f} MB → {megabytes_out:.1f} MB{ratio}{rate}, "
+                f"{self.kept} kept original, {self.failed} failed")
+
+    def close(self):
+        if self.executor:
+            self.executor.shutdown(wait=True)
+            self.executor = None
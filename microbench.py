@@ -0,0 +1,300 @@
+"""
+Microbenchmark cho phần Python thuần (chuẩn hóa seed data, ghi Excel) trên catalog tổng hợp:
+
+    python microbench.py --sizes 1k,100k --out bench_results.json
+    python microbench.py --sizes 1k,100k,1m --baseline bench_results.json --threshold 0.15
+
+Mỗi case chạy `repeat` lần lấy lần nhanh nhất (ops/s), thêm 1 lần dưới tracemalloc để đo
+peak memory (chỉ tính bộ nhớ cấp phát trong lúc chạy case, không tính catalog).
+So với --baseline: ops/s giảm hoặc peak memory tăng quá threshold thì báo regression
+và thoát với mã 1 (dùng được trong CI). Kết quả ghi ra --out (JSON) để làm baseline lần sau.
+"""
+import io
+import os
+import sys
+import json
+import time
+import random
+import shutil
+import platform
+import tempfile
+import tracemalloc
+from contextlib import redirect_stdout
+
+SIZES = {'1k': 1_000, '10k': 10_000, '100k': 100_000, '1m': 1_000_000}
+
+# Thời gian tối thiểu của 1 lượt đo (giây)
+MIN_TIME = 0.2
+
+TYPES = ['Áo Thun', 'Áo Sơ Mi', 'Áo Khoác', 'Áo Hoodie', 'Áo Polo', 'Áo Len', 'Quần Jean', 'Quần Short']
+FITS = ['Relaxed Fit', 'Slim Fit', 'Oversized', 'Regular Fit', 'Dài Tay', 'Ngắn Tay', '', '']
+DESIGNS = ['Summer Vibes', 'Sea Life', 'Hoa Sen', 'Phố Cổ', 'Sài Gòn Nights', 'Mây Trắng', 'Basic',
+           'Rồng Vàng', 'Tết Đoàn Viên', 'Hà Nội Mùa Thu', 'Cà Phê Sữa Đá', 'Retro 90s']
+MATERIALS = ['', 'Cotton Cao Cấp', 'Cotton 100%', 'Chất Liệu Thoáng Mát']
+COLORS = ['Đen', 'Trắng', 'Xanh Navy', 'Trắng Cổ Đen', 'Be', 'Xám Tiêu', 'Đỏ Đô', 'Vàng Nghệ', 'N/A', '']
+SLUGS = ['ao-thun-relaxed-fit', 'ao-so-mi', 'ao-khoac-bomber', 'quan-jean-slim-fit', 'ao-polo', 'do-bo']
+
+
+def parse_size(text):
+    text = text.strip().lower()
+    return SIZES[text] if text in SIZES else int(text)
+
+
+def synthetic_catalog(rows, seed=42):
+    """Catalog tiếng Việt giả lập, cố định theo seed (tên, màu, giá, URL collection, mô tả gốc)"""
+    rng = random.Random(seed)
+    catalog = []
+    for idx in range(rows):
+        name = ' '.join(part for part in (
+            rng.choice(TYPES), rng.choice(FITS), rng.choice(DESIGNS), rng.choice(MATERIALS)
+        ) if part)
+        catalog.append({
+            'name': f"{name} {idx % 997}",
+            'color': rng.choice(COLORS),
+            'price': f"{rng.randint(99, 899)}.000 đ",
+            'url': f"https://theneworiginals.co/collections/{rng.choice(SLUGS)}?page={idx % 9}",
+            'images': [f"https://res.cloudinary.com/demo/image/upload/tno/p{idx}/{n}.jpg" for n in range(4)],
+        })
+    return catalog
+
+
+# --- cases: setup(catalog, work_dir) -> run() trả về số op đã chạy ---
+
+def case_format_name(catalog, work_dir):
+    from seed_crawler import ProductNameFormatter
+    names = [row['name'] for row in catalog]
+
+    def run():
+        for name in names:
+            ProductNameFormatter.format_name(name)
+        return len(names)
+    return run
+
+
+def case_description(catalog, work_dir):
+    from seed_crawler import DescriptionGenerator
+    rows = [(row['name'], row['color']) for row in catalog]
+
+    def run():
+        random.seed(0)
+        for name, color in rows:
+            DescriptionGenerator.generate(name, color)
+        return len(rows)
+    return run
+
+
+def case_color_parser(catalog, work_dir):
+    from seed_crawler import ColorParser
+    colors = [row['color'] for row in catalog]
+
+    def run():
+        for color in colors:
+            ColorParser.normalize_color_name(color)
+        return len(colors)
+    return run
+
+
+def case_price_parser(catalog, work_dir):
+    from seed_crawler import PriceParser
+    prices = [row['price'] for row in catalog]
+
+    def run():
+        for price in prices:
+            PriceParser.parse(price)
+        return len(prices)
+    return run
+
+
+def case_category_parser(catalog, work_dir):
+    from seed_crawler import CategoryParser
+    urls = [row['url'] for row in catalog]
+
+    def run():
+        for url in urls:
+            CategoryParser.parse(url)
+        return len(urls)
+    return run
+
+
+def case_append_to_excel(catalog, work_dir):
+    from records import ProductRecord
+    from sinks import ProductExcelSink
+    records = [
+        ProductRecord(category='Áo Thun', product_name=row['name'], price=row['price'], colors=row['color'],
+                      images=row['images'], description='Mô tả sản phẩm')
+        for row in catalog
+    ]
+
+    def run():
+        # Append vào journal + export write_only cuối cùng (như ProductExcelSink.close)
+        sink = ProductExcelSink('bench_append', checkpoint_every=0)
+        sink.excel_path = os.path.join(work_dir, 'append.xlsx')
+        sink.journal_path = os.path.join(work_dir, 'append.journal.jsonl')
+        with redirect_stdout(io.StringIO()):
+            sink.journal = open(sink.journal_path, 'w', encoding='utf-8')
+            for record in records:
+                sink.append_to_excel(record, record.product_name)
+            sink.journal.close()
+            sink.journal = None
+            sink.write_workbook(sink.excel_path)
+        return len(records)
+    return run
+
+
+def case_save_to_excel(catalog, work_dir):
+    from records import ExtractedItem
+    from sinks import SeedSink
+    from seed_export import SeedExcelExporter
+
+    excel_path = os.path.join(work_dir, 'seed_bench.xlsx')
+    sink = SeedSink(checkpoint_every=0)
+    sink.excel_path = excel_path
+    sink.exporter = SeedExcelExporter(excel_path, checkpoint_every=0)
+    with redirect_stdout(io.StringIO()):
+        sink.open()
+        for idx, row in enumerate(catalog):
+            item = ExtractedItem(url=f"https://theneworiginals.co/products/p{idx}", category='Áo Thun',
+                                 name=row['name'], price=159000, colors=[row['color'] or 'N/A'],
+                                 images=row['images'], description='Mô tả', folder='bench', key=row['name'])
+            sink.write(item, row['images'])
+        sink.crawled_products.close()
+
+    def run():
+        with redirect_stdout(io.StringIO()):
+            sink.save_to_excel()
+        return len(catalog)
+    return run
+
+
+CASES = {
+    'format_name': case_format_name,
+    'description': case_description,
+    'color_parser': case_color_parser,
+    'price_parser': case_price_parser,
+    'category_parser': case_category_parser,
+    'append_to_excel': case_append_to_excel,
+    'save_to_excel': case_save_to_excel,
+}
+
+
+def measure(run, repeat, memory=True, min_time=MIN_TIME):
+    """
+    Mỗi lượt gọi run() lặp lại tới khi đủ min_time giây (case 1k chỉ mất vài ms, đo 1 lần
+    nhiễu quá), lấy lượt nhanh nhất. seconds = thời gian 1 lần run() ở tốc độ đó.
+    """
+    rates = []
+    ops = 0
+    for _ in range(repeat):
+        done = 0
+        start = time.perf_counter()
+        while True:
+            ops = run()
+            done += ops
+            elapsed = time.perf_counter() - start
+            if elapsed >= min_time:
+                break
+        rates.append(done / elapsed)
+    best = max(rates)
+
+    peak = None
+    if memory:
+        tracemalloc.start()
+        try:
+            run()
+            peak = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+    return {
+        'ops': ops,
+        'seconds': round(ops / best, 6),
+        'ops_per_sec': round(best, 1),
+        'peak_kb': round(peak / 1024, 1) if peak is not None else None,
+    }
+
+
+def run_suite(sizes, cases=None, repeat=3, memory=True):
+    results = {}
+    work_dir = tempfile.mkdtemp(prefix='microbench_')
+    try:
+        for label in sizes:
+            rows = parse_size(label)
+            catalog = synthetic_catalog(rows)
+            for name in cases or CASES:
+                run = CASES[name](catalog, work_dir)
+                result = measure(run, repeat, memory)
+                key = f"{name}@{label}"
+                results[key] = result
+                peak = f"{result['peak_kb']:>10,.0f} KB peak" if result['peak_kb'] is not None else ''
+                print(f"  {key:<24} {result['ops_per_sec'] or 0:>14,.0f} ops/s  "
+                      f"({result['ops']:,} ops in {result['seconds']:.3f}s)  {peak}")
+            del catalog
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+    return results
+
+
+def compare(results, baseline, threshold):
+    """Trả về danh sách regression (ops/s giảm hoặc peak memory tăng quá threshold)"""
+    regressions = []
+    for key, current in results.items():
+        previous = baseline.get(key)
+        if not previous:
+            continue
+        if previous.get('ops_per_sec') and current['ops_per_sec']:
+            change = current['ops_per_sec'] / previous['ops_per_sec'] - 1
+            if change < -threshold:
+                regressions.append(f"{key}: ops/s {previous['ops_per_sec']:,.0f} → {current['ops_per_sec']:,.0f} ({change:+.0%})")
+        if previous.get('peak_kb') and current['peak_kb'] is not None:
+            change = current['peak_kb'] / previous['peak_kb'] - 1
+            if change > threshold:
+                regressions.append(f"{key}: peak {previous['peak_kb']:,.0f} KB → {current['peak_kb']:,.0f} KB ({change:+.0%})")
+    return regressions
+
+
+def main(argv=None):
+    import argparse
+
+    parser = argparse.ArgumentParser(prog='microbench.py', description='Microbenchmark normalization/output hot paths')
+    parser.add_argument('--sizes', default='1k,100k', help="1k,10k,100k,1m hoặc số dòng")
+    parser.add_argument('--cases', help=f"Chỉ chạy các case này ({', '.join(CASES)})")
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--no-memory', action='store_true', help="Bỏ lượt đo tracemalloc")
+    parser.add_argument('--out', help="Ghi kết quả (JSON) để làm baseline")
+    parser.add_argument('--baseline', help="File kết quả lần trước để so sánh")
+    parser.add_argument('--threshold', type=float, default=0.15, help="Ngưỡng regression (0.15 = 15%%)")
+    args = parser.parse_args(argv)
+
+    cases = args.cases.split(',') if args.cases else None
+    unknown = [name for name in cases or [] if name not in CASES]
+    if unknown:
+        raise SystemExit(f"⚠️ Unknown case: {', '.join(unknown)}")
+
+    sizes = [size for size in args.sizes.split(',') if size]
+    print(f"Microbenchmark: sizes {', '.join(sizes)}, best of {args.repeat}, Python {platform.python_version()}")
+    results = run_suite(sizes, cases, args.repeat, memory=not args.no_memory)
+
+    if args.out:
+        with open(args.out, 'w', encoding='utf-8') as f:
+            json.dump({
+                'python': platform.python_version(),
+                'machine': platform.machine(),
+                'created': time.strftime('%Y-%m-%d %H:%M:%S'),
+                'results': results,
+            }, f, indent=2)
+        print(f"✓ Results saved: {args.out}")
+
+    if args.baseline:
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)['results']
+        regressions = compare(results, baseline, args.threshold)
+        if regressions:
+            print(f"⚠️ {len(regressions)} regression(s) vs {args.baseline} (threshold {args.threshold:.0%}):")
+            for line in regressions:
+                print(f"  - {line}")
+            return 1
+        print(f"✓ No regression vs {args.baseline} (threshold {args.threshold:.0%})")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,368 @@
+import queue
+import threading
+import time
+from collections import deque
+from pipeline import DONE, StageStats, WorkerPage, extract_task, upload_task, write_task
+
+
+class Lane:
+    """Hàng đợi của 1 site trong FairQueue"""
+
+    def __init__(self, weight, cap):
+        self.weight = weight
+        self.cap = cap
+        self.tasks = deque()
+        self.in_flight = 0
+        self.vtime = 0.0
+        self.closed = False
+
+    def __len__(self):
+        return len(self.tasks)
+
+    @property
+    def ready(self):
+        return len(self) > 0 and (self.cap is None or self.in_flight < self.cap)
+
+
+class FairQueue:
+    """
+    Hàng đợi chung cho nhiều site, chia worker theo trọng số (stride scheduling):
+    mỗi lần get() lấy site có virtual time nhỏ nhất trong các site còn task và chưa chạm cap,
+    rồi cộng 1/weight vào virtual time của site đó. Site weight 2 được phục vụ gấp đôi
+    site weight 1 khi cả hai đều có việc; site vừa có việc trở lại không được "bù"
+    phần thời gian đã nghỉ (vtime kéo lên bằng đồng hồ chung).
+
+    cap = số task của site đang chạy cùng lúc tối đa (task_done() trả lại chỗ).
+    Mỗi site có giới hạn riêng (maxsize) nên site này đầy không chặn put() của site khác.
+    """
+
+    def __init__(self, maxsize=200):
+        self.maxsize = maxsize
+        self.lanes = {}
+        self.clock = 0.0
+        self.cond = threading.Condition()
+
+    def add_site(self, site, weight=1.0, cap=None):
+        with self.cond:
+            self.lanes[site] = Lane(weight, cap)
+
+    def put(self, site, task, stop_event):
+        lane = self.lanes[site]
+        with self.cond:
+            while len(lane) >= self.maxsize:
+                if stop_event.is_set():
+                    return False
+                self.cond.wait(0.5)
+            if len(lane) == 0:
+                lane.vtime = max(lane.vtime, self.clock)
+            lane.tasks.append(task)
+            self.cond.notify_all()
+        return True
+
+    def close(self, site):
+        with self.cond:
+            self.lanes[site].closed = True
+            self.cond.notify_all()
+
+    def close_all(self):
+        for site in self.lanes:
+            self.close(site)
+
+    def finished(self):
+        return all(lane.closed and len(lane) == 0 for lane in self.lanes.values())
+
+    def all_closed(self):
+        """Mọi site đã close (không còn task mới, có thể vẫn còn task trong hàng đợi)"""
+        return all(lane.closed for lane in self.lanes.values())
+
+    def get(self, stop_event):
+        """Trả về (site, task) hoặc DONE khi mọi site đã close và hết task"""
+        with self.cond:
+            while not stop_event.is_set():
+                ready = [(lane.vtime, site) for site, lane in self.lanes.items() if lane.ready]
+                if ready:
+                    _, site = min(ready)
+                    lane = self.lanes[site]
+                    self.clock = lane.vtime
+                    lane.vtime += 1.0 / lane.weight
+                    lane.in_flight += 1
+                    self.cond.notify_all()
+                    return site, lane.tasks.popleft()
+                if self.finished():
+                    return DONE
+                self.cond.wait(0.5)
+        return DONE
+
+    def task_done(self, site):
+        with self.cond:
+            self.lanes[site].in_flight -= 1
+            self.cond.notify_all()
+
+
+class MultiSitePipeline:
+    """
+    Chạy nhiều site (mỗi site 1 CrawlEngine) trong 1 process, dùng chung:
+
+        discovery (1 thread/site) --FairQueue--> extract (N worker chung) --FairQueue--> upload (M thread chung)
+                                                                                          --> sink (main thread)
+
+    - Mỗi extract worker có 1 Chromium, mỗi site 1 page/context riêng trên browser đó
+      (tổng cộng N browser thay vì N cho mỗi site). Discovery bằng browser vẫn mở browser
+      riêng trong lúc duyệt collection; discovery='sitemap' thì không.
+    - Link/item của các site được chia theo weight, cap giới hạn số sản phẩm 1 site chiếm
+      worker cùng lúc: site chậm không giữ hết worker, site nhanh không bị bỏ đói.
+    - Storage cùng instance (CLI dùng chung theo cấu hình) thì chung thread pool upload.
+    - autoscaler (autoscale.Autoscaler): số extract worker chạy do autoscaler quyết
+      (tối đa autoscaler.max_workers) thay cho extract_workers.
+    - browser_pool (browser_pool.BrowserPool): mọi worker/site connect tới browser từ xa.
+    Worker và browser dùng chung cho mọi site, nên autoscaler/browser_pool chỉ cấu hình
+    được ở cấp pipeline: engine có autoscaler/browser_pool riêng bị add_site() từ chối.
+
+        pipeline = MultiSitePipeline(extract_workers=4, upload_workers=8)
+        pipeline.add_site('coolmate', coolmate_crawler, weight=2, max_concurrency=3)
+        pipeline.add_site('tno', tno_crawler)
+        pipeline.run()
+    """
+
+    def __init__(self, extract_workers=4, upload_workers=8,
+                 link_queue_size=200, item_queue_size=20, result_queue_size=50, autoscaler=None,
+                 browser_pool=None):
+        self.autoscaler = autoscaler
+        self.browser_pool = browser_pool
+        if autoscaler:
+            extract_workers = autoscaler.max_workers
+        self.extract_workers = extract_workers
+        self.upload_workers = upload_workers
+        self.engines = {}
+
+        self.links = FairQueue(link_queue_size)
+        self.items = FairQueue(item_queue_size)
+        self.result_queue = queue.Queue(maxsize=result_queue_size)
+
+        self.stop_event = threading.Event()
+        self.lock = threading.Lock()
+        self.active_extractors = extract_workers
+        self.active_uploaders = upload_workers
+        self.links_found = {}
+        self.recycled = 0
+        self.stats = {}
+        self.threads = []
+
+    def add_site(self, site, engine, weight=1.0, max_concurrency=None):
+        for option in ('autoscaler', 'browser_pool'):
+            if getattr(engine, option) is not None:
+                raise ValueError(f"{site}: {option} is shared by all sites, pass it to MultiSitePipeline")
+        self.engines[site] = engine
+        self.links.add_site(site, weight, max_concurrency)
+        self.items.add_site(site, weight)
+        self.links_found[site] = 0
+        self.stats[site] = {stage: StageStats(stage) for stage in ('discovery', 'extract', 'upload', 'sink')}
+
+    def start_thread(self, target, name, *args):
+        thread = threading.Thread(target=target, args=args, name=name, daemon=True)
+        thread.start()
+        self.threads.append(thread)
+
+    def discovery_stage(self, site):
+        engine = self.engines[site]
+        discovery = engine.discovery
+        start = time.time()
+        try:
+            if discovery.uses_browser:
+                from playwright.sync_api import sync_playwright
+                with sync_playwright() as p:
+                    browser = engine.launch_browser(p)
+                    page = engine.new_page(browser)
+                    self.feed_links(site, discovery.iter_links(page))
+                    browser.close()
+            else:
+                self.feed_links(site, discovery.iter_links())
+            self.feed_links(site, engine.scheduled_links())
+            self.stats[site]['discovery'].record(time.time() - start)
+        except Exception as e:
+            self.stats[site]['discovery'].record(time.time() - start, ok=False)
+            print(f"⚠️ [{site}] Discovery stage error: {str(e)[:100]}")
+        finally:
+            print(f"\n✓ [{site}] Discovery finished: {self.links_found[site]} product links")
+            self.links.close(site)
+
+    def feed_links(self, site, batches):
+        engine = self.engines[site]
+        for batch in batches:
+            for task in batch:
+                if not engine.should_crawl(*task):
+                    continue
+                if not self.links.put(site, task, self.stop_event):
+                    return
+                with self.lock:
+                    self.links_found[site] += 1
+
+    def next_retry(self):
+        for site, engine in self.engines.items():
+            task = engine.next_retry()
+            if task:
+                return site, task
+        return None
+
+    def next_upload_retry(self):
+        for site, engine in self.engines.items():
+            retry = engine.next_upload_retry()
+            if retry:
+                item, attempt = retry
+                return site, (item, engine.new_deadline(), attempt)
+        return None
+
+    def extract_stage(self, slot=0):
+        name = threading.current_thread().name
+        pages = WorkerPage(name)
+        autoscaler = self.autoscaler
+        if autoscaler:
+            autoscaler.attach(slot, pages)
+        try:
+            while True:
+                if autoscaler and not autoscaler.wait_turn(slot, pages, self.stop_event, self.links.all_closed):
+                    break
+                picked = self.links.get(self.stop_event)
+                retry = picked is DONE
+                if retry:
+                    picked = None if self.stop_event.is_set() else self.next_retry()
+                    if picked is None:
+                        break
+                site, task = picked
+                engine = self.engines[site]
+                try:
+                    claimed = extract_task(engine, pages, task, self.stats[site]['extract'], name)
+                finally:
+                    if not retry:
+                        self.links.task_done(site)
+                for item in claimed:
+                    if not self.items.put(site, item, self.stop_event):
+                        return
+        except Exception as e:
+            print(f"⚠️ Extract stage error: {str(e)[:100]}")
+        finally:
+            if autoscaler:
+                autoscaler.detach(slot)
+            pages.close()
+            with self.lock:
+                self.recycled += pages.recycled
+                self.active_extractors -= 1
+                last = self.active_extractors == 0
+            if last:
+                self.items.close_all()
+
+    def upload_stage(self):
+        try:
+            while True:
+                picked = self.items.get(self.stop_event)
+                retry = picked is DONE
+                if retry:
+                    # Hết item mới: upload lại item quá deadline ở lần trước
+                    picked = None if self.stop_event.is_set() else self.next_upload_retry()
+                    if picked is None:
+                        break
+                    site, (item, deadline, attempt) = picked
+                else:
+                    site, (item, deadline) = picked
+                    attempt = 0
+                engine = self.engines[site]
+                try:
+                    uploaded_images = upload_task(engine, item, deadline, self.stats[site]['upload'], attempt)
+                finally:
+                    if not retry:
+                        self.items.task_done(site)
+                if uploaded_images is not None:
+                    self.put_result((site, item, uploaded_images))
+        finally:
+            with self.lock:
+                self.active_uploaders -= 1
+                last = self.active_uploaders == 0
+            if last:
+                self.put_result(DONE)
+
+    def put_result(self, result):
+        while not self.stop_event.is_set():
+            try:
+                self.result_queue.put(result, timeout=0.5)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def sink_stage(self):
+        while not self.stop_event.is_set():
+            try:
+                result = self.result_queue.get(timeout=0.5)
+            except queue.Empty:
+                continue
+            if result is DONE:
+                break
+            site, item, uploaded_images = result
+            write_task(self.engines[site], item, uploaded_images, self.stats[site]['sink'])
+
+    def run(self):
+        started = time.time()
+        for site, engine in self.engines.items():
+            print(f"=== [{site}] ===")
+            engine.start_run()
+            # Gắn sau start_run và gỡ trước finish_run: pool do pipeline start/stop 1 lần
+            engine.browser_pool = self.browser_pool
+
+        completed = False
+        try:
+            if self.browser_pool:
+                self.browser_pool.start()
+            if self.autoscaler:
+                self.autoscaler.start()
+            for site in self.engines:
+                self.start_thread(self.discovery_stage, f'discovery-{site}', site)
+            for idx in range(self.extract_workers):
+                self.start_thread(self.extract_stage, f'extract-{idx+1}', idx)
+            for idx in range(self.upload_workers):
+                self.start_thread(self.upload_stage, f'upload-{idx+1}')
+            self.sink_stage()
+            completed = True
+        except KeyboardInterrupt:
+            print("\n\n" + "="*60)
+            print("⚠️ SCRIPT INTERRUPTED BY USER (Ctrl+C)")
+            print("="*60)
+        finally:
+            self.stop_event.set()
+            if self.autoscaler:
+                self.autoscaler.stop()
+            for thread in self.threads:
+                thread.join(timeout=5)
+            if self.browser_pool:
+                self.browser_pool.stop()
+            for engine in self.engines.values():
+                engine.browser_pool = None
+            self.print_stats(time.time() - started)
+            self.finish(completed)
+
+    def finish(self, completed):
+        storages = {}
+        for site, engine in self.engines.items():
+            print(f"\n=== [{site}] ===")
+            engine.finish_run(completed, close_storage=False)
+            storages[id(engine.storage)] = engine.storage
+        for storage in storages.values():
+            print(storage.summary())
+            if storage.preprocessor:
+                print(storage.preprocessor.summary())
+            storage.close()
+
+    def print_stats(self, elapsed):
+        print(f"\n{'='*60}")
+        print(f"Multi-site pipeline finished in {elapsed:.1f}s "
+              f"({self.extract_workers} shared extract workers, {self.upload_workers} upload threads, "
+              f"{self.recycled} browsers recycled)")
+        for site, stats in self.stats.items():
+            engine = self.engines[site]
+            print(f"[{site}] {len(engine.sink)} {engine.sink.unit} saved, {self.links_found[site]} links")
+            for stage in stats.values():
+                print(stage.summary(elapsed))
+        if self.autoscaler:
+            print(self.autoscaler.summary())
+        if self.browser_pool:
+            print(self.browser_pool.summary())
+        print(f"{'='*60}")
@@ -0,0 +1,150 @@
+import os
+import json
+import time
+import hashlib
+import cProfile
+import threading
+
+
+class SlowPageTracer:
+    """
+    Tracer cho trang sản phẩm chậm/lỗi (opt-in, CrawlEngine(tracer=...)):
+
+    - Ghi thời gian extract của từng sản phẩm vào <out_dir>/durations.jsonl, kèm path
+      ('static': HTML tĩnh qua HTTP, 'browser': Chromium) và fallback=true nếu path đó không
+      đủ dữ liệu và sản phẩm được chuyển sang path kế tiếp
+    - Playwright tracing chạy liên tục trên context của page, mỗi sản phẩm là 1 chunk
+      (start_chunk/stop_chunk). Chunk chỉ được ghi ra file (network, DOM snapshot,
+      thời gian evaluate) khi sản phẩm chậm hơn threshold giây hoặc lỗi;
+      trang bình thường thì chunk bị bỏ, không tốn đĩa.
+    - profile=True: cProfile phía Python cho cùng sản phẩm, chỉ dump khi chậm/lỗi
+    - Tổng dung lượng trace/profile giữ dưới budget_mb (xóa file cũ nhất trước)
+
+    Chi phí trên mọi trang (kể cả trang bình thường, chunk bị bỏ sau đó): Playwright vẫn ghi
+    action/network vào bộ nhớ cho từng chunk; snapshots=True (mặc định) chụp thêm DOM snapshot
+    sau mỗi action, tốn CPU/RAM của driver đáng kể trên trang nặng. screenshots (screencast)
+    và profile (cProfile làm chậm code Python vài lần) mặc định tắt, chỉ nên bật khi đang điều tra.
+
+    Mở trace: playwright show-trace <file>.trace.zip
+    Xem profile: python -m pstats <file>.prof
+    """
+
+    def __init__(self, out_dir, threshold=30.0, budget_mb=500, profile=False, screenshots=False, snapshots=True):
+        self.out_dir = out_dir
+        self.threshold = threshold
+        self.budget = budget_mb * 1024 * 1024
+        self.profile = profile
+        self.screenshots = screenshots
+        self.snapshots = snapshots
+        os.makedirs(out_dir, exist_ok=True)
+
+        self.lock = threading.Lock()
+        self.count = 0
+        self.captured = 0
+        self.slowest = (0.0, None)
+
+    def attach(self, page):
+        """Bật tracing cho context của page (1 lần cho mỗi page của worker)"""
+        page.context.tracing.start(screenshots=self.screenshots, snapshots=self.snapshots, sources=False)
+
+    def start_profiler(self):
+        if not self.profile:
+            return None
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+        except ValueError:
+            # Python 3.12+: chỉ 1 profiler hoạt động tại 1 thời điểm (worker khác đang profile)
+            return None
+        return profiler
+
+    def run(self, page, product_url, extract, path='browser'):
+        """
+        Gọi extract() cho 1 sản phẩm, lưu trace/profile nếu chậm hoặc lỗi.
+        page=None (path 'static'): chỉ đo thời gian/profile, không có Playwright trace.
+        extract() trả về None = fallback sang path khác.
+        """
+        tracing = page.context.tracing if page is not None else None
+        if tracing:
+            tracing.start_chunk(title=product_url)
+        profiler = self.start_profiler()
+        started = time.time()
+        error = None
+        result = None
+        try:
+            result = extract()
+            return result
+        except Exception as e:
+            error = e
+            raise
+        finally:
+            if profiler:
+                profiler.disable()
+            elapsed = time.time() - started
+            capture = error is not None or elapsed >= self.threshold
+            base = os.path.join(self.out_dir, self.file_stem(product_url))
+            files = []
+
+            if tracing:
+                try:
+                    if capture:
+                        tracing.stop_chunk(path=f"{base}.trace.zip")
+                        files.append(f"{base}.trace.zip")
+                    else:
+                        tracing.stop_chunk()
+                except Exception as e:
+                    print(f"  ⚠️ Could not save trace: {str(e)[:80]}")
+            if capture and profiler:
+                profiler.dump_stats(f"{base}.prof")
+                files.append(f"{base}.prof")
+
+            self.record(product_url, elapsed, error, files, path, fallback=error is None and result is None)
+            if files:
+                reason = 'error' if error is not None else f"{elapsed:.1f}s"
+                print(f"  🐢 Captured slow page ({reason}): {os.path.basename(base)}")
+                self.rotate()
+
+    def file_stem(self, product_url):
+        digest = hashlib.sha1(product_url.encode('utf-8')).hexdigest()[:10]
+        return f"{time.strftime('%Y%m%d_%H%M%S')}_{digest}"
+
+    def record(self, product_url, elapsed, error, files, path='browser', fallback=False):
+        line = json.dumps({
+            'url': product_url,
+            'path': path,
+            'fallback': fallback,
+            'seconds': round(elapsed, 3),
+            'error': str(error)[:200] if error is not None else None,
+            'files': [os.path.basename(path) for path in files],
+            'at': time.time(),
+        }, ensure_ascii=False)
+        with self.lock:
+            if not fallback:
+                self.count += 1
+            if files:
+                self.captured += 1
+            if elapsed > self.slowest[0]:
+                self.slowest = (elapsed, product_url)
+            with open(os.path.join(self.out_dir, 'durations.jsonl'), 'a', encoding='utf-8') as f:
+                f.write(line + '\n')
+
+    def rotate(self):
+        """Xóa trace/profile cũ nhất cho tới khi tổng dung lượng <= budget"""
+        with self.lock:
+            files = []
+            for name in os.listdir(self.out_dir):
+                if name.endswith(('.trace.zip', '.prof')):
+                    path = os.path.join(self.out_dir, name)
+                    stat = os.stat(path)
+                    files.append((stat.st_mtime, stat.st_size, path))
+            total = sum(size for _, size, _ in files)
+            for _, size, path in sorted(files):
+                if total <= self.budget:
+                    break
+                os.remove(path)
+                total -= size
+
+    def summary(self):
+        seconds, url = self.slowest
+        slowest = f", slowest {seconds:.1f}s ({url})" if url else ''
+        return f"Tracer: {self.count} products timed, {self.captured} slow/error pages captured in {self.out_dir}{slowest}"
@@ -0,0 +1,408 @@
+import queue
+import threading
+import time
+from deadline import DeadlineExceeded, child_pids, kill_pid
+
+DONE = object()
+
+
+class BrowserUnavailable(RuntimeError):
+    """Không launch/connect được browser (vd. mọi endpoint của pool đang down)"""
+
+
+class StageStats:
+    """Đếm số item và thời gian bận của 1 stage (thread-safe)"""
+
+    def __init__(self, name):
+        self.name = name
+        self.count = 0
+        self.errors = 0
+        self.busy = 0.0
+        self.lock = threading.Lock()
+
+    def record(self, seconds, ok=True):
+        with self.lock:
+            self.busy += seconds
+            if ok:
+                self.count += 1
+            else:
+                self.errors += 1
+
+    def summary(self, elapsed):
+        utilization = self.busy / elapsed * 100 if elapsed > 0 else 0
+        return f"  {self.name:<10} {self.count:>6} done, {self.errors:>4} errors, busy {self.busy:7.1f}s ({utilization:.0f}% of wall time)"
+
+
+class WorkerPage:
+    """
+    Browser riêng của 1 extract worker, chỉ khởi động Playwright/browser ở lần get() đầu tiên
+    (worker chạy hoàn toàn bằng HTML tĩnh thì không tốn Chromium nào). Mỗi engine (site)
+    dùng worker này có 1 page/context riêng trên cùng browser.
+    kill() được watchdog gọi từ thread khác khi page bị treo; worker thấy `killed`
+    thì close() rồi get() lần sau dựng browser mới.
+    Browser bị ngắt (Chromium crash, browser server từ xa restart) cũng được bỏ và
+    get() lần sau launch/connect lại. Launch/connect lỗi thì Playwright vừa start được dừng
+    ngay (sync API không start được 2 lần trên 1 thread) và raise BrowserUnavailable.
+    """
+
+    def __init__(self, name='extract'):
+        self.name = name
+        self.playwright = None
+        self.browser = None
+        self.pool = None
+        self.pages = {}
+        self.killed = False
+        self.recycled = 0
+
+    @property
+    def disconnected(self):
+        return self.browser is not None and not self.browser.is_connected()
+
+    def get(self, engine):
+        if self.disconnected:
+            print(f"  🔌 {self.name}: browser disconnected, reconnecting")
+            self.recycle()
+        page = self.pages.get(id(engine))
+        if page is None:
+            if self.browser is None:
+                from playwright.sync_api import sync_playwright
+                self.playwright = sync_playwright().start()
+                try:
+                    self.browser = engine.launch_browser(self.playwright)
+                except Exception as e:
+                    self.close()
+                    raise BrowserUnavailable(str(e)) from e
+                self.pool = engine.browser_pool
+            page = self.pages[id(engine)] = engine.new_page(self.browser, traced=True)
+            if self.pool:
+                self.pool.register_page(self.browser, page)
+        return page
+
+    def driver_pid(self):
+        try:
+            return self.playwright._impl_obj._connection._transport._proc.pid
+        except AttributeError:
+            return None
+
+    def kill(self):
+        """
+        Kill Chromium của worker (process con của Playwright driver). Lệnh đang treo
+        (goto/evaluate) raise "Target closed" và worker chạy tiếp. Không kill driver:
+        sync API sẽ treo luôn khi driver chết. Browser từ xa (pool) thì đóng các page qua CDP.
+        """
+        self.killed = True
+        if self.pool:
+            for page in list(self.pages.values()):
+                self.pool.close_page(page)
+            return
+        pid = self.driver_pid()
+        browsers = child_pids(pid) if pid else []
+        if not browsers:
+            raise RuntimeError("browser process not found")
+        for browser_pid in browsers:
+            kill_pid(browser_pid)
+
+    def recycle(self):
+        self.close()
+        self.killed = False
+        self.recycled += 1
+
+    def close(self):
+        if self.pool:
+            for page in self.pages.values():
+                self.pool.forget_page(page)
+        try:
+            if self.browser:
+                self.browser.close()
+        except Exception:
+            pass
+        try:
+            if self.playwright:
+                self.playwright.stop()
+        except Exception:
+            pass
+        self.playwright = self.browser = self.pool = None
+        self.pages = {}
+
+
+def extract_task(engine, pages, task, stats, watchdog_name):
+    """
+    Extract 1 link (product_url, category[, lần thử]) với deadline/watchdog của engine.
+    Trả về [(item, deadline)] đã claim để upload.
+    """
+    product_url, category, *retry = task
+    attempt = retry[0] if retry else 0
+
+    start = time.time()
+    deadline = engine.new_deadline()
+    try:
+        if engine.watchdog:
+            with engine.watchdog.watch(watchdog_name, deadline, pages.kill):
+                items = engine.extract(pages, product_url, category, deadline)
+        else:
+            items = engine.extract(pages, product_url, category, deadline)
+        items = engine.after_extract(product_url, category, items, time.time() - start)
+        stats.record(time.time() - start)
+    except Exception as e:
+        stats.record(time.time() - start, ok=False)
+        disconnected = pages.disconnected
+        if pages.killed or disconnected:
+            pages.recycle()
+        if isinstance(e, DeadlineExceeded) or (deadline and deadline.expired):
+            engine.retry_later(product_url, category, attempt, e)
+        elif disconnected or isinstance(e, BrowserUnavailable):
+            engine.retry_later(product_url, category, attempt, e, over_budget=False)
+        else:
+            print(f"⚠️ Error crawling product {product_url}: {str(e)[:100]}")
+        return []
+    return [(item, deadline) for item in items if engine.claim(item)]
+
+
+def upload_task(engine, item, deadline, stats, attempt=0):
+    """
+    Upload ảnh của 1 item, trả về danh sách URL hoặc None nếu lỗi/quá deadline
+    (quá deadline thì item được xếp upload lại ở cuối lượt, engine.next_upload_retry)
+    """
+    start = time.time()
+    try:
+        uploaded_images = engine.upload_images(item, deadline)
+        stats.record(time.time() - start)
+        return uploaded_images
+    except DeadlineExceeded as e:
+        stats.record(time.time() - start, ok=False)
+        engine.retry_upload_later(item, attempt, e)
+    except Exception as e:
+        stats.record(time.time() - start, ok=False)
+        print(f"  ✗ Upload error for {item.name}: {str(e)[:100]}")
+    return None
+
+
+def write_task(engine, item, uploaded_images, stats):
+    start = time.time()
+    try:
+        engine.write(item, uploaded_images)
+        stats.record(time.time() - start)
+    except Exception as e:
+        stats.record(time.time() - start, ok=False)
+        print(f"  ✗ Failed to save {item.name}: {str(e)[:100]}")
+
+
+class Pipeline:
+    """
+    Pipeline nhiều stage nối bằng queue có giới hạn (backpressure):
+
+        discovery --links--> extract (N page) --items--> upload (M thread) --results--> sink
+
+    - discovery: 1 thread, stream link ngay khi tìm thấy (không chờ hết collection)
+    - extract: mỗi worker 1 thread, thử HTML tĩnh trước; Playwright/browser riêng của worker
+      (sync API gắn với thread) chỉ khởi động khi cần. Mỗi sản phẩm có deadline
+      (engine.product_deadline) cho cả extract lẫn upload; quá hạn thì watchdog dựng lại
+      browser của worker, sản phẩm được thử lại ở cuối lượt
+    - upload: M thread upload ảnh song song; upload quá deadline cũng được thử lại ở cuối lượt
+    - sink: chạy trên main thread (openpyxl không thread-safe)
+    Queue đầy thì stage phía trước chờ, nên RAM không phình khi 1 stage chậm.
+
+    autoscaler (autoscale.Autoscaler): chạy autoscaler.max_workers extract thread, số worker
+    thật sự chạy do autoscaler quyết theo CPU/RAM/RSS Chromium.
+    """
+
+    def __init__(self, engine, extract_workers=1, upload_workers=4,
+                 link_queue_size=200, item_queue_size=20, result_queue_size=50, autoscaler=None):
+        self.engine = engine
+        self.autoscaler = autoscaler
+        if autoscaler:
+            extract_workers = autoscaler.max_workers
+        self.extract_workers = extract_workers
+        self.upload_workers = upload_workers
+
+        self.link_queue = queue.Queue(maxsize=link_queue_size)
+        self.item_queue = queue.Queue(maxsize=item_queue_size)
+        self.result_queue = queue.Queue(maxsize=result_queue_size)
+
+        self.stop_event = threading.Event()
+        self.discovery_done = threading.Event()
+        self.lock = threading.Lock()
+        self.active_extractors = extract_workers
+        self.active_uploaders = upload_workers
+        self.links_found = 0
+
+        self.stats = {
+            'discovery': StageStats('discovery'),
+            'extract': StageStats('extract'),
+            'upload': StageStats('upload'),
+            'sink': StageStats('sink'),
+        }
+        self.threads = []
+
+    def put(self, q, value):
+        while not self.stop_event.is_set():
+            try:
+                q.put(value, timeout=0.5)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def get(self, q):
+        while not self.stop_event.is_set():
+            try:
+                return q.get(timeout=0.5)
+            except queue.Empty:
+                continue
+        return DONE
+
+    def stop(self):
+        self.stop_event.set()
+
+    def start_thread(self, target, name, *args):
+        thread = threading.Thread(target=target, args=args, name=name, daemon=True)
+        thread.start()
+        self.threads.append(thread)
+
+    def discovery_stage(self):
+        discovery = self.engine.discovery
+        start = time.time()
+        try:
+            if discovery.uses_browser:
+                from playwright.sync_api import sync_playwright
+                with sync_playwright() as p:
+                    browser = self.engine.launch_browser(p)
+                    page = self.engine.new_page(browser)
+                    self.feed_links(discovery.iter_links(page))
+                    browser.close()
+            else:
+                self.feed_links(discovery.iter_links())
+            self.feed_links(self.engine.scheduled_links())
+            self.stats['discovery'].record(time.time() - start)
+        except Exception as e:
+            self.stats['discovery'].record(time.time() - start, ok=False)
+            print(f"⚠️ Discovery stage error: {str(e)[:100]}")
+        finally:
+            print(f"\n✓ Discovery finished: {self.links_found} product links")
+            self.discovery_done.set()
+            for _ in range(self.extract_workers):
+                self.put(self.link_queue, DONE)
+
+    def feed_links(self, batches):
+        for batch in batches:
+            for task in batch:
+                if not self.engine.should_crawl(*task):
+                    continue
+                if not self.put(self.link_queue, task):
+                    return
+                with self.lock:
+                    self.links_found += 1
+
+    def next_task(self, draining):
+        """Link tiếp theo; sau DONE thì lấy sản phẩm chờ thử lại (quá deadline ở lần trước)"""
+        if not draining:
+            task = self.get(self.link_queue)
+            if task is not DONE:
+                return task, False
+        if self.stop_event.is_set():
+            return DONE, True
+        return self.engine.next_retry() or DONE, True
+
+    def extract_stage(self, slot=0):
+        engine = self.engine
+        name = threading.current_thread().name
+        pages = WorkerPage(name)
+        autoscaler = self.autoscaler
+        if autoscaler:
+            autoscaler.attach(slot, pages)
+        draining = False
+        try:
+            while True:
+                # Slot bị autoscaler tắt mà discovery đã xong thì các worker còn lại lo phần cuối
+                if autoscaler and not autoscaler.wait_turn(slot, pages, self.stop_event, self.discovery_done.is_set):
+                    break
+                task, draining = self.next_task(draining)
+                if task is DONE:
+                    break
+                for claimed in extract_task(engine, pages, task, self.stats['extract'], name):
+                    self.put(self.item_queue, claimed)
+        except Exception as e:
+            print(f"⚠️ Extract stage error: {str(e)[:100]}")
+        finally:
+            if autoscaler:
+                autoscaler.detach(slot)
+            pages.close()
+            with self.lock:
+                engine.recycled_pages += pages.recycled
+                self.active_extractors -= 1
+                last = self.active_extractors == 0
+            if last:
+                for _ in range(self.upload_workers):
+                    self.put(self.item_queue, DONE)
+
+    def next_upload(self, draining):
+        """(item, deadline, lần thử); sau DONE thì lấy item chờ upload lại (quá deadline ở lần trước)"""
+        if not draining:
+            task = self.get(self.item_queue)
+            if task is not DONE:
+                item, deadline = task
+                return (item, deadline, 0), False
+        if self.stop_event.is_set():
+            return DONE, True
+        retry = self.engine.next_upload_retry()
+        if retry is None:
+            return DONE, True
+        item, attempt = retry
+        return (item, self.engine.new_deadline(), attempt), True
+
+    def upload_stage(self):
+        engine = self.engine
+        draining = False
+        try:
+            while True:
+                task, draining = self.next_upload(draining)
+                if task is DONE:
+                    break
+                item, deadline, attempt = task
+                uploaded_images = upload_task(engine, item, deadline, self.stats['upload'], attempt)
+                if uploaded_images is not None:
+                    self.put(self.result_queue, (item, uploaded_images))
+        finally:
+            with self.lock:
+                self.active_uploaders -= 1
+                last = self.active_uploaders == 0
+            if last:
+                self.put(self.result_queue, DONE)
+
+    def sink_stage(self):
+        engine = self.engine
+        while True:
+            result = self.get(self.result_queue)
+            if result is DONE:
+                break
+            item, uploaded_images = result
+            write_task(engine, item, uploaded_images, self.stats['sink'])
+
+    def run(self):
+        started = time.time()
+        if self.autoscaler:
+            self.autoscaler.start()
+        self.start_thread(self.discovery_stage, 'discovery')
+        for idx in range(self.extract_workers):
+            self.start_thread(self.extract_stage, f'extract-{idx+1}', idx)
+        for idx in range(self.upload_workers):
+            self.start_thread(self.upload_stage, f'upload-{idx+1}')
+
+        try:
+            self.sink_stage()
+        finally:
+            self.stop()
+            if self.autoscaler:
+                self.autoscaler.stop()
+            for thread in self.threads:
+                thread.join(timeout=5)
+            self.print_stats(time.time() - started)
+
+    def print_stats(self, elapsed):
+        print(f"\n{'='*60}")
+        print(f"Pipeline finished in {elapsed:.1f}s")
+        for stats in self.stats.values():
+            print(stats.summary(elapsed))
+        if self.autoscaler:
+            print(self.autoscaler.summary())
+        print(f"{'='*60}")
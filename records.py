@@ -0,0 +1,121 @@
+import sys
+from dataclasses import dataclass
+
+
+def intern_text(value):
+    """Intern chuỗi lặp lại nhiều (category, màu) để các record dùng chung 1 object"""
+    return sys.intern(value) if isinstance(value, str) else value
+
+
+@dataclass(slots=True)
+class ExtractedItem:
+    """
+    Dữ liệu adapter đọc được từ 1 trang sản phẩm, trước khi upload ảnh.
+    images là URL ảnh gốc; key dùng để bỏ qua sản phẩm đã crawl (None = không dedup).
+    """
+    url: str
+    category: str
+    name: str
+    price: object
+    colors: list
+    images: list
+    description: str
+    folder: str
+    key: str = None
+
+
+@dataclass(slots=True)
+class ProductRecord:
+    """1 dòng sheet Products của lecas_data.xlsx / tno_data.xlsx"""
+    category: str
+    product_name: str
+    price: str
+    colors: str
+    images: tuple
+    description: str
+
+    def __post_init__(self):
+        self.category = intern_text(self.category)
+        self.colors = intern_text(self.colors)
+        self.images = tuple(self.images)
+
+    @property
+    def images_text(self):
+        return ', '.join(self.images)
+
+    def to_row(self, stt):
+        return [
+            stt,
+            self.category,
+            self.product_name,
+            self.price,
+            self.colors,
+            self.images_text,
+            self.description
+        ]
+
+
+@dataclass(slots=True)
+class SeedProduct:
+    """1 dòng sheet Products của seed_data.xlsx"""
+    id: int
+    category_id: int
+    name: str
+    description: str
+    selling_price: int
+    color_ids: tuple
+    images: tuple
+    key: str = None
+
+    def __post_init__(self):
+        self.color_ids = tuple(self.color_ids)
+        self.images = tuple(self.images)
+
+    @property
+    def color_ids_text(self):
+        return ','.join(map(str, self.color_ids))
+
+    @property
+    def images_text(self):
+        return ', '.join(self.images)
+
+    def to_row(self):
+        return [
+            self.id,
+            self.category_id,
+            self.name,
+            self.description,
+            self.selling_price,
+            self.color_ids_text,
+            self.images_text
+        ]
+
+
+class RecordBuffer:
+    """
+    Buffer record trong RAM.
+    keep_flushed=False: record bị bỏ ngay sau khi đã ghi ra file (flush),
+    nên bộ nhớ không tăng theo số sản phẩm. len() vẫn trả về tổng số record.
+    """
+
+    def __init__(self, keep_flushed=True):
+        self.keep_flushed = keep_flushed
+        self.records = []
+        self.total = 0
+        self.flushed_count = 0
+
+    def append(self, record):
+        self.records.append(record)
+        self.total += 1
+
+    def mark_flushed(self):
+        """Đánh dấu mọi record hiện có đã được ghi ra file"""
+        self.flushed_count = self.total
+        if not self.keep_flushed:
+            self.records.clear()
+
+    def __len__(self):
+        return self.total
+
+    def __iter__(self):
+        return iter(self.records)
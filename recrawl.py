@@ -0,0 +1,278 @@
+import math
+import time
+import json
+import hashlib
+import sqlite3
+import threading
+
+DAY = 24 * 3600
+
+
+def digest(value):
+    return hashlib.sha1(json.dumps(value, ensure_ascii=False, sort_keys=True).encode('utf-8')).hexdigest()[:16]
+
+
+def product_fingerprint(items):
+    """Hash từng field theo dõi thay đổi (gộp mọi item của 1 sản phẩm, ví dụ mỗi màu 1 item)"""
+    return {
+        'price': digest(sorted({item.price for item in items})),
+        'colors': digest(sorted({color for item in items for color in item.colors})),
+        'images': digest(sorted({image.split('?')[0] for item in items for image in item.images})),
+    }
+
+
+def change_rate(checks, changes, first_checked, last_checked):
+    """
+    Ước lượng số lần thay đổi / giây (Cho & Garcia-Molina): chỉ biết có đổi hay không giữa
+    2 lần check, nên dùng  r = -ln((n - X + 0.5) / (n + 1)) / I
+    với n = số khoảng giữa các lần check, X = số khoảng có thay đổi, I = độ dài khoảng trung bình.
+    Mẫu số n + 1 (thay vì n + 0.5) như thêm nửa lần đổi giả định: chưa thấy đổi lần nào thì
+    rate vẫn > 0 (khoảng 1 / (2 * thời gian đã quan sát)), nên hàng ổn định được check lại
+    thưa dần chứ không bao giờ bị bỏ hẳn. Chưa đủ dữ liệu thì giả định 1 lần/ngày.
+    """
+    intervals = checks - 1
+    if intervals <= 0 or last_checked <= first_checked:
+        return 1.0 / DAY
+    mean_interval = (last_checked - first_checked) / intervals
+    changes = min(changes, intervals)
+    return -math.log((intervals - changes + 0.5) / (intervals + 1)) / mean_interval
+
+
+def change_probability(rate, since):
+    """Xác suất đã thay đổi sau `since` giây (Poisson)"""
+    return 1.0 - math.exp(-rate * max(since, 0.0))
+
+
+class RecrawlScheduler:
+    """
+    Lịch crawl lại dựa trên lịch sử thay đổi (SQLite):
+
+        products      key, url, category, hash price/colors/images, số lần check/đổi,
+                      số lần đổi theo từng field, thời gian extract trung bình
+        collections   url, hash danh sách sản phẩm (đổi = có hàng mới/bị gỡ)
+
+    plan() xếp sản phẩm đã biết theo (xác suất đã đổi) / (thời gian extract), lấy tới khi hết
+    phần budget dành cho sản phẩm cũ (budget_seconds và/hoặc budget_requests, new_share
+    để dành cho sản phẩm mới). Sản phẩm có xác suất đổi < min_probability bị bỏ qua lần này,
+    nên hàng hay đổi giá được check thường xuyên còn hàng ổn định thì hiếm khi.
+    Sản phẩm/collection chưa check lại quá max_age giây thì luôn tới hạn (xác suất coi như 1).
+    """
+
+    def __init__(self, db_path, budget_seconds=None, budget_requests=None, new_share=0.2,
+                 min_probability=0.05, default_seconds=10.0, max_age=30 * DAY):
+        self.db_path = db_path
+        self.max_age = max_age
+        self.budget_seconds = budget_seconds
+        self.budget_requests = budget_requests
+        self.new_share = new_share
+        self.min_probability = min_probability
+        self.default_seconds = default_seconds
+
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(db_path, check_same_thread=False)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS products (
+                key TEXT PRIMARY KEY,
+                url TEXT,
+                category TEXT,
+                price_hash TEXT,
+                colors_hash TEXT,
+                images_hash TEXT,
+                checks INTEGER DEFAULT 0,
+                changes INTEGER DEFAULT 0,
+                price_changes INTEGER DEFAULT 0,
+                colors_changes INTEGER DEFAULT 0,
+                images_changes INTEGER DEFAULT 0,
+                avg_seconds REAL,
+                first_checked REAL,
+                last_checked REAL,
+                last_changed REAL
+            )
+        """)
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS collections (
+                url TEXT PRIMARY KEY,
+                products_hash TEXT,
+                product_count INTEGER,
+                checks INTEGER DEFAULT 0,
+                changes INTEGER DEFAULT 0,
+                first_checked REAL,
+                last_checked REAL
+            )
+        """)
+        self.conn.commit()
+
+        self.planned = {}
+        self.started = None
+        self.used_requests = 0
+        self.used_seconds = 0.0
+        self.new_allowed = 0
+        self.skipped = 0
+        self.unchanged = 0
+
+    # --- plan / budget ---
+
+    def due_probability(self, checks, changes, first_checked, last_checked, now):
+        """Xác suất đã đổi kể từ lần check cuối, 1 nếu quá max_age"""
+        if self.max_age is not None and now - last_checked >= self.max_age:
+            return 1.0
+        rate = change_rate(checks, changes, first_checked, last_checked)
+        return change_probability(rate, now - last_checked)
+
+    def priority(self, row, now):
+        _, _, _, checks, changes, avg_seconds, first_checked, last_checked = row
+        probability = self.due_probability(checks, changes, first_checked, last_checked, now)
+        return probability, avg_seconds or self.default_seconds
+
+    def plan(self):
+        """Chọn sản phẩm đã biết sẽ check lại trong lần chạy này"""
+        now = time.time()
+        self.started = now
+        seconds_left = self.budget_seconds * (1 - self.new_share) if self.budget_seconds else None
+        requests_left = int(self.budget_requests * (1 - self.new_share)) if self.budget_requests else None
+
+        candidates = []
+        with self.lock:
+            rows = self.conn.execute(
+                'SELECT key, url, category, checks, changes, avg_seconds, first_checked, last_checked '
+                'FROM products WHERE checks > 0'
+            )
+            for row in rows:
+                probability, cost = self.priority(row, now)
+                if probability >= self.min_probability:
+                    candidates.append((probability / cost, probability, cost, row[0], row[1], row[2]))
+
+        candidates.sort(reverse=True)
+        for _, probability, cost, key, url, category in candidates:
+            if requests_left is not None and requests_left <= 0:
+                break
+            if seconds_left is not None and seconds_left < cost:
+                break
+            self.planned[key] = (url, category)
+            if requests_left is not None:
+                requests_left -= 1
+            if seconds_left is not None:
+                seconds_left -= cost
+
+        print(f"Recrawl plan: {len(self.planned)} of {len(candidates)} due products "
+              f"(budget: {self.budget_seconds or '∞'}s, {self.budget_requests or '∞'} requests)")
+        return self.planned
+
+    def is_planned(self, key):
+        return key in self.planned
+
+    def is_known(self, key):
+        with self.lock:
+            return self.conn.execute('SELECT 1 FROM products WHERE key = ?', (key,)).fetchone() is not None
+
+    def budget_left(self):
+        if self.budget_requests is not None and self.used_requests >= self.budget_requests:
+            return False
+        if self.budget_seconds is not None and self.started and time.time() - self.started >= self.budget_seconds:
+            return False
+        return True
+
+    def allow(self, key):
+        """Quyết định có crawl sản phẩm này không (gọi trước khi mở trang)"""
+        with self.lock:
+            planned = key in self.planned
+        if not planned and self.is_known(key):
+            self.skipped += 1
+            return False
+        if not self.budget_left():
+            self.skipped += 1
+            return False
+        with self.lock:
+            self.used_requests += 1
+            if not planned:
+                self.new_allowed += 1
+        return True
+
+    def scheduled_links(self, batch_size=50):
+        """Yield batch [(url, category)] của sản phẩm trong plan (không phụ thuộc discovery)"""
+        batch = []
+        for url, category in list(self.planned.values()):
+            batch.append((url, category))
+            if len(batch) >= batch_size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+
+    # --- quan sát ---
+
+    def observe_product(self, key, url, category, items, seconds):
+        """Ghi kết quả 1 lần check, trả về danh sách field đã đổi (['new'] nếu lần đầu thấy)"""
+        fingerprint = product_fingerprint(items)
+        now = time.time()
+        with self.lock:
+            self.used_seconds += seconds
+            row = self.conn.execute(
+                'SELECT price_hash, colors_hash, images_hash, avg_seconds FROM products WHERE key = ?', (key,)
+            ).fetchone()
+            if row is None:
+                self.conn.execute(
+                    'INSERT INTO products (key, url, category, price_hash, colors_hash, images_hash, checks, '
+                    'avg_seconds, first_checked, last_checked, last_changed) VALUES (?, ?, ?, ?, ?, ?, 1, ?, ?, ?, ?)',
+                    (key, url, category, fingerprint['price'], fingerprint['colors'], fingerprint['images'],
+                     seconds, now, now, now)
+                )
+                self.conn.commit()
+                return ['new']
+
+            previous = dict(zip(('price', 'colors', 'images'), row[:3]))
+            changed = [field for field in ('price', 'colors', 'images') if previous[field] != fingerprint[field]]
+            avg_seconds = seconds if row[3] is None else row[3] * 0.7 + seconds * 0.3
+            self.conn.execute(
+                'UPDATE products SET url = ?, category = ?, price_hash = ?, colors_hash = ?, images_hash = ?, '
+                'checks = checks + 1, changes = changes + ?, price_changes = price_changes + ?, '
+                'colors_changes = colors_changes + ?, images_changes = images_changes + ?, avg_seconds = ?, '
+                'last_checked = ?, last_changed = CASE WHEN ? THEN ? ELSE last_changed END WHERE key = ?',
+                (url, category, fingerprint['price'], fingerprint['colors'], fingerprint['images'],
+                 1 if changed else 0, 'price' in changed, 'colors' in changed, 'images' in changed,
+                 avg_seconds, now, bool(changed), now, key)
+            )
+            self.conn.commit()
+            if not changed:
+                self.unchanged += 1
+        return changed
+
+    def collection_due(self, url):
+        with self.lock:
+            row = self.conn.execute(
+                'SELECT checks, changes, first_checked, last_checked FROM collections WHERE url = ?', (url,)
+            ).fetchone()
+        if row is None:
+            return True
+        checks, changes, first_checked, last_checked = row
+        return self.due_probability(checks, changes, first_checked, last_checked, time.time()) >= self.min_probability
+
+    def observe_collection(self, url, product_urls):
+        """Ghi danh sách sản phẩm của collection, trả về True nếu khác lần trước (hàng mới/bị gỡ)"""
+        products_hash = digest(sorted({product_url.split('?')[0] for product_url in product_urls}))
+        now = time.time()
+        with self.lock:
+            row = self.conn.execute('SELECT products_hash FROM collections WHERE url = ?', (url,)).fetchone()
+            changed = row is not None and row[0] != products_hash
+            if row is None:
+                self.conn.execute(
+                    'INSERT INTO collections (url, products_hash, product_count, checks, first_checked, last_checked) '
+                    'VALUES (?, ?, ?, 1, ?, ?)', (url, products_hash, len(product_urls), now, now)
+                )
+            else:
+                self.conn.execute(
+                    'UPDATE collections SET products_hash = ?, product_count = ?, checks = checks + 1, '
+                    'changes = changes + ?, last_checked = ? WHERE url = ?',
+                    (products_hash, len(product_urls), 1 if changed else 0, now, url)
+                )
+            self.conn.commit()
+        return changed
+
+    def summary(self):
+        return (f"Recrawl: {self.used_requests} checked ({self.new_allowed} new, {len(self.planned)} planned), "
+                f"{self.unchanged} unchanged, {self.skipped} skipped, {self.used_seconds:.0f}s extract time")
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
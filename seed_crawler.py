@@ -1,25 +1,9 @@
-import os
 import re
-import time
-from playwright.sync_api import sync_playwright
-import cloudinary
-import cloudinary.uploader
-from openpyxl import Workbook, load_workbook
-from openpyxl.styles import Font, Alignment
-from dotenv import load_dotenv
-
-load_dotenv()
-
-cloudinary_url = os.getenv('CLOUDINARY_URL')
-if cloudinary_url:
-    match = re.match(r'cloudinary://([^:]+):([^@]+)@(.+)', cloudinary_url)
-    if match:
-        api_key, api_secret, cloud_name = match.groups()
-        cloudinary.config(
-            cloud_name=cloud_name,
-            api_key=api_key,
-            api_secret=api_secret
-        )
+from crawler_tno import TheNewOriginalsAdapter, IMAGES_SCRIPT
+from engine import CrawlEngine
+from records import ExtractedItem
+from sinks import SeedSink
+from html_extract import parse_document, first_text
 
 class ProductNameFormatter:
     """Format product name theo PRODUCT_NAMING_GUIDE"""
@@ -232,166 +216,18 @@ class CategoryParser:
         
         return ' '.join(capitalized)
 
-class SeedDataCrawler:
-    def __init__(self, collection_urls):
-        self.collection_urls = collection_urls if isinstance(collection_urls, list) else [collection_urls]
-        self.excel_path = os.path.join(os.path.expanduser('~'), 'Downloads', 'seed_data.xlsx')
-        
-        self.categories = {}
-        self.colors = {}
-        self.products = []
-        
-        self.category_id_counter = 1
-        self.color_id_counter = 1
-        self.product_id_counter = 1
-        
-        self.crawled_products = set()
-    
-    def upload_to_cloudinary(self, image_url, folder_name, timeout=30):
-        try:
-            if not image_url.startswith('http'):
-                image_url = 'https:' + image_url if image_url.startswith('//') else 'https://theneworiginals.co' + image_url
-            
-            result = cloudinary.uploader.upload(
-                image_url,
-                folder=f"theneworiginals/{folder_name}",
-                use_filename=True,
-                unique_filename=True,
-                timeout=timeout
-            )
-            return result['secure_url']
-        except Exception as e:
-            print(f"⚠️ Upload failed: {str(e)[:100]}")
-            return None
-    
-    def get_or_create_category(self, category_name):
-        """Get category ID, tạo mới nếu chưa có"""
-        if category_name in self.categories:
-            return self.categories[category_name]
-        
-        cat_id = self.category_id_counter
-        self.categories[category_name] = cat_id
-        self.category_id_counter += 1
-        return cat_id
-    
-    def get_or_create_color(self, color_name):
-        """Get color ID, tạo mới nếu chưa có"""
-        normalized = ColorParser.normalize_color_name(color_name)
-        
-        if normalized in self.colors:
-            return self.colors[normalized]
-        
-        color_id = self.color_id_counter
-        self.colors[normalized] = color_id
-        self.color_id_counter += 1
-        return color_id
+class SeedDataAdapter(TheNewOriginalsAdapter):
+    """TNO adapter + chuẩn hóa name/description/price/color cho seed data"""
     
-    def crawl_collection(self, page, collection_url, max_pages=25, max_products=100):
-        print(f"\nCrawling collection: {collection_url} (max {max_products} products, max {max_pages} pages)")
-        
-        all_products = set()
-        current_page = 1
-        
-        while True:
-            if current_page > max_pages:
-                print(f"  Reached page limit ({max_pages})")
-                break
-            
-            if len(all_products) >= max_products:
-                print(f"  Reached product limit ({max_products})")
-                break
-            
-            page_url = f"{collection_url}?page={current_page}" if current_page > 1 else collection_url
-            print(f"  Page {current_page}/{max_pages}...", end=' ')
-            
-            try:
-                page.goto(page_url, wait_until='domcontentloaded', timeout=60000)
-                time.sleep(2)
-                
-                page.evaluate("window.scrollTo(0, document.body.scrollHeight)")
-                time.sleep(1)
-                
-                products_on_page = page.evaluate("""
-                    () => {
-                        const links = Array.from(document.querySelectorAll('a[href*="/products/"]'));
-                        const baseUrls = links.map(a => a.href.split('?')[0]);
-                        return [...new Set(baseUrls)];
-                    }
-                """)
-                
-                if not products_on_page or len(products_on_page) == 0:
-                    print("No products found")
-                    break
-                
-                before_count = len(all_products)
-                for product in products_on_page:
-                    if len(all_products) >= max_products:
-                        break
-                    all_products.add(product)
-                new_products = len(all_products) - before_count
-                
-                print(f"{new_products} new products (total: {len(all_products)})")
-                
-                if len(all_products) >= max_products:
-                    print(f"  Reached product limit ({max_products})")
-                    break
-                
-                has_next = page.evaluate("""
-                    () => {
-                        const nextButton = document.querySelector('.pagination__item--next:not(.pagination__item--disable)');
-                        return nextButton !== null;
-                    }
-                """)
-                
-                if not has_next:
-                    break
-                
-                current_page += 1
-                
-            except Exception as e:
-                print(f"Error on page {current_page}: {str(e)[:50]}")
-                break
-        
-        product_links = list(all_products)[:max_products]
-        print(f"\nTotal unique products: {len(product_links)}")
-        return product_links
+    max_images = 10
+    max_products = 100
     
-    def get_all_colors(self, page):
-        try:
-            colors = page.evaluate("""
-                () => {
-                    const colorNames = [];
-                    
-                    const colorInputs = document.querySelectorAll('input[name="Màu"]');
-                    colorInputs.forEach(input => {
-                        const colorValue = input.value;
-                        if (colorValue) {
-                            colorNames.push(colorValue);
-                        }
-                    });
-                    
-                    if (colorNames.length === 0) {
-                        const currentColor = document.querySelector('.current-option[data-selected-value]');
-                        if (currentColor) {
-                            colorNames.push(currentColor.textContent.trim());
-                        }
-                    }
-                    
-                    return colorNames;
-                }
-            """)
-            return colors if colors and len(colors) > 0 else ['N/A']
-        except:
-            return ['N/A']
+    def extract_category(self, url):
+        return CategoryParser.parse(url)
     
-    def crawl_product_detail(self, page, product_url, category_name):
-        print(f"\nCrawling product: {product_url}")
-        try:
-            page.goto(product_url, wait_until='domcontentloaded', timeout=45000)
-            time.sleep(2)
-        except Exception as e:
-            print(f"⚠️ Failed to load product page: {str(e)[:50]}")
-            return
+    def extract_product(self, page, product_url, category_name):
+        if not self.load_product_page(page, product_url):
+            return []
         
         original_name = page.evaluate("""
             () => {
@@ -400,10 +236,6 @@ class SeedDataCrawler:
             }
         """)
         
-        if original_name in self.crawled_products:
-            print(f"  ⏭️  Skipped (already crawled)")
-            return
-        
         price_text = page.evaluate("""
             () => {
                 const priceEl = document.querySelector('.price, [class*="price"], .product-price');
@@ -423,215 +255,54 @@ class SeedDataCrawler:
             }
         """)
         
+        images = page.evaluate(IMAGES_SCRIPT)
+        
+        return [self.build_item(product_url, category_name, original_name, price_text, colors_list, original_desc, images)]
+    
+    def parse_html(self, html, product_url, category_name):
+        doc = parse_document(html, product_url)
+        original_name = first_text(doc, 'h1.product__title, .description-block__heading', 'Unknown Product')
+        price_text = first_text(doc, '.price, [class*="price"], .product-price', '0')
+        original_desc = first_text(doc, '.description-block__text .rte')
+        return [self.build_item(
+            product_url, category_name, original_name, price_text,
+            self.parse_colors(doc), original_desc, self.parse_images(doc)
+        )]
+    
+    def build_item(self, product_url, category_name, original_name, price_text, colors_list, original_desc, images):
         formatted_name = ProductNameFormatter.format_name(original_name)
         price = PriceParser.parse(price_text)
+        colors = [ColorParser.normalize_color_name(color) for color in colors_list]
         
-        color_ids = []
-        for color in colors_list:
-            color_id = self.get_or_create_color(color)
-            color_ids.append(color_id)
-        
-        first_color_name = ColorParser.normalize_color_name(colors_list[0]) if colors_list else 'N/A'
+        first_color_name = colors[0] if colors else 'N/A'
         
         description = DescriptionGenerator.generate(formatted_name, first_color_name, original_desc)
         
         print(f"  Original: {original_name}")
         print(f"  Formatted: {formatted_name}")
         print(f"  Price: {price}")
-        print(f"  Colors: {', '.join(colors_list)} -> IDs: {color_ids}")
-        
-        images = page.evaluate("""
-            () => {
-                const imgs = [];
-                
-                const productImages = document.querySelectorAll('.product-image img, .product-gallery img, [class*="ProductImage"] img, .product__media img');
-                productImages.forEach(img => {
-                    const src = img.src || img.getAttribute('data-src') || img.getAttribute('srcset')?.split(' ')[0];
-                    if (src && !src.includes('icon') && !src.includes('logo')) {
-                        const cleanSrc = src.split('?')[0];
-                        imgs.push(cleanSrc);
-                    }
-                });
-                
-                if (imgs.length === 0) {
-                    const allImgs = document.querySelectorAll('img');
-                    allImgs.forEach(img => {
-                        const parent = img.closest('.header, .footer, .nav, nav, .menu');
-                        if (!parent) {
-                            const src = img.src || img.getAttribute('data-src');
-                            if (src && src.includes('theneworiginals') && !src.includes('icon') && !src.includes('logo')) {
-                                const cleanSrc = src.split('?')[0];
-                                imgs.push(cleanSrc);
-                            }
-                        }
-                    });
-                }
-                
-                return [...new Set(imgs)];
-            }
-        """)
-        
-        print(f"  Found {len(images)} images")
-        
-        uploaded_images = []
-        max_images = min(len(images), 10)
-        for img_idx, img_url in enumerate(images[:max_images]):
-            print(f"  [{img_idx+1}/{max_images}] Uploading...", end=' ')
-            uploaded_url = self.upload_to_cloudinary(img_url, f"{category_name}/{formatted_name.replace(' ', '_')}", timeout=30)
-            if uploaded_url:
-                uploaded_images.append(uploaded_url)
-                print("✓")
-            else:
-                print("✗ Skip")
-        
-        if len(uploaded_images) > 0:
-            category_id = self.get_or_create_category(category_name)
-            
-            product_data = {
-                'id': self.product_id_counter,
-                'category_id': category_id,
-                'name': formatted_name,
-                'description': description,
-                'selling_price': price,
-                'color_ids': ','.join(map(str, color_ids)),
-                'images': ', '.join(uploaded_images)
-            }
-            
-            self.products.append(product_data)
-            self.crawled_products.add(original_name)
-            self.product_id_counter += 1
-            
-            print(f"  ✓ Saved product ID={product_data['id']} with {len(uploaded_images)} images")
-        else:
-            print(f"  ⚠️ No images saved")
-    
-    def save_to_excel(self):
-        """Save data vào Excel với 3 sheets"""
-        from datetime import datetime
-        
-        print(f"\n{'='*60}")
-        print("Saving to Excel...")
-        
-        try:
-            wb = Workbook()
-            
-            ws_categories = wb.active
-            ws_categories.title = "Categories"
-            ws_categories.append(['id', 'name'])
-            for cat_name, cat_id in sorted(self.categories.items(), key=lambda x: x[1]):
-                ws_categories.append([cat_id, cat_name])
-            
-            ws_categories['A1'].font = Font(bold=True)
-            ws_categories['B1'].font = Font(bold=True)
-            ws_categories.column_dimensions['A'].width = 10
-            ws_categories.column_dimensions['B'].width = 30
-            
-            ws_colors = wb.create_sheet("Colors")
-            ws_colors.append(['id', 'name'])
-            for color_name, color_id in sorted(self.colors.items(), key=lambda x: x[1]):
-                ws_colors.append([color_id, color_name])
-            
-            ws_colors['A1'].font = Font(bold=True)
-            ws_colors['B1'].font = Font(bold=True)
-            ws_colors.column_dimensions['A'].width = 10
-            ws_colors.column_dimensions['B'].width = 20
-            
-            ws_products = wb.create_sheet("Products")
-            ws_products.append(['id', 'category_id', 'name', 'description', 'selling_price', 'color_ids', 'images'])
-            
-            for product in self.products:
-                ws_products.append([
-                    product['id'],
-                    product['category_id'],
-                    product['name'],
-                    product['description'],
-                    product['selling_price'],
-                    product['color_ids'],
-                    product['images']
-                ])
-            
-            for col in ws_products[1]:
-                col.font = Font(bold=True)
-                col.alignment = Alignment(horizontal='center', vertical='center')
-            
-            ws_products.column_dimensions['A'].width = 10
-            ws_products.column_dimensions['B'].width = 15
-            ws_products.column_dimensions['C'].width = 40
-            ws_products.column_dimensions['D'].width = 60
-            ws_products.column_dimensions['E'].width = 15
-            ws_products.column_dimensions['F'].width = 20
-            ws_products.column_dimensions['G'].width = 80
-            
-            wb.save(self.excel_path)
-            
-            print(f"✓ Excel saved: {self.excel_path}")
-            print(f"  - Categories: {len(self.categories)}")
-            print(f"  - Colors: {len(self.colors)}")
-            print(f"  - Products: {len(self.products)}")
-            print(f"{'='*60}")
-            
-        except Exception as e:
-            timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-            backup_path = os.path.join(os.path.expanduser('~'), 'Downloads', f'seed_data_{timestamp}.xlsx')
-            print(f"⚠️ Failed to save to {self.excel_path}")
-            print(f"   Trying backup: {backup_path}")
-            
-            wb.save(backup_path)
-            self.excel_path = backup_path
-            print(f"✓ Saved to backup location")
-    
-    def run(self):
-        print(f"Total collections to crawl: {len(self.collection_urls)}\n")
-        
-        try:
-            with sync_playwright() as p:
-                browser = p.chromium.launch(headless=False)
-                page = browser.new_page()
-                
-                all_products = []
-                for idx, collection_url in enumerate(self.collection_urls, 1):
-                    print(f"\n{'='*60}")
-                    print(f"[Collection {idx}/{len(self.collection_urls)}]")
-                    category_name = CategoryParser.parse(collection_url)
-                    print(f"Category: {category_name}")
-                    
-                    try:
-                        product_links = self.crawl_collection(page, collection_url)
-                        for product in product_links:
-                            all_products.append((product, category_name))
-                    except Exception as e:
-                        print(f"Error crawling collection {collection_url}: {e}")
-                        continue
-                
-                print(f"\n{'='*60}")
-                print(f"Total products found: {len(all_products)}")
-                print(f"{'='*60}\n")
-                
-                for idx, (product_url, category_name) in enumerate(all_products, 1):
-                    print(f"\n{'='*60}")
-                    print(f"[Product {idx}/{len(all_products)}]")
-                    print(f"Progress: {len(self.products)} products saved so far")
-                    print(f"URL: {product_url}")
-                    
-                    try:
-                        self.crawl_product_detail(page, product_url, category_name)
-                    except KeyboardInterrupt:
-                        raise
-                    except Exception as e:
-                        print(f"⚠️ Error crawling product: {str(e)[:100]}")
-                        print("→ Skipping to next product...")
-                        continue
-                
-                browser.close()
-        except KeyboardInterrupt:
-            print("\n\n" + "="*60)
-            print("⚠️ SCRIPT INTERRUPTED BY USER (Ctrl+C)")
-            print(f"Data saved: {len(self.products)} products")
-            print("="*60)
-        except Exception as e:
-            print(f"\n\n⚠️ Script error: {e}")
-        finally:
-            self.save_to_excel()
+        print(f"  Colors: {', '.join(colors_list)} -> {', '.join(colors)}")
+        
+        return ExtractedItem(
+            url=product_url,
+            category=category_name,
+            name=formatted_name,
+            price=price,
+            colors=colors,
+            images=images[:self.max_images],
+            description=description,
+            folder=f"{category_name}/{formatted_name.replace(' ', '_')}",
+            key=original_name
+        )
+
+class SeedDataCrawler(CrawlEngine):
+    def __init__(self, collection_urls, checkpoint_every=100, resume=False, **options):
+        super().__init__(
+            SeedDataAdapter(),
+            SeedSink(checkpoint_every=checkpoint_every, resume=resume, product_marker=SeedDataAdapter.product_marker),
+            collection_urls,
+            **options
+        )
 
 if __name__ == "__main__":
     print("=== SEED DATA CRAWLER ===\n")
@@ -0,0 +1,252 @@
+import os
+import json
+from ids import normalize_key
+
+PRODUCT_HEADERS = ['id', 'category_id', 'name', 'description', 'selling_price', 'color_ids', 'images']
+PRODUCT_WIDTHS = {'A': 10, 'B': 15, 'C': 40, 'D': 60, 'E': 15, 'F': 20, 'G': 80}
+
+
+def journal_path_for(excel_path):
+    root, _ = os.path.splitext(excel_path)
+    return root + '.journal.jsonl'
+
+
+def read_journal(journal_path):
+    """
+    Đọc journal theo từng dòng (streaming).
+    Yield (kind, entry) với kind là 'category', 'color' hoặc 'product'.
+    Dòng cuối bị cắt dở (crash giữa chừng) được bỏ qua.
+    """
+    with open(journal_path, 'r', encoding='utf-8') as f:
+        for line in f:
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                continue
+            yield entry.pop('t'), entry
+
+
+def product_id(entry):
+    return entry['id']
+
+
+def iter_latest(journal_path, kind='product', key=product_id):
+    """
+    Như read_journal nhưng entry `kind` được ghi lại (cùng key, sản phẩm crawl lại/cập nhật)
+    chỉ giữ bản cuối cùng, tại vị trí của bản đó. Đọc journal 2 lượt, RAM chỉ giữ key -> số dòng.
+    """
+    last = {}
+    for line_no, (entry_kind, entry) in enumerate(read_journal(journal_path)):
+        if entry_kind == kind:
+            last[key(entry)] = line_no
+    for line_no, (entry_kind, entry) in enumerate(read_journal(journal_path)):
+        if entry_kind == kind and last.get(key(entry), line_no) != line_no:
+            continue
+        yield entry_kind, entry
+
+
+class SeedExcelExporter:
+    """
+    Ghi seed data ra đĩa ngay khi crawl được.
+
+    Mỗi category/color/product mới được append vào journal (JSON lines) và flush ngay,
+    nên crash giữa chừng không mất dữ liệu. Categories/Colors là bảng nhỏ giữ trong RAM,
+    Products chỉ nằm trên đĩa. Workbook 3 sheets được dựng lại bằng cách stream journal
+    (openpyxl write_only) mỗi `checkpoint_every` lần ghi product và khi finalize.
+    Product ghi lại với id đã có (replace=True) thay cho bản cũ khi export (iter_latest).
+    """
+
+    def __init__(self, excel_path, checkpoint_every=100):
+        self.excel_path = excel_path
+        self.journal_path = journal_path_for(excel_path)
+        self.checkpoint_every = checkpoint_every
+        self.categories = {}
+        self.colors = {}
+        self.product_count = 0
+        self.product_writes = 0
+        self.product_keys = {}
+        self.journal = None
+
+    def open(self, append=False):
+        """Bắt đầu journal mới (ghi đè journal của lần chạy trước), append=True để ghi tiếp (resume)"""
+        os.makedirs(os.path.dirname(self.journal_path) or '.', exist_ok=True)
+        self.journal = open(self.journal_path, 'a' if append else 'w', encoding='utf-8')
+
+    def close(self):
+        if self.journal:
+            self.journal.close()
+            self.journal = None
+
+    def _write(self, kind, entry):
+        if self.journal is None:
+            self.open()
+        self.journal.write(json.dumps({'t': kind, **entry}, ensure_ascii=False) + '\n')
+        self.journal.flush()
+
+    def add_category(self, cat_id, name):
+        self.categories[cat_id] = name
+        self._write('category', {'id': cat_id, 'name': name})
+
+    def add_color(self, color_id, name):
+        self.colors[color_id] = name
+        self._write('color', {'id': color_id, 'name': name})
+
+    def add_product(self, product, replace=False):
+        self._write('product', {
+            'id': product.id,
+            'category_id': product.category_id,
+            'name': product.name,
+            'description': product.description,
+            'selling_price': product.selling_price,
+            'color_ids': list(product.color_ids),
+            'images': list(product.images),
+            'key': product.key
+        })
+        if not replace:
+            self.product_count += 1
+        self.product_writes += 1
+
+        if self.checkpoint_every and self.product_writes % self.checkpoint_every == 0:
+            self.checkpoint()
+
+    def iter_product_rows(self):
+        if not os.path.exists(self.journal_path):
+            return
+        for kind, entry in iter_latest(self.journal_path):
+            if kind != 'product':
+                continue
+            yield [
+                entry['id'],
+                entry['category_id'],
+                entry['name'],
+                entry['description'],
+                entry['selling_price'],
+                ','.join(map(str, entry['color_ids'])),
+                ', '.join(entry['images'])
+            ]
+
+    def checkpoint(self):
+        """Dựng workbook 3 sheets nhất quán từ journal"""
+        try:
+            self.write_workbook(self.excel_path)
+            print(f"  💾 Checkpoint: {self.product_count} products → {self.excel_path}")
+            return True
+        except Exception as e:
+            print(f"  ⚠️ Checkpoint failed: {str(e)[:100]}")
+            return False
+
+    def write_workbook(self, path):
+        """
+        Stream journal vào workbook write_only, ghi ra file tạm rồi os.replace
+        để file Excel luôn ở trạng thái đầy đủ.
+        """
+        from openpyxl import Workbook
+        from openpyxl.styles import Font, Alignment
+
+        if self.journal:
+            self.journal.flush()
+
+        wb = Workbook(write_only=True)
+        bold = Font(bold=True)
+
+        ws_categories = wb.create_sheet("Categories")
+        ws_categories.column_dimensions['A'].width = 10
+        ws_categories.column_dimensions['B'].width = 30
+        ws_categories.append(self._header_cells(ws_categories, ['id', 'name'], bold))
+        for cat_id, cat_name in sorted(self.categories.items()):
+            ws_categories.append([cat_id, cat_name])
+
+        ws_colors = wb.create_sheet("Colors")
+        ws_colors.column_dimensions['A'].width = 10
+        ws_colors.column_dimensions['B'].width = 20
+        ws_colors.append(self._header_cells(ws_colors, ['id', 'name'], bold))
+        for color_id, color_name in sorted(self.colors.items()):
+            ws_colors.append([color_id, color_name])
+
+        ws_products = wb.create_sheet("Products")
+        for col, width in PRODUCT_WIDTHS.items():
+            ws_products.column_dimensions[col].width = width
+        ws_products.append(self._header_cells(
+            ws_products, PRODUCT_HEADERS, bold,
+            Alignment(horizontal='center', vertical='center')
+        ))
+        for row in self.iter_product_rows():
+            ws_products.append(row)
+
+        tmp_path = path + '.tmp'
+        wb.save(tmp_path)
+        os.replace(tmp_path, path)
+
+    @staticmethod
+    def _header_cells(ws, headers, font, alignment=None):
+        from openpyxl.cell import WriteOnlyCell
+
+        cells = []
+        for header in headers:
+            cell = WriteOnlyCell(ws, value=header)
+            cell.font = font
+            if alignment:
+                cell.alignment = alignment
+            cells.append(cell)
+        return cells
+
+    @classmethod
+    def recover(cls, excel_path):
+        """Dựng lại exporter (categories/colors/product count, key -> id) từ journal của lần chạy bị crash"""
+        exporter = cls(excel_path)
+        for kind, entry in iter_latest(exporter.journal_path):
+            if kind == 'category':
+                exporter.categories[entry['id']] = entry['name']
+            elif kind == 'color':
+                exporter.colors[entry['id']] = entry['name']
+            elif kind == 'product':
+                exporter.product_count += 1
+                if entry.get('key'):
+                    exporter.product_keys[entry['key']] = entry['id']
+        return exporter
+
+
+def merge_journals(journal_paths, out_path):
+    """
+    Gộp journal của nhiều shard (id ổn định theo key nên cùng entity có cùng id ở mọi shard):
+    1 lượt qua từng journal (product cập nhật trong cùng journal chỉ lấy bản cuối, iter_latest),
+    bỏ dòng có id đã ghi. Entity cha luôn nằm trước con trong
+    từng journal nên thứ tự trong file gộp vẫn hợp lệ. Cùng id nhưng khác tên/key
+    (đụng hash giữa 2 shard) thì giữ bản đầu và đếm vào 'conflicts'.
+    """
+    seen = {'category': {}, 'color': {}, 'product': {}}
+    counts = {'category': 0, 'color': 0, 'product': 0, 'duplicates': 0, 'conflicts': 0}
+    tmp_path = out_path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as out:
+        for journal_path in journal_paths:
+            for kind, entry in iter_latest(journal_path):
+                identity = normalize_key((entry.get('key') or entry['name']) if kind == 'product' else entry['name'])
+                previous = seen[kind].get(entry['id'])
+                if previous is not None:
+                    if previous == identity:
+                        counts['duplicates'] += 1
+                    else:
+                        counts['conflicts'] += 1
+                        print(f"⚠️ {kind} id {entry['id']} conflict: {previous!r} vs {identity!r} ({journal_path})")
+                    continue
+                seen[kind][entry['id']] = identity
+                counts[kind] += 1
+                out.write(json.dumps({'t': kind, **entry}, ensure_ascii=False) + '\n')
+    os.replace(tmp_path, out_path)
+    return counts
+
+
+if __name__ == "__main__":
+    import sys
+
+    if len(sys.argv) < 2:
+        print("Usage: python seed_export.py <seed_data.xlsx>")
+        print("Dựng lại workbook từ journal (seed_data.journal.jsonl) sau khi crawler bị crash")
+        exit()
+
+    exporter = SeedExcelExporter.recover(sys.argv[1])
+    exporter.write_workbook(exporter.excel_path)
+    print(f"✓ Rebuilt {exporter.excel_path}")
+    print(f"  - Categories: {len(exporter.categories)}")
+    print(f"  - Colors: {len(exporter.colors)}")
+    print(f"  - Products: {exporter.product_count}")
@@ -0,0 +1,385 @@
+import os
+import json
+from datetime import datetime
+from records import ProductRecord, SeedProduct, RecordBuffer, intern_text
+from seed_export import SeedExcelExporter, journal_path_for, read_journal, iter_latest
+from dedup import SeenIndex, canonical_product_key
+from ids import IdAllocator
+
+PRODUCT_HEADERS = ['STT', 'Category', 'Tên sản phẩm', 'Giá', 'Màu sắc', 'Danh sách link ảnh', 'Mô tả sản phẩm']
+
+
+def downloads_path(filename):
+    return os.path.join(os.path.expanduser('~'), 'Downloads', filename)
+
+
+class ProductExcelSink:
+    """
+    Output dạng 1 sheet Products (lecas_data.xlsx, tno_data.xlsx).
+    Mỗi dòng được append vào journal (<file_stem>.journal.jsonl, JSON lines) và flush ngay;
+    workbook được dựng lại bằng cách stream journal (openpyxl write_only) mỗi
+    `checkpoint_every` dòng và khi close, nên không giữ workbook trong RAM và không save lại
+    cả file sau mỗi dòng.
+    resume=True: ghi tiếp journal cũ (file Excel cũ chưa có journal thì import các dòng của nó)
+    và bỏ qua sản phẩm đã có. Tên sản phẩm đã crawl nằm trong SeenIndex (<file_stem>_seen.db),
+    không load cả output vào RAM.
+
+    Dòng được ghi lại (sản phẩm crawl lại, vd. do RecrawlScheduler) thay cho dòng cũ cùng key khi
+    export: item.key, hoặc canonical URL (+ màu nếu item_per_color) khi adapter không đặt key.
+    keep_previous=True (engine bật khi có scheduler): ghi tiếp journal cũ cả khi không resume,
+    để sản phẩm scheduler bỏ qua lần này vẫn còn trong output.
+    """
+
+    unit = 'variants'
+
+    def __init__(self, file_stem, keep_records=False, resume=False, checkpoint_every=100,
+                 product_marker=None, item_per_color=False):
+        self.file_stem = file_stem
+        self.excel_path = downloads_path(f'{file_stem}.xlsx')
+        self.journal_path = journal_path_for(self.excel_path)
+        self.resume = resume
+        self.keep_previous = False
+        self.checkpoint_every = checkpoint_every
+        self.product_marker = product_marker
+        self.item_per_color = item_per_color
+        self.products_data = RecordBuffer(keep_flushed=keep_records)
+        self.crawled_products = None
+        self.journal = None
+        self.row_count = 0
+
+    def __len__(self):
+        return len(self.products_data)
+
+    def open(self):
+        if self.resume:
+            self.crawled_products = SeenIndex(downloads_path(f'{self.file_stem}_seen.db'), table='products')
+        else:
+            self.crawled_products = SeenIndex(table='products')
+        self.open_journal()
+
+    def close(self):
+        self.finalize_excel()
+        self.crawled_products.close()
+
+    def is_crawled(self, item):
+        return item.key is not None and item.key in self.crawled_products
+
+    def write(self, item, uploaded_images):
+        product_data = ProductRecord(
+            category=item.category,
+            product_name=item.name,
+            price=item.price,
+            colors=', '.join(item.colors),
+            images=uploaded_images,
+            description=item.description
+        )
+        self.products_data.append(product_data)
+        if item.key is not None:
+            self.crawled_products.add(item.key)
+
+        if self.append_to_excel(product_data, item.key, item.url):
+            print(f"  ✓ Saved {len(uploaded_images)} images → journal updated")
+        else:
+            print(f"  ✓ Saved {len(uploaded_images)} images (journal update failed)")
+        return product_data
+
+    def row_key(self, entry):
+        """Key để dòng mới thay dòng cũ của cùng sản phẩm (cùng màu) khi export"""
+        if entry.get('key'):
+            return entry['key']
+        if not entry.get('url'):
+            return entry['product_name']
+        key = canonical_product_key(entry['url'], self.product_marker) if self.product_marker else entry['url']
+        return f"{key}|{entry['colors']}" if self.item_per_color else key
+
+    def open_journal(self):
+        """
+        Journal mới (ghi đè lần chạy trước); resume/keep_previous thì ghi tiếp journal
+        hoặc import file Excel cũ
+        """
+        os.makedirs(os.path.dirname(self.journal_path) or '.', exist_ok=True)
+        keep = self.resume or self.keep_previous
+        if keep and os.path.exists(self.journal_path):
+            restored = self.resume and len(self.crawled_products) == 0
+            for kind, entry in read_journal(self.journal_path):
+                if kind != 'row':
+                    continue
+                self.row_count += 1
+                if restored:
+                    self.crawled_products.add(entry.get('key') or entry['product_name'])
+            self.journal = open(self.journal_path, 'a', encoding='utf-8')
+            print(f"✓ Journal opened (continuing after {self.row_count} rows): {self.journal_path}")
+            if self.resume:
+                print(f"ℹ️  Seen index has {len(self.crawled_products)} products, will skip them")
+            print()
+            return
+
+        self.journal = open(self.journal_path, 'w', encoding='utf-8')
+        if keep and os.path.exists(self.excel_path):
+            self.load_existing_products()
+        print(f"✓ Streaming rows to: {self.journal_path}\n")
+
+    def load_existing_products(self):
+        """File Excel của bản cũ (chưa có journal): chép các dòng vào journal để export vẫn giữ chúng"""
+        try:
+            from openpyxl import load_workbook
+            wb = load_workbook(self.excel_path, read_only=True)
+            ws = wb.active
+            for row in ws.iter_rows(min_row=2, max_col=len(PRODUCT_HEADERS), values_only=True):
+                if not row[2]:  # Tên sản phẩm
+                    continue
+                images = [url for url in str(row[5] or '').split(', ') if url]
+                record = ProductRecord(
+                    category=row[1], product_name=str(row[2]), price=row[3],
+                    colors=row[4] or '', images=images, description=row[6] or ''
+                )
+                self._journal_row(record, str(row[2]), None)
+                self.crawled_products.add(str(row[2]))
+            wb.close()
+            self.journal.flush()
+            print(f"ℹ️  Found existing Excel file with {self.row_count} rows")
+            print(f"   Will skip already crawled products\n")
+        except Exception as e:
+            print(f"⚠️  Could not read existing Excel: {str(e)[:50]}\n")
+
+    def _timestamped_path(self):
+        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+        return downloads_path(f'{self.file_stem}_{timestamp}.xlsx')
+
+    def _journal_row(self, product_data, key, url):
+        self.journal.write(json.dumps({
+            't': 'row',
+            'key': key,
+            'url': url,
+            'category': product_data.category,
+            'product_name': product_data.product_name,
+            'price': product_data.price,
+            'colors': product_data.colors,
+            'images': list(product_data.images),
+            'description': product_data.description
+        }, ensure_ascii=False) + '\n')
+        self.row_count += 1
+
+    def append_to_excel(self, product_data, key=None, url=None):
+        """Append 1 dòng vào journal (flush ngay), checkpoint workbook mỗi checkpoint_every dòng"""
+        try:
+            self._journal_row(product_data, key, url)
+            self.journal.flush()
+            self.products_data.mark_flushed()
+        except Exception as e:
+            print(f"    ⚠️ Failed to write journal: {e}")
+            return False
+
+        if self.checkpoint_every and self.row_count % self.checkpoint_every == 0:
+            try:
+                rows = self.write_workbook(self.excel_path)
+                print(f"  💾 Checkpoint: {rows} rows → {self.excel_path}")
+            except Exception as e:
+                print(f"  ⚠️ Checkpoint failed: {str(e)[:100]}")
+        return True
+
+    def iter_rows(self):
+        """Dòng Excel từ journal, dòng cùng row_key chỉ lấy bản ghi sau cùng"""
+        stt = 0
+        for kind, entry in iter_latest(self.journal_path, 'row', self.row_key):
+            if kind != 'row':
+                continue
+            stt += 1
+            yield [stt, entry['category'], entry['product_name'], entry['price'], entry['colors'],
+                   ', '.join(entry['images']), entry['description']]
+
+    def write_workbook(self, path):
+        """Stream journal vào workbook write_only, ghi ra file tạm rồi os.replace. Trả về số dòng"""
+        from openpyxl import Workbook
+        from openpyxl.cell import WriteOnlyCell
+        from openpyxl.styles import Font, Alignment
+
+        if self.journal:
+            self.journal.flush()
+
+        wb = Workbook(write_only=True)
+        ws = wb.create_sheet("Products")
+        for col in ['A', 'B', 'C', 'D', 'E']:
+            ws.column_dimensions[col].width = 20
+        ws.column_dimensions['F'].width = 80
+        ws.column_dimensions['G'].width = 50
+
+        header = []
+        for title in PRODUCT_HEADERS:
+            cell = WriteOnlyCell(ws, value=title)
+            cell.font = Font(bold=True)
+            cell.alignment = Alignment(horizontal='center', vertical='center')
+            header.append(cell)
+        ws.append(header)
+        rows = 0
+        for row in self.iter_rows():
+            ws.append(row)
+            rows += 1
+
+        tmp_path = path + '.tmp'
+        wb.save(tmp_path)
+        os.replace(tmp_path, path)
+        return rows
+
+    def finalize_excel(self):
+        try:
+            rows = self.write_workbook(self.excel_path)
+        except Exception as e:
+            self.excel_path = self._timestamped_path()
+            print(f"⚠️ Failed to save Excel ({str(e)[:50]}), using new file: {self.excel_path}")
+            rows = self.write_workbook(self.excel_path)
+        finally:
+            if self.journal:
+                self.journal.close()
+                self.journal = None
+        print(f"\n{'='*60}")
+        print(f"✓ Final data saved to: {self.excel_path}")
+        print(f"Total rows saved: {rows}")
+        print(f"{'='*60}")
+
+
+class SeedSink:
+    """
+    Output seed data (Categories/Colors/Products) cho database.
+    Gán id cho category/color/product và stream qua SeedExcelExporter.
+    Id suy ra từ key (ids.IdAllocator): tên category, tên màu đã chuẩn hóa
+    (ColorParser.normalize_color_name), canonical URL của sản phẩm. Cùng entity luôn cùng id
+    giữa các lần chạy và giữa các shard, nên journal của nhiều shard gộp được (merge_journals).
+    resume=True: ghi tiếp journal cũ, giữ id đã cấp trong journal.
+    Sản phẩm đã có trong journal được ghi lại (bản mới thay bản cũ khi export).
+    keep_previous=True (engine bật khi có scheduler): ghi tiếp journal cũ cả khi không resume.
+    """
+
+    unit = 'products'
+
+    def __init__(self, checkpoint_every=100, resume=False, file_stem='seed_data', product_marker='/products/'):
+        self.resume = resume
+        self.keep_previous = False
+        self.file_stem = file_stem
+        self.product_marker = product_marker
+        self.excel_path = downloads_path(f'{self.file_stem}.xlsx')
+        self.exporter = SeedExcelExporter(self.excel_path, checkpoint_every=checkpoint_every)
+
+        self.categories = {}
+        self.colors = {}
+        self.product_ids = set()
+        self.products = RecordBuffer(keep_flushed=False)
+        self.updated = 0
+        self.ids = IdAllocator()
+
+        self.crawled_products = None
+
+    def __len__(self):
+        return len(self.products)
+
+    def open(self):
+        self.crawled_products = SeenIndex(table='products')
+        if (self.resume or self.keep_previous) and os.path.exists(self.exporter.journal_path):
+            self.restore_from_journal()
+            self.exporter.open(append=True)
+        else:
+            self.exporter.open()
+        print(f"✓ Streaming products to: {self.exporter.journal_path}\n")
+
+    def close(self):
+        self.save_to_excel()
+        self.crawled_products.close()
+
+    def is_crawled(self, item):
+        return item.key is not None and item.key in self.crawled_products
+
+    def restore_from_journal(self):
+        recovered = SeedExcelExporter.recover(self.excel_path)
+        self.exporter.categories = recovered.categories
+        self.exporter.colors = recovered.colors
+        self.exporter.product_count = recovered.product_count
+
+        self.categories = {intern_text(name): cat_id for cat_id, name in recovered.categories.items()}
+        self.colors = {intern_text(name): color_id for color_id, name in recovered.colors.items()}
+        for name, cat_id in self.categories.items():
+            self.ids.remember('category', name, cat_id)
+        for name, color_id in self.colors.items():
+            self.ids.remember('color', name, color_id)
+        for key, product_id in recovered.product_keys.items():
+            self.ids.remember('product', key, product_id)
+            self.product_ids.add(product_id)
+        print(f"ℹ️  Resuming journal: {len(self.categories)} categories, "
+              f"{len(self.colors)} colors, {recovered.product_count} products")
+
+    def get_or_create_category(self, category_name):
+        """Get category ID, tạo mới nếu chưa có"""
+        if category_name in self.categories:
+            return self.categories[category_name]
+
+        cat_id = self.ids.id_for('category', category_name)
+        self.categories[intern_text(category_name)] = cat_id
+        self.exporter.add_category(cat_id, category_name)
+        return cat_id
+
+    def get_or_create_color(self, color_name):
+        """Get color ID (color_name đã chuẩn hóa), tạo mới nếu chưa có"""
+        if color_name in self.colors:
+            return self.colors[color_name]
+
+        color_id = self.ids.id_for('color', color_name)
+        self.colors[intern_text(color_name)] = color_id
+        self.exporter.add_color(color_id, color_name)
+        return color_id
+
+    def write(self, item, uploaded_images):
+        category_id = self.get_or_create_category(item.category)
+        color_ids = [self.get_or_create_color(color) for color in item.colors]
+        product_key = canonical_product_key(item.url, self.product_marker)
+        product_id = self.ids.id_for('product', product_key)
+        replace = product_id in self.product_ids
+
+        product_data = SeedProduct(
+            id=product_id,
+            category_id=category_id,
+            name=item.name,
+            description=item.description,
+            selling_price=item.price,
+            color_ids=color_ids,
+            images=uploaded_images,
+            key=product_key
+        )
+
+        self.exporter.add_product(product_data, replace=replace)
+        if item.key is not None:
+            self.crawled_products.add(item.key)
+        if replace:
+            self.updated += 1
+            print(f"  ↻ Updated product ID={product_data.id} with {len(uploaded_images)} images (color IDs: {color_ids})")
+            return product_data
+
+        self.products.append(product_data)
+        self.products.mark_flushed()
+        self.product_ids.add(product_id)
+        print(f"  ✓ Saved product ID={product_data.id} with {len(uploaded_images)} images (color IDs: {color_ids})")
+        return product_data
+
+    def save_to_excel(self):
+        """Save data vào Excel với 3 sheets (stream từ journal)"""
+        print(f"\n{'='*60}")
+        print("Saving to Excel...")
+
+        try:
+            self.exporter.write_workbook(self.excel_path)
+
+            print(f"✓ Excel saved: {self.excel_path}")
+            print(f"  - Categories: {len(self.categories)}")
+            print(f"  - Colors: {len(self.colors)}")
+            print(f"  - Products: {self.exporter.product_count} ({len(self.products)} new, {self.updated} updated)")
+            print(f"{'='*60}")
+
+        except Exception as e:
+            timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+            backup_path = downloads_path(f'{self.file_stem}_{timestamp}.xlsx')
+            print(f"⚠️ Failed to save to {self.excel_path}")
+            print(f"   Trying backup: {backup_path}")
+
+            self.exporter.write_workbook(backup_path)
+            self.excel_path = backup_path
+            print(f"✓ Saved to backup location")
+        finally:
+            self.exporter.close()
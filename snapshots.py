@@ -0,0 +1,86 @@
+import os
+import gzip
+import json
+import time
+import hashlib
+import threading
+from functools import partial
+from concurrent.futures import ProcessPoolExecutor
+
+
+class SnapshotStore:
+    """
+    Lưu DOM đã render (page.content()) của từng trang sản phẩm, nén gzip.
+
+        <root>/pages/<2 ký tự đầu>/<sha1(url)>.html.gz
+        <root>/index.jsonl   mỗi dòng: url, category, file, saved_at
+
+    Crawl lại cùng URL thì file bị ghi đè, index giữ dòng mới nhất.
+    """
+
+    def __init__(self, root):
+        self.root = root
+        self.index_path = os.path.join(root, 'index.jsonl')
+        self.lock = threading.Lock()
+        os.makedirs(os.path.join(root, 'pages'), exist_ok=True)
+
+    def relative_path(self, url):
+        digest = hashlib.sha1(url.encode('utf-8')).hexdigest()
+        return os.path.join('pages', digest[:2], f'{digest}.html.gz')
+
+    def save(self, url, category, html):
+        rel_path = self.relative_path(url)
+        path = os.path.join(self.root, rel_path)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        with gzip.open(tmp_path, 'wb', compresslevel=5) as f:
+            f.write(html.encode('utf-8'))
+        os.replace(tmp_path, path)
+
+        line = json.dumps({'url': url, 'category': category, 'file': rel_path, 'saved_at': time.time()}, ensure_ascii=False)
+        with self.lock:
+            with open(self.index_path, 'a', encoding='utf-8') as f:
+                f.write(line + '\n')
+
+    def entries(self):
+        """Entry mới nhất của mỗi URL"""
+        latest = {}
+        if not os.path.exists(self.index_path):
+            return []
+        with open(self.index_path, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    continue
+                latest[entry['url']] = entry
+        return list(latest.values())
+
+    def load(self, entry):
+        with gzip.open(os.path.join(self.root, entry['file']), 'rb') as f:
+            return f.read().decode('utf-8')
+
+    def __len__(self):
+        return len(self.entries())
+
+
+def parse_snapshot(adapter, store_root, entry):
+    """Chạy trong process con: đọc 1 snapshot và parse bằng adapter.parse_html"""
+    try:
+        html = SnapshotStore(store_root).load(entry)
+        return adapter.parse_html(html, entry['url'], entry['category'])
+    except Exception as e:
+        print(f"⚠️ Failed to parse snapshot {entry['url']}: {str(e)[:100]}")
+        return []
+
+
+def parse_snapshots(store, adapter, workers=None, chunksize=8):
+    """
+    Parse mọi snapshot song song trên ProcessPoolExecutor (mặc định = số core).
+    Yield list ExtractedItem theo từng snapshot.
+    """
+    entries = store.entries()
+    print(f"Parsing {len(entries)} snapshots with {workers or os.cpu_count()} processes...")
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        yield from executor.map(partial(parse_snapshot, adapter, store.root), entries, chunksize=chunksize)
@@ -0,0 +1,109 @@
+import playwright.sync_api
+
+from browser_pool import BrowserPool
+from pipeline import BrowserUnavailable, WorkerPage, extract_task, StageStats
+
+
+class FakeBrowser:
+    def __init__(self):
+        self.handlers = {}
+        self.connected = True
+
+    def on(self, event, handler):
+        self.handlers[event] = handler
+
+    def is_connected(self):
+        return self.connected
+
+    def new_page(self):
+        return object()
+
+    def close(self):
+        self.connected = False
+
+
+class FakePlaywright:
+    """Như sync API thật: chỉ 1 instance được chạy trên 1 thread tại 1 thời điểm"""
+    running = 0
+
+    def __init__(self, endpoint_up):
+        self.endpoint_up = endpoint_up
+        self.chromium = self
+
+    def start(self):
+        if FakePlaywright.running:
+            raise RuntimeError("using Playwright Sync API inside the asyncio loop")
+        FakePlaywright.running += 1
+        return self
+
+    def stop(self):
+        FakePlaywright.running -= 1
+
+    def connect_over_cdp(self, url, timeout=None):
+        if not self.endpoint_up[0]:
+            raise ConnectionError("connection refused")
+        return FakeBrowser()
+
+
+class FakeEngine:
+    def __init__(self, pool):
+        self.browser_pool = pool
+        self.watchdog = None
+        self.retries = []
+
+    def launch_browser(self, p):
+        return self.browser_pool.connect(p)
+
+    def new_page(self, browser, traced=False):
+        return browser.new_page()
+
+    def new_deadline(self):
+        return None
+
+    def extract(self, pages, product_url, category, deadline=None):
+        pages.get(self)
+        return []
+
+    def after_extract(self, product_url, category, items, seconds):
+        return items
+
+    def retry_later(self, product_url, category, attempt, error, over_budget=True):
+        self.retries.append((product_url, attempt, over_budget, type(error)))
+        return True
+
+
+def make_worker(monkeypatch):
+    endpoint_up = [False]
+    FakePlaywright.running = 0
+    monkeypatch.setattr(playwright.sync_api, 'sync_playwright', lambda: FakePlaywright(endpoint_up))
+    pool = BrowserPool(['http://127.0.0.1:9'])
+    return WorkerPage('test'), FakeEngine(pool), endpoint_up
+
+
+def test_reconnects_after_endpoint_failure(monkeypatch):
+    pages, engine, endpoint_up = make_worker(monkeypatch)
+
+    try:
+        pages.get(engine)
+        assert False, "connect should fail while the endpoint is down"
+    except BrowserUnavailable:
+        pass
+    assert pages.playwright is None and pages.browser is None and FakePlaywright.running == 0
+
+    endpoint_up[0] = True
+    assert pages.get(engine) is not None
+    assert pages.browser.is_connected()
+    pages.close()
+
+
+def test_connect_failure_is_retried_later(monkeypatch):
+    pages, engine, endpoint_up = make_worker(monkeypatch)
+
+    claimed = extract_task(engine, pages, ('https://x/products/a', 'c'), StageStats('extract'), 'test')
+    assert claimed == []
+    assert engine.retries == [('https://x/products/a', 0, False, BrowserUnavailable)]
+
+    endpoint_up[0] = True
+    extract_task(engine, pages, ('https://x/products/a', 'c', 1), StageStats('extract'), 'test')
+    assert len(engine.retries) == 1
+    pages.close()
@@ -0,0 +1,47 @@
+from delta_export import DeltaExporter
+
+
+def row(color, images=('https://img/1.jpg',), category='ao-thun', price='199.000 đ'):
+    return {'category': category, 'name': 'Áo', 'price': price, 'colors': [color],
+            'images': list(images) if images is not None else None, 'description': ''}
+
+
+def run(tmp_path, steps):
+    delta = DeltaExporter(str(tmp_path / 'snapshot.db'), str(tmp_path), 'test')
+    steps(delta)
+    delta.close()
+    return delta.counts
+
+
+def first_run(delta):
+    for product in ('a', 'b'):
+        delta.touch(product, 'ao-thun')
+    delta.record('a', 'đen', 'https://x/product/a', row('đen'))
+    delta.record('a', 'trắng', 'https://x/product/a', row('trắng'))
+    delta.record('b', '', 'https://x/product/b', row(''))
+
+
+def test_failed_upload_is_not_removed(tmp_path):
+    run(tmp_path, first_run)
+
+    def second_run(delta):
+        delta.touch('a', 'ao-thun')
+        delta.touch('b', 'ao-thun')
+        delta.record('a', 'đen', 'https://x/product/a', row('đen'))
+        delta.record('a', 'trắng', 'https://x/product/a', row('trắng', images=None, price='149.000 đ'))
+    counts = run(tmp_path, second_run)
+    assert counts['removed'] == 0
+    assert counts['changed'] == 1
+
+
+def test_truncated_category_does_not_remove_missing_products(tmp_path):
+    run(tmp_path, first_run)
+
+    def second_run(delta):
+        delta.touch('a', 'ao-thun')
+        delta.truncate('ao-thun')
+    assert run(tmp_path, second_run)['removed'] == 0
+
+    def third_run(delta):
+        delta.touch('a', 'ao-thun')
+    assert run(tmp_path, third_run)['removed'] == 1
@@ -0,0 +1,17 @@
+import json
+
+from page_tracer import SlowPageTracer
+
+
+def test_static_path_is_timed(tmp_path):
+    tracer = SlowPageTracer(str(tmp_path), threshold=60)
+    assert tracer.run(None, 'https://x/products/a', lambda: (['item'], '<html>'), path='static') == (['item'], '<html>')
+    assert tracer.run(None, 'https://x/products/b', lambda: None, path='static') is None
+    tracer.run(None, 'https://x/products/b', lambda: ['item'])
+
+    with open(tmp_path / 'durations.jsonl', encoding='utf-8') as f:
+        lines = [json.loads(line) for line in f]
+    assert [(line['url'][-1], line['path'], line['fallback']) for line in lines] == [
+        ('a', 'static', False), ('b', 'static', True), ('b', 'browser', False)
+    ]
+    assert tracer.count == 2
@@ -0,0 +1,59 @@
+import recrawl
+from recrawl import DAY, RecrawlScheduler, change_rate
+from records import ExtractedItem
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1_700_000_000.0
+
+    def __call__(self):
+        return self.now
+
+
+def item(price='199.000 đ'):
+    return ExtractedItem(url='https://x/products/a', category='c', name='A', price=price, colors=['Đen'],
+                         images=['https://img/a.jpg'], description='', folder='c/A', key='A')
+
+
+def test_unchanged_rate_is_positive():
+    assert change_rate(11, 0, 0, 10 * DAY) > 0
+
+
+def test_stable_product_becomes_due_again(tmp_path, monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(recrawl.time, 'time', clock)
+    scheduler = RecrawlScheduler(str(tmp_path / 'history.db'), max_age=None)
+    for _ in range(3):
+        scheduler.observe_product('a', 'https://x/products/a', 'c', [item()], 1.0)
+        clock.now += DAY
+
+    assert 'a' in scheduler.plan()
+    clock.now += 30 * DAY
+    scheduler.planned = {}
+    assert 'a' in scheduler.plan()
+
+    # Check lại ngay sau đó: chưa tới hạn, vài tuần sau thì tới hạn lại
+    for _ in range(10):
+        scheduler.observe_product('a', 'https://x/products/a', 'c', [item()], 1.0)
+        clock.now += DAY
+    scheduler.planned = {}
+    clock.now -= DAY - 60
+    assert 'a' not in scheduler.plan()
+    clock.now += 60 * DAY
+    scheduler.planned = {}
+    assert 'a' in scheduler.plan()
+    scheduler.close()
+
+
+def test_max_age_forces_recheck(tmp_path, monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(recrawl.time, 'time', clock)
+    scheduler = RecrawlScheduler(str(tmp_path / 'history.db'), min_probability=0.99, max_age=7 * DAY)
+    for _ in range(5):
+        scheduler.observe_collection('https://x/collections/c', ['https://x/products/a'])
+        clock.now += DAY
+    assert not scheduler.collection_due('https://x/collections/c')
+    clock.now += 7 * DAY
+    assert scheduler.collection_due('https://x/collections/c')
+    scheduler.close()
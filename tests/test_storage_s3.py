@@ -0,0 +1,11 @@
+import sys
+
+import pytest
+
+from storage import make_storage
+
+
+def test_s3_without_boto3_names_the_package(monkeypatch):
+    monkeypatch.setitem(sys.modules, 'boto3', None)
+    with pytest.raises(RuntimeError, match="boto3.*requirements-s3.txt"):
+        make_storage('s3://crawl-images/tno')